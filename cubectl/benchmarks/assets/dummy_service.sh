@@ -0,0 +1,6 @@
+#!/bin/sh
+# lightweight stand-in for tests/assets/example_services/example_service_0.py
+while true; do
+    echo "$$: $*"
+    sleep 1
+done
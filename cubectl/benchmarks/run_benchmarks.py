@@ -0,0 +1,342 @@
+"""
+Benchmarks of watcher, CLI commands and log reading.
+
+Every run initializes temporary application `bench_<pid>_<n>` with N dummy
+services in temp_dir from config.yaml, runs its watcher and removes it
+afterwards, so other registered applications are not affected.
+
+Usage (from directory containing `cubectl` package):
+    python -m cubectl.benchmarks.run_benchmarks -n 10 -n 100 -o results.json
+    python -m cubectl.benchmarks.run_benchmarks -n 10 --baseline results.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import tempfile
+import statistics
+import urllib.request
+from pathlib import Path
+from subprocess import Popen, run, DEVNULL, PIPE
+from typing import Optional
+
+import click
+import yaml
+
+from cubectl.src import config, register_location
+from cubectl.src.initialization_functions import unregister_application
+from cubectl.src.utils import (
+    LogReader,
+    LogFollower,
+    read_log_range,
+    read_state,
+    send_control_request,
+    ControlChannelException,
+)
+
+
+CLI = [sys.executable, '-m', 'cubectl.main']
+DUMMY_SERVICE = Path(Path(__file__).parent, 'assets', 'dummy_service.sh')
+PACKAGE_ROOT = Path(__file__).parent.parent.parent
+# lower values are better for every metric compared with baseline,
+# except these ones
+HIGHER_IS_BETTER = ('mb_per_second', 'cycles_per_second')
+
+
+def _env() -> dict:
+    env = os.environ.copy()
+    env['PYTHONPATH'] = os.pathsep.join(
+        x for x in (str(PACKAGE_ROOT), env.get('PYTHONPATH')) if x
+    )
+    return env
+
+
+def _cli(*args, timeout: float = 300) -> float:
+    """Runs cubectl command and returns its duration in seconds."""
+
+    started_at = time.perf_counter()
+    result = run([*CLI, *args], env=_env(), stdout=PIPE, stderr=PIPE, timeout=timeout)
+    duration = time.perf_counter() - started_at
+    if result.returncode != 0:
+        raise RuntimeError(f'cubectl {" ".join(args)} failed: {result.stderr.decode()[-2000:]}')
+    return duration
+
+
+def _latencies(durations: list[float]) -> dict:
+    durations = sorted(durations)
+    return {
+        'count': len(durations),
+        'p50_ms': round(durations[len(durations) // 2] * 1000, 3),
+        'p99_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.99))] * 1000, 3),
+        'mean_ms': round(statistics.mean(durations) * 1000, 3),
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _cpu_seconds(pid: int) -> float:
+    with open(f'/proc/{pid}/stat', 'rb') as f:
+        fields = f.read().rsplit(b')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def _scrape_cycles(port: int) -> tuple[float, int]:
+    """Returns (sum, count) of reconcile duration histogram of watcher."""
+
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+        content = response.read().decode()
+
+    total, count = 0.0, 0
+    for line in content.splitlines():
+        if line.startswith('cubectl_reconcile_duration_seconds_sum'):
+            total += float(line.split()[-1])
+        elif line.startswith('cubectl_reconcile_duration_seconds_count'):
+            count += int(line.split()[-1])
+    return total, count
+
+
+class _BenchmarkApp:
+    """Application with N dummy services and its watcher."""
+
+    def __init__(self, n_services: int, work_dir: str):
+        self.name = f'bench_{os.getpid()}_{n_services}'
+        self.n_services = n_services
+        self._work_dir = Path(work_dir)
+        self._init_file = Path(self._work_dir, f'{self.name}.yaml')
+        self._watcher: Optional[Popen] = None
+        self._control_socket = None
+        self.metrics_port = _free_port()
+
+    @property
+    def watcher_pid(self) -> int:
+        return self._watcher.pid
+
+    def init(self) -> float:
+        init_file = {
+            'installation_name': self.name,
+            'root_dir': str(self._work_dir),
+            'processes': [
+                {
+                    'name': f'service_{i}',
+                    'executor': 'sh',
+                    'file': str(DUMMY_SERVICE),
+                    'arguments': {'--name': f'name_{i}'},
+                    'dotenv': False,
+                    'service': False,
+                }
+                for i in range(self.n_services)
+            ],
+        }
+        with self._init_file.open('w') as f:
+            yaml.safe_dump(init_file, f)
+        duration = _cli('init', str(self._init_file))
+
+        for app in read_state(register_location):
+            if app['app_name'] == self.name:
+                self._control_socket = app.get('control_socket')
+        return duration
+
+    def start_watcher(self):
+        self._watcher = Popen(
+            [*CLI, 'watch', self.name, '--metrics-port', str(self.metrics_port)],
+            env=_env(),
+            stdout=DEVNULL,
+            stderr=open(Path(self._work_dir, f'{self.name}_watcher.log'), 'wb'),
+        )
+        self.wait_for(lambda states: len(states) == self.n_services, timeout=60)
+
+    def states(self) -> list[str]:
+        try:
+            report = send_control_request(self._control_socket, 'status', timeout=10)
+        except ControlChannelException:
+            return []
+        return [x['system_data']['state'] for x in report.values()]
+
+    def wait_for(self, condition, timeout: float = 300):
+        deadline = time.monotonic() + timeout
+        while not condition(self.states()):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'{self.name}: state was not reached in {timeout}s')
+            if self._watcher is not None and self._watcher.poll() is not None:
+                raise RuntimeError(f'{self.name}: watcher exited with {self._watcher.returncode}')
+            time.sleep(0.02)
+
+    def close(self):
+        try:
+            if self._watcher is not None and self._watcher.poll() is None:
+                _cli('kill', self.name)
+                self._watcher.wait(timeout=60)
+        except Exception as e:
+            print(f'{self.name}: watcher was not stopped: {e}', file=sys.stderr)
+            self._watcher.kill()
+        _cli('clean', self.name)
+        unregister_application(app_name=self.name, register_path=register_location)
+
+
+def benchmark_services(n_services: int, repeat: int, steady_seconds: float) -> dict:
+    with tempfile.TemporaryDirectory(prefix='cubectl_bench_') as work_dir:
+        app = _BenchmarkApp(n_services=n_services, work_dir=work_dir)
+        try:
+            init_seconds = app.init()
+            app.start_watcher()
+
+            started_at = time.perf_counter()
+            _cli('start', app.name)
+            app.wait_for(lambda states: states and all(x == 'STARTED' for x in states))
+            start_seconds = time.perf_counter() - started_at
+
+            # steady state: all processes running, nothing to apply
+            time.sleep(1)
+            sum_before, count_before = _scrape_cycles(app.metrics_port)
+            cpu_before = _cpu_seconds(app.watcher_pid)
+            time.sleep(steady_seconds)
+            sum_after, count_after = _scrape_cycles(app.metrics_port)
+            cpu_after = _cpu_seconds(app.watcher_pid)
+            cycles = max(1, count_after - count_before)
+
+            status_cli = [_cli('status', app.name) for _ in range(repeat)]
+            status_socket = []
+            for _ in range(repeat * 10):
+                request_started_at = time.perf_counter()
+                app.states()
+                status_socket.append(time.perf_counter() - request_started_at)
+
+            started_at = time.perf_counter()
+            _cli('stop', app.name)
+            app.wait_for(lambda states: states and all(x == 'STOPPED' for x in states))
+            stop_seconds = time.perf_counter() - started_at
+        finally:
+            app.close()
+
+    return {
+        'init_seconds': round(init_seconds, 4),
+        'start_all_seconds': round(start_seconds, 4),
+        'stop_all_seconds': round(stop_seconds, 4),
+        'steady_state': {
+            'cycle_mean_ms': round((sum_after - sum_before) / cycles * 1000, 4),
+            'cycles_per_second': round(cycles / steady_seconds, 2),
+            'watcher_cpu_percent': round((cpu_after - cpu_before) / steady_seconds * 100, 2),
+        },
+        'status_cli': _latencies(status_cli),
+        'status_control_socket': _latencies(status_socket),
+    }
+
+
+def benchmark_log_tail(size_mb: int, repeat: int) -> dict:
+    line = b'2023-01-31 12:00:00,000 INFO service: ' + b'x' * 80 + b'\n'
+
+    with tempfile.TemporaryDirectory(prefix='cubectl_bench_') as work_dir:
+        log_file = Path(work_dir, 'service.log')
+        with log_file.open('wb') as f:
+            block = line * (1024 * 1024 // len(line))
+            for _ in range(size_mb):
+                f.write(block)
+        size = log_file.stat().st_size
+
+        reader = LogReader(str(log_file))
+        tail = []
+        for _ in range(repeat):
+            started_at = time.perf_counter()
+            reader.get_log(tail=1000)
+            tail.append(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        read_log_range(str(log_file), 0, size)
+        full_read_seconds = time.perf_counter() - started_at
+
+        # follower reading appended data
+        follower = LogFollower({'service': str(log_file)})
+        follower.read_new()
+        with log_file.open('ab') as f:
+            f.write(block * min(size_mb, 16))
+        started_at = time.perf_counter()
+        appended = 0
+        while True:
+            lines = follower.read_new()
+            if not lines:
+                break
+            appended += sum(len(x) for _, x in lines)
+        follow_seconds = time.perf_counter() - started_at
+
+    return {
+        'file_mb': size_mb,
+        'tail_1000_lines': _latencies(tail),
+        'full_read': {'mb_per_second': round(size / 1024 ** 2 / full_read_seconds, 1)},
+        'follow': {'mb_per_second': round(appended / 1024 ** 2 / follow_seconds, 1)},
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, path: str = '') -> list[str]:
+    """Returns descriptions of metrics which are worse than in baseline."""
+
+    regressions = []
+    for key, value in results.items():
+        if key not in baseline:
+            continue
+        name = f'{path}.{key}' if path else key
+        if isinstance(value, dict) and isinstance(baseline[key], dict):
+            regressions.extend(compare(value, baseline[key], threshold, name))
+        elif isinstance(value, (int, float)) and isinstance(baseline[key], (int, float)):
+            if key == 'count' or not baseline[key]:
+                continue
+            ratio = value / baseline[key]
+            if key in HIGHER_IS_BETTER:
+                ratio = 1 / ratio if ratio else float('inf')
+            if ratio > 1 + threshold:
+                regressions.append(f'{name}: {baseline[key]} -> {value}')
+    return regressions
+
+
+@click.command()
+@click.option('--services', '-n', multiple=True, type=click.IntRange(1, 500), default=(10, 50),
+              help='Number of dummy services, may be repeated (10 to 500)')
+@click.option('--repeat', '-r', default=10, help='Repetitions of latency measurements')
+@click.option('--steady-seconds', default=5.0, help='Duration of steady state measurement')
+@click.option('--log-mb', default=64, help='Size of log file for log benchmarks')
+@click.option('--output', '-o', default=None, help='File to write JSON results to (stdout by default)')
+@click.option('--baseline', default=None, help='Previous results to compare with')
+@click.option('--threshold', default=0.2, help='Allowed relative degradation against baseline')
+def main(services, repeat, steady_seconds, log_mb, output, baseline, threshold):
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'state_format': config.get('state_format', 'yaml'),
+        },
+        'services': dict(),
+        'logs': benchmark_log_tail(size_mb=log_mb, repeat=repeat),
+    }
+    for n_services in sorted(set(services)):
+        print(f'benchmarking {n_services} services...', file=sys.stderr)
+        results['services'][str(n_services)] = benchmark_services(
+            n_services=n_services, repeat=repeat, steady_seconds=steady_seconds
+        )
+
+    dumped = json.dumps(results, indent=2)
+    if output:
+        Path(output).write_text(dumped + '\n')
+    else:
+        print(dumped)
+
+    if baseline:
+        regressions = compare(
+            {k: v for k, v in results.items() if k != 'meta'},
+            json.loads(Path(baseline).read_text()),
+            threshold=threshold,
+        )
+        for regression in regressions:
+            print(f'regression: {regression}', file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
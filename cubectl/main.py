@@ -1,45 +1,75 @@
 import os
 import sys
+import re
 import signal
+import shutil
+import getpass
 import time
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
 
 import click
 from pathlib import Path
 import logging
 from pprint import pprint
-import dotenv
-import yaml
 
-from cubectl.src.configurator import Configurator, ConfiguratorException
-from cubectl.src.executor import Executor, ExecutorException
-
-from cubectl.src import (
-    config,
-    register_location,
-    temp_dir,
-    app_register,
-)
+# modules needed by few commands (pydantic models, requests, http server)
+# are imported in these commands, so start up of others stays fast
+from cubectl import src
+from cubectl.src.configurator import ConfiguratorException
 from cubectl.src.utils import (
     resolve_path,
     get_status_file,
     create_nginx_config,
     get_all_allocated_ports_by_app,
-    read_yaml,
-    check_service_names_for_duplicates,
-    check_if_launched_as_root,
+    read_state,
+    dump_state,
+    remove_state,
+    STATE_FORMATS,
     format_report,
     format_logs_response,
-    TelegramMessanger,
-    send_message_to_subscribers,
+    format_log_line,
+    get_log_files,
+    get_output_log_dir,
+    get_log_cursors_file,
     get_app_name_and_register,
+    check_service_names_for_duplicates,
+    check_if_launched_as_root,
+    ControlChannelException,
+    send_control_request,
 )
 
+if TYPE_CHECKING:
+    from cubectl.src.configurator import Configurator
+    from cubectl.src.executor import Executor
+    from cubectl.src.supervisor import Supervisor
+    from cubectl.src.models import OutputCaptureConfig
+    from cubectl.src.utils import MetricsExporter, PhaseProfiler, FanOutMessanger
+
 
-configurator = Configurator(config, app_register=register_location)
-executor: Executor = None
+_configurator: Optional['Configurator'] = None
+executor: Optional['Executor'] = None
+supervisor: Optional['Supervisor'] = None
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__file__)
-dotenv.load_dotenv()
+
+
+def get_configurator() -> 'Configurator':
+    global _configurator
+
+    if _configurator is None:
+        from cubectl.src.configurator import Configurator
+
+        _configurator = Configurator(src.config, app_register=src.register_location)
+    return _configurator
+
+
+def _load_dotenv():
+    """Loads .env of working directory (telegram settings, env of services)."""
+
+    import dotenv
+
+    dotenv.load_dotenv()
 
 
 @click.group()
@@ -75,7 +105,7 @@ def init(init_file: str, override: bool):
         root_dir=None, file_path=init_file, return_dir=False
     )
     try:
-        configurator.init(init_file=init_file, reinit=override)
+        get_configurator().init(init_file=init_file, reinit=override)
     except ConfiguratorException as ce:
         print(f"Initialization failed: {ce}")
 
@@ -91,7 +121,7 @@ def start(app_name: str, services: tuple):
     """
     app_name_resolved, _ = get_app_name_and_register(
         app_name=app_name,
-        register_location=register_location,
+        register_location=src.register_location,
         get_default_if_not_found=True,
     )
 
@@ -100,7 +130,7 @@ def start(app_name: str, services: tuple):
         app_name = app_name_resolved
 
     try:
-        configurator.start(app_name=app_name, services=services)
+        get_configurator().start(app_name=app_name, services=services)
     except ConfiguratorException as ce:
         print(f"Failed to start {app_name}: {ce}")
 
@@ -117,7 +147,7 @@ def stop(app_name: str, services: tuple):
 
     app_name_resolved, _ = get_app_name_and_register(
         app_name=app_name,
-        register_location=register_location,
+        register_location=src.register_location,
         get_default_if_not_found=True,
     )
     if app_name not in ('all', None, 'default', app_name_resolved):
@@ -126,7 +156,7 @@ def stop(app_name: str, services: tuple):
 
     try:
         log.debug(f'cubectl: main: stopping services: {services}; In app: {app_name}')
-        configurator.stop(app_name=app_name, services=services)
+        get_configurator().stop(app_name=app_name, services=services)
     except ConfiguratorException as ce:
         print(f"Failed to stop {app_name}: {ce}")
 
@@ -143,7 +173,7 @@ def restart(app_name: str, services: tuple):
 
     app_name_resolved, _ = get_app_name_and_register(
         app_name=app_name,
-        register_location=register_location,
+        register_location=src.register_location,
         get_default_if_not_found=True,
     )
     if app_name not in ('all', None, 'default', app_name_resolved):
@@ -151,7 +181,7 @@ def restart(app_name: str, services: tuple):
         app_name = app_name_resolved
 
     try:
-        configurator.restart(app_name=app_name, services=services)
+        get_configurator().restart(app_name=app_name, services=services)
     except ConfiguratorException as ce:
         print(f"Failed to restart {app_name}: {ce}")
 
@@ -164,12 +194,12 @@ def status(app_name: str):
         app_name: [Optional] Application name
     """
     app_name, _ = get_app_name_and_register(
-        app_name=app_name, register_location=register_location
+        app_name=app_name, register_location=src.register_location
     )
 
     try:
         log.debug(f'cubectl: status: getting status for app_name: {app_name}')
-        report = configurator.status(
+        report = get_configurator().status(
             app_name=app_name,
             # report_location=config['report_location'],
         )
@@ -182,29 +212,58 @@ def status(app_name: str):
 @click.argument('app_name', default='default')
 @click.argument('services', nargs=-1)
 @click.option('--full', default=False, is_flag=True)
-def logs(app_name: str, services: tuple, full: bool):
+@click.option('--tail', 'tail', type=int, default=None, help='Show only last N lines.')
+@click.option('--head', 'head', type=int, default=None, help='Show only first N lines.')
+@click.option('--bytes', 'n_bytes', type=int, default=None, help='Show only last N bytes.')
+@click.option('--follow', '-f', default=False, is_flag=True, help='Stream new lines.')
+@click.option('--cursor', default=None, help='Name of reader of latest logs.')
+def logs(
+        app_name: str,
+        services: tuple,
+        full: bool,
+        tail: int,
+        head: int,
+        n_bytes: int,
+        follow: bool,
+        cursor: str,
+):
     """
     Arguments:
         app_name: [Optional] Application name
         services:
         full: if not supplied only new logs will be showed.
+        tail: only last lines of log are read.
+        head: only first lines of log are read.
+        n_bytes: only last bytes of log are read.
+        follow: log files are read directly and new lines are printed
+            until interrupted. With --tail last lines are printed first.
+        cursor: latest logs are tracked separately for every cursor,
+            <user>@<terminal> by default.
     """
     app_name_resolved, _ = get_app_name_and_register(
         app_name=app_name,
-        register_location=register_location,
+        register_location=src.register_location,
         get_default_if_not_found=True,
     )
     if app_name not in ('all', None, 'default', app_name_resolved):
         services = [*services, app_name]
         app_name = app_name_resolved
 
+    if follow:
+        _follow_logs(app_name=app_name, services=services, tail=tail)
+        return
+
     try:
         log.debug(f'cubectl: logs: getting logs for app_name: {app_name}')
-        report = configurator.get_logs(
+        report = get_configurator().get_logs(
             app_name=app_name,
             services=services,
             # logs_buffer_dir=config['log_buffer_location'],
             latest=(not full),
+            head=head,
+            tail=tail,
+            n_bytes=n_bytes,
+            cursor=cursor or _get_log_cursor_name(),
         )
         if isinstance(report, dict):
             print(format_logs_response(logs_response=report, app_name=app_name))
@@ -214,82 +273,286 @@ def logs(app_name: str, services: tuple, full: bool):
         print(f"Failed to get status for {app_name}: {ce}")
 
 
+def _get_log_cursor_name() -> str:
+    try:
+        terminal = os.ttyname(sys.stdin.fileno())
+    except OSError:
+        terminal = 'notty'
+    return f'{getpass.getuser()}@{terminal}'
+
+
+def _follow_logs(app_name: str, services: tuple, tail: int = None):
+    status_file = get_status_file(app_name=app_name, register_location=src.register_location)
+    log_files = get_log_files(status_file=status_file, services=services)
+    if not log_files:
+        print(f"No log files found for {app_name}.")
+        return
+
+    width = max(len(x) for x in log_files)
+    indexes = {x: i for i, x in enumerate(log_files)}
+
+    def on_line(service_name: str, line: str):
+        print(
+            format_log_line(service_name, line, index=indexes[service_name], width=width),
+            flush=True,
+        )
+
+    from cubectl.src.utils import LogFollower
+
+    print(f"Installation: {app_name}")
+    follower = LogFollower(
+        log_files=log_files, poll_period=src.config.get('log_follow_poll_period', 1)
+    )
+    try:
+        follower.follow(on_line=on_line, tail=tail)
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command('search-logs')
+@click.argument('pattern')
+@click.argument('app_name', default='default')
+@click.argument('services', nargs=-1)
+@click.option('--since', default=None, help='Only lines after ISO timestamp.')
+@click.option('--context', '-C', type=int, default=0, help='Lines around match.')
+@click.option('--max-matches', type=int, default=None)
+def search_logs(
+        pattern: str,
+        app_name: str,
+        services: tuple,
+        since: str,
+        context: int,
+        max_matches: int,
+):
+    """
+    Searches log files of services for regular expression.
+
+    Log files are read directly (memory mapped), sparse index of every log
+    is kept in `logs/.index` near status file, so search with --since does
+    not scan older part of log.
+
+    Arguments:
+        pattern: regular expression.
+        app_name: [Optional] Application name
+        services:
+        since: e.g. 2023-01-31T12:00:00, lines without timestamp are not filtered.
+        context: number of lines before and after matched line.
+        max_matches: per service.
+    """
+    app_name_resolved, _ = get_app_name_and_register(
+        app_name=app_name,
+        register_location=src.register_location,
+        get_default_if_not_found=True,
+    )
+    if app_name not in ('all', None, 'default', app_name_resolved):
+        services = [*services, app_name]
+        app_name = app_name_resolved
+
+    try:
+        since_time = datetime.fromisoformat(since) if since else None
+    except ValueError as ve:
+        print(f"Invalid --since: {ve}")
+        return
+
+    from cubectl.src.utils import search_log
+
+    status_file = get_status_file(app_name=app_name, register_location=src.register_location)
+    log_files = get_log_files(status_file=status_file, services=services)
+    index_dir = Path(get_output_log_dir(status_file), '.index')
+    width = max((len(x) for x in log_files), default=0)
+
+    print(f"Installation: {app_name}")
+    for i, (service_name, log_file) in enumerate(log_files.items()):
+        try:
+            groups = search_log(
+                log_file=log_file,
+                pattern=pattern,
+                since=since_time,
+                context=context,
+                index_file=Path(index_dir, f'{service_name}.json'),
+                max_matches=max_matches,
+            )
+        except (OSError, re.error) as e:
+            print(f"Failed to search logs of {service_name}: {e}")
+            continue
+
+        for group in groups:
+            if context:
+                print('--')
+            for line in group:
+                print(format_log_line(service_name, line, index=i, width=width))
+
+
 def handler_stop(signum, frame):
+    # repeated signal must not interrupt stopping, status file lock
+    # taken by interrupted handler would never be released
+    for _signal in (signal.SIGINT, signal.SIGABRT, signal.SIGTERM):
+        signal.signal(_signal, signal.SIG_IGN)
+
     stop_func = stop.callback
     try:
         app_name, register = get_app_name_and_register(
-            app_name=None, register_location=register_location
+            app_name=None, register_location=src.register_location
         )
-        apps = [x["app_name"] for x in register]
     except FileNotFoundError:
-        apps = []
+        register = []
 
-    for app in apps:
+    # apps of this watcher are stopped directly below, request over control
+    # channel would wait for lock taken by interrupted cycle until timeout
+    own_apps = set()
+    if executor is not None or supervisor is not None:
+        own_apps = {
+            x['app_name'] for x in register if str(x.get('watcher_pid')) == str(os.getpid())
+        }
+
+    for app in [x['app_name'] for x in register]:
         log.info(f'cubectl: main: handling signal: stopping {app}.')
-        stop_func(app, tuple())
+        if app not in own_apps:
+            stop_func(app, tuple())
+            continue
+        try:
+            get_configurator().stop(app_name=app, services=tuple(), notify_watcher=False)
+        except ConfiguratorException as ce:
+            print(f"Failed to stop {app}: {ce}")
 
     if executor is not None:
         executor._stop_all_processes()
+    if supervisor is not None:
+        supervisor._stop_all()
 
     sys.exit(0)
 
 
-signal.signal(signal.SIGINT, handler_stop)
-signal.signal(signal.SIGABRT, handler_stop)
-signal.signal(signal.SIGTERM, handler_stop)
+def _install_stop_handlers():
+    """Only watcher stops services on signal, other commands just exit."""
+
+    signal.signal(signal.SIGINT, handler_stop)
+    signal.signal(signal.SIGABRT, handler_stop)
+    signal.signal(signal.SIGTERM, handler_stop)
+
+
+def _create_output_capture_config() -> 'OutputCaptureConfig':
+    from cubectl.src.models import OutputCaptureConfig
+
+    return OutputCaptureConfig(
+        max_bytes=src.config.get('output_log_max_bytes', 10 * 1024 * 1024),
+        backup_count=src.config.get('output_log_backup_count', 3),
+        buffer_lines=src.config.get('output_buffer_lines', 1000),
+    )
+
+
+def _create_metrics_exporter(collect, name: str = 'cubectl', port: int = None) -> 'MetricsExporter':
+    from cubectl.src.utils import MetricsExporter
+
+    textfile = None
+    if src.config.get('metrics_textfile_dir'):
+        textfile = str(Path(src.config['metrics_textfile_dir']).expanduser().resolve() / f'{name}.prom')
+
+    exporter = MetricsExporter(
+        collect=collect,
+        port=port if port is not None else src.config.get('metrics_port'),
+        host=src.config.get('metrics_host', '127.0.0.1'),
+        textfile=textfile,
+        textfile_period=src.config.get('metrics_textfile_period', 15),
+    )
+    exporter.start()
+    return exporter
+
+
+def _create_profiler(profile: bool) -> 'PhaseProfiler':
+    from cubectl.src.utils import PhaseProfiler
+
+    profile = profile or os.getenv('CUBECTL_PROFILE', '').lower() in ('1', 'true', 'yes')
+    profiler = PhaseProfiler(
+        enabled=profile,
+        report_period=src.config.get('profile_report_period', 60),
+        dump_dir=str(src.temp_dir),
+    )
+    if profile and hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.toggle_cprofile())
+    return profiler
+
+
+def _notification_options() -> dict:
+    return dict(
+        timeout=src.config.get('notification_timeout', 10),
+        min_interval=src.config.get('notification_chat_interval', 1),
+        coalesce_window=src.config.get('notification_coalesce_window', 2),
+        retries=src.config.get('notification_retries', 5),
+        backoff=src.config.get('notification_backoff', 1),
+        max_backoff=src.config.get('notification_max_backoff', 60),
+        max_pending=src.config.get('notification_max_pending', 100),
+    )
+
+
+def _create_messanger() -> 'FanOutMessanger':
+    """Notifiers from env: telegram (CUBECTL_TELEGRAM_TOKEN) and CUBECTL_NOTIFIERS."""
+
+    from cubectl.src.utils import create_notifiers, get_notifier_configs_from_env
+
+    configs = get_notifier_configs_from_env()
+    m = create_notifiers(configs, **_notification_options())
+    if m:
+        log.debug(f'cubectl: main: {len(m)} notifier(s) configured from env.')
+    else:
+        log.warning(
+            'cubectl: main: no notifiers were configured from env, set '
+            'CUBECTL_TELEGRAM_TOKEN and CUBECTL_TELEGRAM_CHAT_IDS or CUBECTL_NOTIFIERS.'
+        )
+    return m
 
 
 @cli.command('watch')
 @click.argument('app_name', default='default')
 @click.option('--check', '-c', default=1, help='Period of checking processes status')
-def watch(app_name, check):
+@click.option('--concurrency', '-j', default=None, type=int,
+              help='Max number of processes updated in parallel')
+@click.option('--metrics-port', default=None, type=int,
+              help='Port of Prometheus metrics endpoint (metrics_port of config by default)')
+@click.option('--profile', is_flag=True, default=False,
+              help='Log durations of phases of watcher loop, SIGUSR1 toggles cProfile')
+def watch(app_name, check, concurrency, metrics_port, profile):
     """
     Starts monitoring for initializated services
 
     Arguments:
         app_name:
         check: Period of checking processes status.
+        concurrency: Max number of processes updated in parallel.
+        metrics_port: Port of Prometheus metrics endpoint.
+        profile: Log p50/p99 of phases of loop (or set CUBECTL_PROFILE=1).
     """
+    from cubectl.src.executor import Executor, ExecutorException
+    from cubectl.src.initialization_functions import set_watcher_pid
+
+    _load_dotenv()
+    _install_stop_handlers()
     app_name, register = get_app_name_and_register(
-        app_name=app_name, register_location=register_location
+        app_name=app_name, register_location=src.register_location
     )
     os.environ['CUBECTL_WATCHER_CHECK_PERIOD'] = str(check)
 
     status_file = None
-    telegram_token = os.getenv('CUBECTL_TELEGRAM_TOKEN')
-    telegram_subscribers = os.getenv('CUBECTL_TELEGRAM_CHAT_IDS')
-
-    m = None
-    if telegram_token:
-        m = TelegramMessanger(token=telegram_token)
-        m.add_subscribers(ids=telegram_subscribers)
-        log.debug(
-            'cubectl: main: watch: telegram messanger successfully configured.'
-        )
-    else:
-        log.warning(
-            f'cubectl: main: watch: telegram messanger was not '
-            f'configured because env variables was not supplied.\n'
-            f'CUBECTL_TELEGRAM_TOKEN={telegram_token}; CUBECTL_TELEGRAM_CHAT_IDS={telegram_subscribers}\n'
-        )
+    m = _create_messanger()
 
     try:
         status_file = get_status_file(
-            app_name=app_name, register_location=register_location
+            app_name=app_name, register_location=src.register_location
         )
     except Exception as e:
         log.error(f'Failed to retrieve status file for {app_name}. Error: {e}')
 
+    control_socket = None
+    for app in register:
+        if app['app_name'] == app_name:
+            control_socket = app.get('control_socket')
+
     try:
-        app_index = -1
-        for i in range(len(register)):
-            if register[i]['app_name'] == app_name:
-                app_index = i
-                register[i]['watcher_pid'] = os.getpid()
-                break
-        if app_index != -1:
-            with Path(register_location).open('w') as f:
-                yaml.dump(register, f)
+        set_watcher_pid(
+            register_path=src.register_location,
+            app_names=[app_name],
+            watcher_pid=os.getpid(),
+        )
     except Exception as e:
         log.error(f'cubectl: main: watch: updating of register with watcher pid failed: {e}')
 
@@ -298,13 +561,87 @@ def watch(app_name, check):
 
         global executor
 
-        executor = Executor(status_file=status_file, meta_info={'app': app_name})
+        if concurrency is None:
+            concurrency = src.config.get('reconcile_concurrency', 1)
+        executor = Executor(
+            status_file=status_file,
+            meta_info={'app': app_name},
+            concurrency=concurrency,
+            control_socket=control_socket,
+            output_capture=_create_output_capture_config(),
+            log_cursor_ttl=src.config.get('log_cursor_ttl', 24 * 3600),
+            cgroup_root=src.config.get('cgroup_root'),
+            profiler=_create_profiler(profile),
+            notification_options=_notification_options(),
+            log_tail_lines=src.config.get('notification_log_tail_lines', 20),
+            log_tail_bytes=src.config.get('notification_log_tail_bytes', 2048),
+            soft_limit_notification_interval=src.config.get('soft_limit_notification_interval', 300),
+        )
         executor.add_messanger(m)
-        executor.process(cycle_period=check)
+        metrics_exporter = _create_metrics_exporter(
+            executor.collect_metrics, name=f'cubectl_{app_name}', port=metrics_port
+        )
+        try:
+            executor.process(cycle_period=check)
+        finally:
+            metrics_exporter.close()
+            m.close()
     except ExecutorException as ee:
         log.error(f'Failed to start {app_name}. Error: {ee}')
 
 
+@cli.command('supervise')
+@click.option('--check', '-c', default=1, help='Period of checking processes status')
+@click.option('--concurrency', '-j', default=None, type=int,
+              help='Max number of processes updated in parallel')
+@click.option('--metrics-port', default=None, type=int,
+              help='Port of Prometheus metrics endpoint (metrics_port of config by default)')
+@click.option('--profile', is_flag=True, default=False,
+              help='Log durations of phases of watcher loop, SIGUSR1 toggles cProfile')
+def supervise(check, concurrency, metrics_port, profile):
+    """
+    Starts monitoring for all applications from register in one process.
+    Applications initialized or cleaned later are added or removed on the fly.
+
+    Arguments:
+        check: Period of checking processes status.
+        concurrency: Max number of processes updated in parallel per application.
+        metrics_port: Port of Prometheus metrics endpoint.
+        profile: Log p50/p99 of phases of loop (or set CUBECTL_PROFILE=1).
+    """
+    from cubectl.src.supervisor import Supervisor
+
+    _load_dotenv()
+    _install_stop_handlers()
+    os.environ['CUBECTL_WATCHER_CHECK_PERIOD'] = str(check)
+
+    if concurrency is None:
+        concurrency = src.config.get('reconcile_concurrency', 1)
+
+    global supervisor
+
+    supervisor = Supervisor(
+        register_location=src.register_location,
+        concurrency=concurrency,
+        output_capture=_create_output_capture_config(),
+        log_cursor_ttl=src.config.get('log_cursor_ttl', 24 * 3600),
+        cgroup_root=src.config.get('cgroup_root'),
+        notification_options=_notification_options(),
+        log_tail_lines=src.config.get('notification_log_tail_lines', 20),
+        log_tail_bytes=src.config.get('notification_log_tail_bytes', 2048),
+        soft_limit_notification_interval=src.config.get('soft_limit_notification_interval', 300),
+        profiler=_create_profiler(profile),
+    )
+    m = _create_messanger()
+    supervisor.add_messanger(m)
+    metrics_exporter = _create_metrics_exporter(supervisor.collect_metrics, port=metrics_port)
+    try:
+        supervisor.process(cycle_period=check)
+    finally:
+        metrics_exporter.close()
+        m.close()
+
+
 @cli.command('get-nginx-config')
 @click.option('--apply', default=False, is_flag=True)
 @click.option('--file', default=False, is_flag=True)
@@ -319,7 +656,7 @@ def get_nginx_config(app_name, apply, file):
         file:
     """
     app_name, _ = get_app_name_and_register(
-        app_name=app_name, register_location=register_location
+        app_name=app_name, register_location=src.register_location
     )
 
     # if apply and not check_if_launched_as_root():
@@ -335,9 +672,9 @@ def get_nginx_config(app_name, apply, file):
         file = True
 
     status_file = get_status_file(
-        app_name=app_name, register_location=register_location
+        app_name=app_name, register_location=src.register_location
     )
-    status_dict = read_yaml(status_file)
+    status_dict = read_state(status_file)
     services = [
         x for x in status_dict.get('services', [])
         if x['init_config']['service']
@@ -346,7 +683,7 @@ def get_nginx_config(app_name, apply, file):
     if not services:
         raise Exception('cubectl: no services found in status file.')
 
-    register = read_yaml(register_location)
+    register = read_state(src.register_location)
     ports_by_app = get_all_allocated_ports_by_app(register)
     check_service_names_for_duplicates(ports_by_app)
 
@@ -383,11 +720,11 @@ def get_apps():
     Returns list of applications registered in register.
     """
 
-    log.debug(f'cubectl: main: getting app list from {register_location}')
+    log.debug(f'cubectl: main: getting app list from {src.register_location}')
 
     try:
         app_name, register = get_app_name_and_register(
-            app_name=None, register_location=register_location
+            app_name=None, register_location=src.register_location
         )
         apps = [f'* {x["app_name"]}' for x in register]
     except FileNotFoundError:
@@ -411,14 +748,13 @@ def kill(app_name: str):
     """
 
     _, register = get_app_name_and_register(
-        app_name=app_name, register_location=register_location
+        app_name=app_name, register_location=src.register_location
     )
 
     try:
         for app in register:
             if app['app_name'] == app_name:
-                watcher_pid = int(app['watcher_pid'])
-                os.kill(watcher_pid, signal.SIGTERM)
+                _kill_watcher(app)
                 log.debug(f'cubectl: kill: app_name: {app_name}')
                 return
 
@@ -427,6 +763,24 @@ def kill(app_name: str):
         log.error(f'cubectl: kill: app_name: {app_name} failed: {e}.')
 
 
+def _kill_watcher(app: dict):
+    """
+    Asks watcher to stop processes of app and exit. Supervisor only stops
+    managing app. Watcher without control channel is killed by signal.
+    """
+
+    try:
+        get_configurator().stop(app_name=app['app_name'], services=tuple())
+        send_control_request(
+            app.get('control_socket'),
+            'shutdown',
+            timeout=src.config.get('control_socket_timeout', 5),
+        )
+    except ControlChannelException as e:
+        log.debug(f'cubectl: kill: {e}')
+        os.kill(int(app['watcher_pid']), signal.SIGTERM)
+
+
 @cli.command('get-init-file-example')
 def get_init_file_example():
     log.debug(f'cubectl: main: getting init file example.')
@@ -442,7 +796,7 @@ def get_init_file_example():
 def clean(app_name: str):
     try:
         _, register = get_app_name_and_register(
-            app_name=None, register_location=register_location
+            app_name=None, register_location=src.register_location
         )
     except FileNotFoundError as fnf:
         print(fnf)
@@ -465,35 +819,91 @@ def clean(app_name: str):
     for app in apps_to_delete:
         app_dir = app['app_name']
         for _name, _file in app.items():
-            if _name != 'app_name':
-                Path(_file).unlink(missing_ok=True)
+            if _name not in ('app_name', 'watcher_pid') and _file:
+                remove_state(_file)
+        if app.get('status_file'):
+            shutil.rmtree(get_output_log_dir(app['status_file']), ignore_errors=True)
+            remove_state(get_log_cursors_file(app['status_file']))
         try:
-            Path(temp_dir, app_dir).rmdir()
+            Path(src.temp_dir, app_dir).rmdir()
         except Exception as e:
             log.error(f'cubectl: main: clean: temp dir for app {app_name} '
                       f'was not deleted. error: {e}')
 
     if delete_temp_dir:
-        Path(register_location).unlink(missing_ok=True)
+        remove_state(src.register_location)
         try:
-            Path(temp_dir).rmdir()
+            Path(src.temp_dir).rmdir()
         except Exception as e:
             log.error(f'cubectl: main: clean: temp dir for cubectl '
                       f'was not deleted. error: {e}')
 
 
+@cli.command('migrate-state')
+@click.argument('state_format', type=click.Choice(list(STATE_FORMATS)))
+def migrate_state(state_format: str):
+    """
+    Converts register and status files of all applications to state_format.
+    Set the same `state_format` in config.yaml and restart watchers after.
+
+    Arguments:
+        state_format: yaml (human readable) or json (faster).
+    """
+
+    from cubectl.src.initialization_functions import migrate_register
+
+    if not Path(src.register_location).is_file():
+        print('Applications not found.')
+        return
+
+    new_register_location = migrate_register(
+        register_path=src.register_location, state_format=state_format
+    )
+    print(f'Register migrated: {new_register_location}')
+
+
+@cli.command('export-state')
+@click.argument('app_name', default='default')
+def export_state(app_name: str):
+    """
+    Prints status file of application as yaml regardless of state format.
+
+    Arguments:
+        app_name: [Optional] Application name
+    """
+
+    status_file = get_status_file(
+        app_name=app_name, register_location=src.register_location
+    )
+    print(dump_state(read_state(status_file), state_format='yaml'))
+
+
 @cli.command('message')
 @click.argument('text', default='default')
-def message(text):
-    telegram_token = os.environ['CUBECTL_TELEGRAM_TOKEN']
-    telegram_subscribers = os.environ['CUBECTL_TELEGRAM_CHAT_IDS'].split(',')
-
-    if telegram_token and telegram_subscribers:
-        send_message_to_subscribers(
-            message=text,
-            telegram_chat_ids=telegram_subscribers,
-            telegram_token=telegram_token,
-        )
+@click.option('--app', 'app_name', default=None,
+              help='Also send to notifiers from init file of application')
+def message(text, app_name):
+    """
+    Sends text to notifiers from env (and from init file of application).
+
+    Arguments:
+        text: Message.
+        app_name: [Optional] Application name.
+    """
+
+    from cubectl.src.utils import create_notifiers, create_event, get_notifier_configs_from_env
+
+    _load_dotenv()
+    configs = get_notifier_configs_from_env()
+    if app_name is not None:
+        status_file = get_status_file(app_name=app_name, register_location=src.register_location)
+        configs.extend(read_state(status_file).get('notifiers') or [])
+
+    notifiers = create_notifiers(configs, **_notification_options())
+    if not notifiers:
+        raise click.ClickException('no notifiers are configured.')
+    notifiers.post(create_event('message', app=app_name, text=text))
+    notifiers.close(timeout=src.config.get('notification_timeout', 10))
 
 
 if __name__ == '__main__':
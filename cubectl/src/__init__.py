@@ -1,35 +1,76 @@
 from pathlib import Path
-from cubectl.src.utils import read_yaml
 from logging import getLogger
 
 
 log = getLogger(__file__)
 
-try:
-    script_root = Path(__file__).parent.parent
-    config = read_yaml(Path(script_root, 'config.yaml'))
-except FileNotFoundError:
-    # tests
-    config = read_yaml('assets/utils_tests/config.yaml')
-
-try:
-    temp_dir = Path(config['temp_dir']).resolve()
-    log.debug(f'cubectl: src: __init__: temp_dir: {temp_dir}')
-    if not temp_dir.is_dir():
-        temp_dir.mkdir(parents=True, exist_ok=True)
-    config['temp_dir'] = temp_dir
-except Exception as e:
-    log.critical(f'cubectl: src: __init__: temp_dir={config.get("temp_dir")} '
-                 f'from config not accessible. error: {e}'
-                 )
-
-register_location = str(Path(config['temp_dir'],
-                             'cubectl_application_register.yaml'
-                             )
-                        )
-app_register = str(Path(config['temp_dir'],
-                        'cubectl_application_register.yaml'
-                        )
-                   )
-# register_location = config['applications_register']
-# default_status_files_dir = config['default_status_files_dir']
+# config, temp_dir, state_format, register_location and app_register are
+# loaded on first access (see __getattr__), so importing of package does
+# not read config.yaml and does not create temp_dir.
+_LAZY_SETTINGS = ('config', 'temp_dir', 'state_format', 'register_location', 'app_register')
+
+
+def _load_config() -> dict:
+    from cubectl.src.utils import read_yaml
+
+    try:
+        script_root = Path(__file__).parent.parent
+        config = read_yaml(Path(script_root, 'config.yaml'))
+    except FileNotFoundError:
+        # tests
+        config = read_yaml('assets/utils_tests/config.yaml')
+
+    try:
+        temp_dir = Path(config['temp_dir']).resolve()
+        log.debug(f'cubectl: src: __init__: temp_dir: {temp_dir}')
+        if not temp_dir.is_dir():
+            temp_dir.mkdir(parents=True, exist_ok=True)
+        config['temp_dir'] = temp_dir
+    except Exception as e:
+        log.critical(f'cubectl: src: __init__: temp_dir={config.get("temp_dir")} '
+                     f'from config not accessible. error: {e}'
+                     )
+    return config
+
+
+def _get_register_location(temp_dir, state_format: str) -> str:
+    """
+    Returns register in configured format or, if it was not migrated yet
+    (`cubectl migrate-state`), in other format.
+    """
+
+    from cubectl.src.utils import STATE_FORMATS, get_state_file_name
+
+    register = Path(
+        temp_dir, get_state_file_name('cubectl_application_register', state_format)
+    )
+    if register.is_file():
+        return str(register)
+
+    for other_format in STATE_FORMATS:
+        other_register = Path(
+            temp_dir, get_state_file_name('cubectl_application_register', other_format)
+        )
+        if other_register.is_file():
+            log.warning(f'cubectl: src: __init__: register is in {other_format} '
+                        f'format, but state_format={state_format}. '
+                        f'Use `cubectl migrate-state {state_format}`.')
+            return str(other_register)
+    return str(register)
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_SETTINGS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    config = _load_config()
+    state_format = config.get('state_format', 'yaml')
+    register_location = _get_register_location(config['temp_dir'], state_format)
+    globals().update(
+        config=config,
+        temp_dir=config['temp_dir'],
+        state_format=state_format,
+        register_location=register_location,
+        app_register=register_location,
+    )
+    return globals()[name]
@@ -1,2 +1,9 @@
-from cubectl.src.configurator.configurator import Configurator
-from cubectl.src.configurator.configurator import ConfiguratorException
+from cubectl.src.configurator.configurator_exceptions import ConfiguratorException
+
+
+def __getattr__(name: str):
+    # Configurator depends on pydantic models, it is imported only when used
+    if name == 'Configurator':
+        from cubectl.src.configurator.configurator import Configurator
+        return Configurator
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,22 +1,22 @@
-import yaml
 from pathlib import Path
 import logging
 from functools import reduce
 from time import sleep
 import uuid
 
-from cubectl.src.utils import read_yaml
+from cubectl.src.utils import read_yaml, read_state, lock_state, update_state, write_state
+from cubectl.src.utils import ControlChannelException, send_control_request
+from cubectl.src.utils import read_log_range
 from cubectl.src.initialization_functions import register_application
 from cubectl.src.initialization_functions import create_status_object
 
-from cubectl.src.models import InitFileModel, ProcessState, SetupStatus
+from cubectl.src.models import InitFileModel, ProcessState
+from cubectl.src.configurator.configurator_exceptions import ConfiguratorException
 
 
 log = logging.getLogger(__file__)
-
-
-class ConfiguratorException(Exception):
-    pass
+# older jobs are dropped from status file when new one is added
+MAX_JOBS_IN_STATUS_FILE = 10
 
 
 class Configurator:
@@ -37,6 +37,21 @@ class Configurator:
         #                          )
         self._app_register = app_register
 
+    def _request_watcher(self, register: dict, command: str, **arguments):
+        """
+        Sends command to watcher over control channel.
+
+        Raises:
+            ControlChannelException: if watcher does not serve control channel.
+        """
+
+        return send_control_request(
+            register.get('control_socket'),
+            command,
+            timeout=self._config.get('control_socket_timeout', 5),
+            **arguments,
+        )
+
     def _assign_ports_to_services(self, status):
         ports_by_app = _get_all_allocated_ports_by_app(app_register=self._app_register)
         allocated_ports = []
@@ -87,6 +102,7 @@ class Configurator:
             register_path=self._app_register,
             temp_files_dir=self._temp_dir,
             reinit=reinit,
+            state_format=self._config.get('state_format', 'yaml'),
         )
         status_file = temp_files['status_file']
 
@@ -99,15 +115,21 @@ class Configurator:
         if status_file.is_dir():
             status_file = Path(status_file, '')
 
-        if Path(status_file).is_file() and not reinit:
-            log.warning('cubectl: main: init: status file was not overriden '
-                        'because reinit=False.')
-            raise ValueError('Status file already exists.')
-
-        with open(status_file, 'w') as f:
-            yaml.dump(status_object.dict(), f)
-
-    def _change_process_state(self, app_name: str, services: tuple, state: ProcessState):
+        with lock_state(status_file):
+            if Path(status_file).is_file() and not reinit:
+                log.warning('cubectl: main: init: status file was not overriden '
+                            'because reinit=False.')
+                raise ValueError('Status file already exists.')
+
+            write_state(status_file, status_object.dict())
+
+    def _change_process_state(
+            self,
+            app_name: str,
+            services: tuple,
+            state: ProcessState,
+            notify_watcher: bool = True,
+    ):
         """
         1. status file does not have service set up in init
         2. status file has service set up in init
@@ -129,27 +151,33 @@ class Configurator:
         status_file = Path(
             register['status_file']
         )
-        status = _get_status(app_name=app_name, app_register=self._app_register)
-
-        processes_names = [x['init_config']['name'] for x in status['services']]
-        services_to_start = [x for x in services if x in processes_names]
-        not_existing = [x for x in services if x not in processes_names]
-        if not_existing:
-            log.warning(
-                f'cubectl: configurator: processes not found: {not_existing}'
-            )
-
-        if app_name.lower() == 'all' or not services:
-            services_to_start = processes_names
-        elif app_name in processes_names:
-            services_to_start.append(app_name)
 
-        for process in status['services']:
-            if process['init_config']['name'] in services_to_start:
-                process['system_data']['state'] = state.value
-
-        with status_file.open('w') as new_status_file:
-            yaml.dump(status, new_status_file)
+        with update_state(status_file, default=dict()) as status:
+            processes_names = [x['init_config']['name'] for x in status['services']]
+            services_to_start = [x for x in services if x in processes_names]
+            not_existing = [x for x in services if x not in processes_names]
+            if not_existing:
+                log.warning(
+                    f'cubectl: configurator: processes not found: {not_existing}'
+                )
+
+            if app_name.lower() == 'all' or not services:
+                services_to_start = processes_names
+            elif app_name in processes_names:
+                services_to_start.append(app_name)
+
+            for process in status['services']:
+                if process['init_config']['name'] in services_to_start:
+                    process['system_data']['state'] = state.value
+
+        # status file is applied by watcher on next cycle anyway
+        if not notify_watcher:
+            return
+        command = 'start' if state is ProcessState.started else 'stop'
+        try:
+            self._request_watcher(register, command, services=services_to_start)
+        except ControlChannelException as e:
+            log.debug(f'cubectl: configurator: {e}')
 
     def start(self, app_name: str, services: tuple):
         log.debug(f'cubectl: configurator: app: {app_name}; starting: {services}')
@@ -157,28 +185,34 @@ class Configurator:
             app_name=app_name, services=services, state=ProcessState.started
         )
 
-    def stop(self, app_name: str, services: tuple):
+    def stop(self, app_name: str, services: tuple, notify_watcher: bool = True):
+        """
+        Arguments:
+            notify_watcher: False if called by watcher itself, which would
+                wait for its own control channel otherwise.
+        """
+
         log.debug(f'cubectl: configurator: app: {app_name}; stopping: {services}')
         self._change_process_state(
-            app_name=app_name, services=services, state=ProcessState.stopped
+            app_name=app_name,
+            services=services,
+            state=ProcessState.stopped,
+            notify_watcher=notify_watcher,
         )
 
     def restart(self, app_name: str = None, services: tuple = tuple()):
         register = _get_app_register(app_name=app_name, app_register=self._app_register)
+
+        try:
+            self._request_watcher(register, 'restart', services=list(services))
+            return
+        except ControlChannelException as e:
+            log.debug(f'cubectl: configurator: falling back to status file: {e}')
+
         status_file = Path(
             register['status_file']
         )
-        status = SetupStatus(
-            **_get_status(app_name=app_name, app_register=self._app_register)
-        )
-
-        status.jobs = {
-            str(uuid.uuid4()): {
-                'restart': {'services': services}
-            }
-        }
-        with status_file.open('w') as new_status_file:
-            yaml.dump(status.dict(), new_status_file)
+        _add_job(status_file, {'restart': {'services': list(services)}})
 
     def status(self, app_name: str = None):
         """
@@ -189,19 +223,15 @@ class Configurator:
 
         # getting status file
         register = _get_app_register(app_name=app_name, app_register=self._app_register)
+
+        try:
+            return self._request_watcher(register, 'status')
+        except ControlChannelException as e:
+            log.debug(f'cubectl: configurator: falling back to status file: {e}')
+
         report_file = register['status_report']
         log.debug(f"cubectl: configurator: creating report: {report_file}")
         status_file = Path(register['status_file'])
-        status = SetupStatus(
-            **_get_status(app_name=app_name, app_register=self._app_register)
-        )
-        # getting status file
-
-        status.jobs = {
-            str(uuid.uuid4()): {
-                'get_report': {'report_file': report_file}
-            }
-        }
 
         report_file_path = Path(report_file)
         report_file_path.unlink(missing_ok=True)
@@ -209,8 +239,7 @@ class Configurator:
         init_time_changed = report_file_path.stat().st_mtime
 
         log.debug(f"cubectl: configurator: updating status file: {status_file}")
-        with status_file.open('w') as new_status_file:
-            yaml.dump(status.dict(), new_status_file)
+        _add_job(status_file, {'get_report': {'report_file': report_file}})
 
         report = None
 
@@ -218,58 +247,129 @@ class Configurator:
             sleep(self._config.get('report_retry_wait_time', 1))
             last_time_changed = report_file_path.stat().st_mtime
             if init_time_changed < last_time_changed:
-                report = read_yaml(report_file)
+                report = read_state(report_file)
                 break
 
         report_file_path.unlink(missing_ok=True)
         return report if report else None
 
-    def get_logs(self, app_name: str, services: tuple, latest: bool = True) -> dict:
+    def _ack_logs(self, register: dict, cursor: str, log_ranges: dict):
+        try:
+            self._request_watcher(
+                register, 'logs_ack', cursor=cursor, offsets=_get_ack_offsets(log_ranges)
+            )
+        except ControlChannelException as e:
+            # not acknowledged logs are returned again on next request
+            log.warning(f'cubectl: configurator: logs were not acknowledged: {e}')
+
+    def get_logs(
+            self,
+            app_name: str,
+            services: tuple,
+            latest: bool = True,
+            head: int = None,
+            tail: int = None,
+            n_bytes: int = None,
+            cursor: str = None,
+    ) -> dict:
         """
         Arguments:
             app_name:
             services:
             latest:
+            head: only first lines of logs.
+            tail: only last lines of logs.
+            n_bytes: only last bytes of logs.
+            cursor: name of client, latest logs are tracked for every
+                client separately. Read part of logs is acknowledged
+                to watcher after it was read.
         """
 
         register = _get_app_register(app_name=app_name, app_register=self._app_register)
+
+        try:
+            # watcher returns only ranges of log files, which are read here
+            log_ranges = self._request_watcher(
+                register,
+                'log_ranges',
+                services=list(services),
+                latest=latest,
+                head=head,
+                tail=tail,
+                n_bytes=n_bytes,
+                cursor=cursor,
+            )
+            logs = _read_log_ranges(log_ranges)
+            if cursor:
+                self._ack_logs(register, cursor=cursor, log_ranges=log_ranges)
+            return logs
+        except ControlChannelException as e:
+            log.debug(f'cubectl: configurator: falling back to status file: {e}')
+
         logs_buffer_file = register['log_buffer']
         log.debug(f"cubectl: configurator: creating logs buffer: {logs_buffer_file}")
 
-        # getting status file
         status_file = Path(
             register['status_file']
         )
-        status = SetupStatus(
-            **_get_status(app_name=app_name, app_register=self._app_register)
-        )
-        # getting status file
-
-        status.jobs = {
-            str(uuid.uuid4()): {
-                'get_logs': {'services': services, 'latest': latest, 'buffer_file': logs_buffer_file}
-            }
-        }
 
         logs_buffer_file_path = Path(logs_buffer_file)
         logs_buffer_file_path.parent.mkdir(parents=True, exist_ok=True)
         logs_buffer_file_path.touch()
+        init_time_changed = logs_buffer_file_path.stat().st_mtime
 
         log.debug(f"cubectl: configurator: updating status file: {status_file}")
-        with status_file.open('w') as new_status_file:
-            yaml.dump(status.dict(), new_status_file)
-
-        init_time_changed = logs_buffer_file_path.stat().st_mtime
-        logs_result = None
+        _add_job(
+            status_file,
+            {
+                'get_logs': {
+                    'services': list(services),
+                    'latest': latest,
+                    'head': head,
+                    'tail': tail,
+                    'n_bytes': n_bytes,
+                    'buffer_file': logs_buffer_file,
+                }
+            },
+        )
 
         for _ in range(self._config.get('report_number_of_cycles', 5)):
             sleep(self._config.get('report_retry_wait_time', 1))
             last_time_changed = logs_buffer_file_path.stat().st_mtime
             if init_time_changed < last_time_changed:
-                return read_yaml(logs_buffer_file_path)
+                return read_state(logs_buffer_file_path)
         return {"services": "No logs received."}
 
 
+def _get_ack_offsets(log_ranges: dict) -> dict:
+    return {
+        service_name: log_range['offset'] + log_range['length']
+        for service_name, log_range in log_ranges.items()
+        if 'path' in log_range
+    }
+
+
+def _read_log_ranges(log_ranges: dict) -> dict:
+    """Reads logs by ranges returned by watcher: {<service_name>: <log>}."""
+
+    result = dict()
+    for service_name, log_range in log_ranges.items():
+        if 'content' in log_range:
+            result[service_name] = log_range['content']
+            continue
+        try:
+            content = read_log_range(
+                path=log_range['path'],
+                offset=log_range['offset'],
+                length=log_range['length'],
+            )
+        except OSError as e:
+            log.error(f'cubectl: configurator: log of {service_name} was not read: {e}')
+            content = b''
+        result[service_name] = content.decode('utf-8', errors='replace')
+    return result
+
+
 def _get_register(app_register: str) -> list:
     """Returns whole register."""
 
@@ -277,10 +377,9 @@ def _get_register(app_register: str) -> list:
     if not register_path.is_file():
         raise ConfiguratorException('cubectl: No register found.')
 
-    with register_path.open() as f:
-        register: list = yaml.load(f, Loader=yaml.FullLoader)
-        if not register:
-            raise ConfiguratorException('cubectl: Register is empty.')
+    register: list = read_state(register_path)
+    if not register:
+        raise ConfiguratorException('cubectl: Register is empty.')
 
     return register
 
@@ -305,11 +404,22 @@ def _get_status(app_name: str, app_register: str) -> dict:
     register = _get_app_register(app_name=app_name, app_register=app_register)
     status_file = Path(register['status_file'])
 
-    with status_file.open() as f:
-        result = yaml.load(f, Loader=yaml.FullLoader)
+    result = read_state(status_file)
     return result if result else dict()
 
 
+def _add_job(status_file: Path, job: dict):
+    """
+    Adds job for watcher to status file. Jobs of other commands, which
+    were not executed yet, are kept.
+    """
+
+    with update_state(status_file, default=dict()) as status:
+        jobs = status.get('jobs') or dict()
+        jobs[str(uuid.uuid4())] = job
+        status['jobs'] = dict(list(jobs.items())[-MAX_JOBS_IN_STATUS_FILE:])
+
+
 def _get_all_allocated_ports_by_app(app_register: str) -> dict:
     """
     Returns dictionary with following format:
@@ -0,0 +1,2 @@
+class ConfiguratorException(Exception):
+    pass
@@ -1,12 +1,20 @@
+import json
+import time
+import hashlib
 import logging
+import threading
 from pathlib import Path
-import yaml
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-from cubectl.src.service_process import ServiceProcess
+from cubectl.src.service_process import ServiceProcess, ExitNotifier, CgroupLimiter, ProcessTable
 from cubectl.src.models.setup_status import ProcessStatus
-from cubectl.src.utils import Messanger
+from cubectl.src.models import ProcessState, OutputCaptureConfig
+from cubectl.src.utils import Messanger, ControlServer, FileWatcher
+from cubectl.src.utils import read_state, write_state, get_output_log_dir, DEFAULT_CURSOR
+from cubectl.src.utils import get_log_cursors_file
+from cubectl.src.utils import MetricFamily, Histogram, PhaseProfiler
+from cubectl.src.utils import create_notifiers, create_event, get_notifier_configs_from_env
 
 
 log = logging.getLogger(__file__)
@@ -23,34 +31,136 @@ class Executor:
     Applies changes from state file
     """
 
-    def __init__(self, status_file: str, meta_info: Optional[dict] = None):
+    def __init__(
+            self,
+            status_file: str,
+            meta_info: Optional[dict] = None,
+            concurrency: int = 1,
+            control_socket: Optional[str] = None,
+            wakeup: Optional[threading.Event] = None,
+            output_capture: Optional[OutputCaptureConfig] = None,
+            log_cursor_ttl: float = 24 * 3600,
+            cgroup_root: Optional[str] = None,
+            profiler: Optional[PhaseProfiler] = None,
+            notification_options: Optional[dict] = None,
+            log_tail_lines: int = 20,
+            log_tail_bytes: int = 2048,
+            soft_limit_notification_interval: float = 300,
+    ):
         """
         Arguments:
             status_file:
             meta_info:
                 Info for reports and messaging as additional information.
                 Used as it is not expected to have any specific keys/values.
+            concurrency:
+                Max number of processes status applied in parallel.
+                1 means processes are updated one by one.
+            control_socket:
+                Path of unix socket to serve commands from Configurator on.
+                If not supplied commands are received via status file only.
+            wakeup:
+                Event to set when next cycle should be started earlier than
+                planned. Shared between executors run by one supervisor.
+            output_capture:
+                Settings of capturing of stdout/stderr of processes.
+                Output is written to `logs` directory near status file
+                if log_dir is not set.
+            log_cursor_ttl:
+                Seconds after which log cursor of client, which did not
+                request logs, is dropped.
+            cgroup_root:
+                Delegated cgroup v2 directory to create cgroups of processes
+                in for memory and CPU limits. If not supplied or not usable
+                memory is limited with rlimit and CPU share is not limited.
+            profiler:
+                Measures durations of phases of cycle, shared with processes.
+                Disabled profiler is used if not supplied.
+            notification_options:
+                Timeout, retries and rate limits of notifiers from status
+                file (`notifiers` of init file), see create_notifier.
+            log_tail_lines, log_tail_bytes:
+                Max size of tail of log attached to notification about
+                failed process, 0 disables.
+            soft_limit_notification_interval:
+                Min seconds between notifications about restarts of one
+                process exceeding soft limits.
         """
 
         self._status_file = Path(status_file).resolve(strict=True)
+        self._profiler = profiler if profiler is not None else PhaseProfiler()
         self._validate_status_file(self._status_file)
 
-        self._status_file_last_change = int(self._status_file.stat().st_mtime)
+        # set by exit notifier and status file watcher to start next cycle
+        self._wakeup = wakeup if wakeup is not None else threading.Event()
+        self._running = True
+        self._status_file_watcher = FileWatcher(
+            str(self._status_file), on_change=self._wakeup.set
+        )
+        self._exit_notifier = ExitNotifier(on_exit=lambda _: self._wakeup.set())
+        self._output_capture = (output_capture or OutputCaptureConfig()).copy()
+        if not self._output_capture.log_dir:
+            self._output_capture.log_dir = str(get_output_log_dir(self._status_file))
+        self._cgroup_limiter = CgroupLimiter(
+            cgroup_root, app=(meta_info or dict()).get('app') or self._status_file.parent.name
+        ) if cgroup_root else None
         self._processes = self._setup_processes()
+        # named log cursors of clients, kept between restarts of watcher
+        self._log_cursors_file = get_log_cursors_file(self._status_file)
+        self._log_cursor_ttl = log_cursor_ttl
+        self._load_log_cursors()
         self._messanger: Optional[Messanger] = None
         self._meta_info = meta_info
-        self._last_job = None
         self._last_status = None
+        initial_status = self._get_status() or dict()
+        # notifiers of application, messages are posted to them and to messanger;
+        # ones already configured in environment (messanger of watcher) are skipped
+        self._notifiers = create_notifiers(
+            initial_status.get('notifiers') or [],
+            exclude=get_notifier_configs_from_env(),
+            **(notification_options or dict())
+        )
+        self._log_tail_lines = log_tail_lines
+        self._log_tail_bytes = log_tail_bytes
+        self._soft_limit_notification_interval = soft_limit_notification_interval
+        # process name -> (monotonic time of last notification, restarts not notified since)
+        self._soft_limit_notifications: dict[str, tuple[float, int]] = dict()
+        # jobs found in status file on start up are considered as outdated
+        self._done_jobs: set[str] = set(initial_status.get('jobs') or dict())
+        self._concurrency = max(1, int(concurrency))
+        # process name -> hash of last applied desired status
+        self._fingerprints: dict[str, str] = dict()
+        # processes to be applied again in next cycle even if status file was not changed
+        self._to_revisit: set[str] = set()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # durations of cycle(), exported as metric
+        self._cycle_duration = Histogram()
+        # guards processes from concurrent changes by control channel
+        self._lock = threading.RLock()
+        self._control_server: Optional[ControlServer] = None
+        if control_socket:
+            self._control_server = ControlServer(
+                socket_path=control_socket,
+                handlers={
+                    'status': self._get_report,
+                    'logs': self._get_logs_locked,
+                    'log_ranges': self._get_log_ranges_locked,
+                    'logs_ack': self._ack_logs_locked,
+                    'restart': self._restart_locked,
+                    'start': self._reload_status,
+                    'stop': self._reload_status,
+                    'shutdown': self.shutdown,
+                },
+            )
 
     @staticmethod
     def _validate_status_file(status_file: Path):
-        with status_file.open() as sf:
-            status_file_dict = yaml.load(sf, Loader=yaml.FullLoader)
-            if 'jobs' not in status_file_dict and 'services' not in status_file_dict:
-                raise ExecutorException(
-                    f'cubectl: Executor: invalid status file structure: '
-                    f'{status_file_dict.keys()}. For: {status_file}'
-                )
+        status_file_dict = read_state(status_file)
+        if 'jobs' not in status_file_dict and 'services' not in status_file_dict:
+            raise ExecutorException(
+                f'cubectl: Executor: invalid status file structure: '
+                f'{status_file_dict.keys()}. For: {status_file}'
+            )
 
     def _setup_processes(self) -> list:
         status = self._get_status()
@@ -58,7 +168,13 @@ class Executor:
 
         for process_status in status.get('services', []):
             init_config = process_status['init_config']
-            process = ServiceProcess(init_config=init_config)
+            process = ServiceProcess(
+                init_config=init_config,
+                exit_notifier=self._exit_notifier,
+                output_capture=self._output_capture,
+                cgroup_limiter=self._cgroup_limiter,
+                profiler=self._profiler,
+            )
             processes.append(process)
         return processes
 
@@ -68,19 +184,22 @@ class Executor:
                 return process
         return None
 
-    def _send_report(self, report_file: str):
+    def _get_report(self) -> dict:
         report = dict()
 
         for process in self._processes:
             process: ServiceProcess
             report[process.name] = process.status().dict()
+        return report
+
+    def _send_report(self, report_file: str):
+        report = self._get_report()
 
         try:
             report_file = Path(report_file)
             if not report_file.parent.is_dir():
                 report_file.parent.mkdir(parents=True, exist_ok=True)
-            with Path(report_file).open('w') as f:
-                yaml.dump(report, f)
+            write_state(report_file, report)
         except Exception as e:
             log.error(
                 f'cubectl: executor: failed to save report: {report_file} '
@@ -89,13 +208,122 @@ class Executor:
 
     def restart(self, services: str):
         # services = [x for x in services.split(',') if x]
-        for process in self._processes:
+        processes = [x for x in self._processes if x.name in services or not services]
+        # all processes are stopped before any is started, so their stop timeouts overlap
+        self._stop_all_processes(processes)
+        for process in processes:
             process: ServiceProcess
-            if process.name in services or not services:
-                process.restart()
+            try:
+                process.start()
+            except Exception as e:
+                log.error(
+                    f'cubectl: executor: starting of process {process.name} '
+                    f'failed. {self._meta_info=} with error: {e}'
+                )
+
+    def _restart_locked(self, services: list = None):
+        with self._lock:
+            self.restart(services=services or [])
+        return self._get_report()
+
+    def _get_logs_locked(self, services: list = None, latest: bool = True, **limits) -> dict:
+        if not services:
+            services = [x.name for x in self._processes]
+        with self._lock:
+            return self._get_logs(services=services, latest=latest, **limits)
+
+    def _get_log_ranges_locked(
+            self,
+            services: list = None,
+            latest: bool = True,
+            cursor: str = None,
+            **limits
+    ) -> dict:
+        """
+        Returns ranges of log files to be read by client instead of logs.
+        With named cursor ranges have to be acknowledged by `logs_ack`.
+
+        Returns:
+            {<service_name>: {'path': str, 'offset': int, 'length': int}}
+            or {<service_name>: {'content': str}} if log is not in file.
+        """
+
+        if not services:
+            services = [x.name for x in self._processes]
+
+        result = dict()
+        with self._lock:
+            for process in self._processes:
+                if process.name not in services:
+                    continue
+                if cursor:
+                    log_range = process.get_log_range(
+                        latest=latest, cursor=cursor, ack=False, **limits
+                    )
+                else:
+                    log_range = process.get_log_range(latest=latest, **limits)
+                if log_range is None:
+                    log_range = {'content': process.get_logs(latest=latest, **limits)}
+                result[process.name] = log_range
+        return result
+
+    def _ack_logs_locked(self, cursor: str, offsets: dict):
+        """
+        Arguments:
+            cursor: name of client.
+            offsets: {<service_name>: <end of read range>}
+        """
 
-    def _stop_all_processes(self):
+        with self._lock:
+            for process in self._processes:
+                if process.name in offsets:
+                    process.ack_log(cursor=cursor, offset=offsets[process.name])
+            self._save_log_cursors()
+
+    def _load_log_cursors(self):
+        try:
+            cursors = read_state(self._log_cursors_file) or dict()
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            log.error(f'cubectl: executor: log cursors were not loaded: {e}')
+            return
+
+        for process in self._processes:
+            process.set_log_cursors(cursors.get(process.name) or dict())
+
+    def _save_log_cursors(self):
+        cursors = dict()
         for process in self._processes:
+            process.expire_log_cursors(self._log_cursor_ttl)
+            cursors[process.name] = {
+                k: v for k, v in process.get_log_cursors().items() if k != DEFAULT_CURSOR
+            }
+
+        try:
+            write_state(self._log_cursors_file, cursors)
+        except OSError as e:
+            log.error(f'cubectl: executor: log cursors were not saved: {e}')
+
+    def _reload_status(self, services: list = None) -> dict:
+        """
+        Applies status file right away, without waiting for next cycle.
+        Status file itself is changed by Configurator before the call.
+        """
+
+        _ = services
+        with self._lock:
+            self._status_file_watcher.reset()
+            self._reread_status()
+            self._update_processes(status_object=self._last_status)
+        return self._get_report()
+
+    def _stop_all_processes(self, processes: list = None):
+        if processes is None:
+            processes = self._processes
+        # stop signals are sent to all processes first, so their stop timeouts overlap
+        self._request_stop(processes)
+        for process in processes:
             process: ServiceProcess
             try:
                 process.stop()
@@ -105,6 +333,14 @@ class Executor:
                     f'failed. {self._meta_info=} with error: {e}'
                 )
 
+    def _request_stop(self, processes: list):
+        for process in processes:
+            process: ServiceProcess
+            try:
+                process.request_stop()
+            except Exception as e:
+                log.error(f'cubectl: executor: stop signal was not sent to {process.name}: {e}')
+
     def _do_jobs(self, jobs: dict):
         factory = {
             'get_report': self._send_report,
@@ -117,7 +353,12 @@ class Executor:
                 log.debug(f'cubectl: executor: executing job: {method}({jobs[method]})')
                 factory[method](**jobs[method])
 
-    def _update_processes(self, status_object: dict):
+    def _update_processes(self, status_object: dict, status_changed: bool = True):
+        """
+        Applies statuses of changed, exited and not yet settled processes.
+        If status file was not read again, only exited and not settled ones are checked.
+        """
+
         if status_object is None:
             log.warning(
                 'cubectl: executor: not status object was found to update processes.'
@@ -125,16 +366,27 @@ class Executor:
             return
         status = status_object
 
-        jobs: dict = status.get('jobs', {})
-        if jobs:
-            new_job_id = list(jobs.keys())[0]
-            if new_job_id != self._last_job:
-                self._last_job = new_job_id
-                self._do_jobs(jobs=jobs[new_job_id])
+        jobs: dict = status.get('jobs') or dict()
+        for job_id, job in jobs.items():
+            if job_id not in self._done_jobs:
+                self._done_jobs.add(job_id)
+                self._do_jobs(jobs=job)
+        self._done_jobs &= set(jobs)
 
+        exited = self._exit_notifier.pop_exited()
+        if exited:
+            log.debug(f'cubectl: executor: processes exited: {exited}')
+
+        if not status_changed and not exited and not self._to_revisit:
+            return
+
+        to_apply = []
+        fingerprints = dict()
         for process_status in status.get('services', []):
             init_config = process_status['init_config']
             process_name = init_config['name']
+            if not (status_changed or process_name in exited or process_name in self._to_revisit):
+                continue
 
             process = self._get_process_by_name(name=process_name)
             if not process:
@@ -142,9 +394,42 @@ class Executor:
                     f'cubectrl: executor: process {process_name} not found'
                 )
                 continue
-            process_status = ProcessStatus(**process_status)
-            process.apply_status(process_status)
 
+            fingerprint = _get_fingerprint(process_status)
+            if not (
+                    fingerprint != self._fingerprints.get(process_name)
+                    or process_name in exited
+                    # retry of start is pending
+                    or process.state is ProcessState.failed_start_loop
+            ):
+                continue
+            fingerprints[process_name] = fingerprint
+            with self._profiler.phase('executor.validate_status'):
+                to_apply.append((process, ProcessStatus(**process_status)))
+
+        self._to_revisit = set()
+        if not to_apply:
+            return
+
+        # processes to be stopped get stop signal before statuses are applied,
+        # so `cubectl stop` does not wait stop_timeout of processes one by one
+        self._request_stop([
+            process for process, process_status in to_apply
+            if process_status.system_data.state == ProcessState.stopped
+        ])
+        with self._profiler.phase('executor.apply_statuses'):
+            failed = self._apply_statuses(to_apply)
+        for process, process_status in to_apply:
+            # e.g. start failed without exit to be notified about or retry of start
+            # is pending, applied again next cycle; not restarted one is left as it is
+            if process.name in failed or (
+                    process.state != process_status.system_data.state and not process.gave_up
+            ):
+                self._to_revisit.add(process.name)
+                continue
+            self._fingerprints[process.name] = fingerprints[process.name]
+
+        for process, _ in to_apply:
             if process.is_failed_to_start():
                 if not process.is_informed_about_fail():
                     self._message_process_status(process=process)
@@ -152,69 +437,305 @@ class Executor:
             else:
                 process.informed_about_fail_reset()
 
+    def _apply_statuses(self, to_apply: list) -> set:
+        """
+        Applies desired statuses, in parallel if concurrency > 1.
+
+        Returns:
+            names of processes status was not applied to.
+        """
+
+        failed = set()
+        if self._concurrency == 1 or len(to_apply) <= 1:
+            for process, process_status in to_apply:
+                try:
+                    process.apply_status(process_status)
+                except Exception as e:
+                    self._on_apply_status_failed(process, e, failed)
+            return failed
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self._concurrency,
+                thread_name_prefix='cubectl_apply_status',
+            )
+
+        futures = {
+            self._pool.submit(process.apply_status, process_status): process
+            for process, process_status in to_apply
+        }
+        for future, process in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                self._on_apply_status_failed(process, e, failed)
+        return failed
+
+    def _on_apply_status_failed(self, process: ServiceProcess, error: Exception, failed: set):
+        failed.add(process.name)
+        log.error(
+            f'cubectl: executor: applying status to {process.name} '
+            f'failed. {self._meta_info=} with error: {error}'
+        )
+
     def _health_check(self):
         self._update_processes(status_object=self._last_status)
 
     def _get_status(self):
-        with self._status_file.open() as f:
-            status = yaml.load(f, Loader=yaml.FullLoader)
-        return status
+        return read_state(self._status_file)
 
     def _is_status_file_changed(self):
-        last_change = int(self._status_file.stat().st_mtime)
+        return self._status_file_watcher.is_changed()
 
-        if last_change != self._status_file_last_change:
-            self._status_file_last_change = last_change
-            return True
+    @property
+    def is_running(self) -> bool:
+        return self._running
 
-        return False
+    def shutdown(self):
+        """Asks process loop (or supervisor) to stop processes and exit."""
 
-    def process(self, cycle_period: int = 1):
-        first_cycle = True
+        self._running = False
+        self._wakeup.set()
+
+    def setup(self):
+        """Starts listening for commands and status file changes."""
+
+        if self._control_server is not None:
+            try:
+                self._control_server.start()
+            except OSError as e:
+                log.error(f'cubectl: executor: control channel was not started: {e}')
+                self._control_server = None
+        self._status_file_watcher.start()
+
+    def cycle(self):
+        """Applies status file to processes once."""
+
+        started_at = time.perf_counter()
+        try:
+            with self._lock:
+                status_changed = self._is_status_file_changed() or self._last_status is None
+                if status_changed:
+                    with self._profiler.phase('executor.read_status'):
+                        self._reread_status()
+
+                with self._profiler.phase('executor.update_processes'):
+                    self._update_processes(status_object=self._last_status, status_changed=status_changed)
+                with self._profiler.phase('executor.sample_resources'):
+                    self._sample_resources()
+                self._check_soft_limits()
+        finally:
+            duration = time.perf_counter() - started_at
+            self._cycle_duration.observe(duration)
+            if self._profiler.enabled:
+                self._profiler.record('executor.cycle', duration)
+
+    def collect_metrics(self) -> list[MetricFamily]:
+        """
+        Returns metrics of processes and of reconcile loop.
+
+        Called from exporter thread, so lock is not taken: metrics are
+        built from last known state and are never blocked by slow cycle.
+        """
+
+        app = (self._meta_info or dict()).get('app') or str(self._status_file)
+        state = MetricFamily(
+            'cubectl_process_state', 'gauge', 'Current state of process, 1 for current state.'
+        )
+        restarts = MetricFamily(
+            'cubectl_process_restarts_total', 'counter', 'Number of times process was started again.'
+        )
+        retries = MetricFamily(
+            'cubectl_process_start_retries_left', 'gauge', 'Start retries left before FAILED_TO_START.'
+        )
+        uptime = MetricFamily(
+            'cubectl_process_uptime_seconds', 'gauge', 'Seconds since process was started.'
+        )
+        cpu = MetricFamily(
+            'cubectl_process_cpu_percent', 'gauge', 'CPU usage of process and its children.'
+        )
+        rss = MetricFamily(
+            'cubectl_process_resident_memory_bytes', 'gauge', 'RSS of process and its children.'
+        )
+        cycle_duration = MetricFamily(
+            'cubectl_reconcile_duration_seconds', 'histogram', 'Duration of reconcile cycle of watcher.'
+        )
+
+        for process in list(self._processes):
+            labels = {'app': app, 'process': process.name}
+            for process_state in ProcessState:
+                state.add({**labels, 'state': process_state.value}, int(process.state == process_state))
+            restarts.add(labels, process.restarts)
+            retries.add(labels, process.start_retries_left)
+            uptime.add(labels, round(process.uptime or 0, 3))
+
+            usage = process.resources
+            if usage is not None:
+                if usage.cpu_percent is not None:
+                    cpu.add(labels, usage.cpu_percent)
+                rss.add(labels, usage.rss)
+
+        self._cycle_duration.add_to(cycle_duration, {'app': app})
+        return [state, restarts, retries, uptime, cpu, rss, cycle_duration]
+
+    def _sample_resources(self):
+        # children of processes are looked up once per pass
+        process_table = ProcessTable()
+        for process in self._processes:
+            try:
+                process.sample_resources(process_table=process_table)
+            except Exception as e:
+                log.error(f'cubectl: executor: resources of {process.name} were not sampled: {e}')
+
+    def _check_soft_limits(self):
+        """
+        Restarts processes which exceeded soft resource limits. Cycle does not
+        wait for them to stop: they are started again by reconcile once they
+        exit, and killed by next cycles if they outlive stop_timeout.
+        """
+
+        for process in self._processes:
+            process.enforce_stop_timeout()
+            exceeded = process.check_soft_limits()
+            if exceeded is None:
+                continue
+
+            note = f'soft limit exceeded: {exceeded}, restarting'
+            log.warning(f'cubectl: executor: {process.name}: {note}')
+            try:
+                process.request_stop()
+            except Exception as e:
+                log.error(f'cubectl: executor: restart of {process.name} failed: {e}')
+            self._notify_soft_limit(process=process, note=note)
+
+    def _notify_soft_limit(self, process: ServiceProcess, note: str):
+        """Notifies at most once per soft_limit_notification_interval per process."""
+
+        now = time.monotonic()
+        notified_at, not_notified = self._soft_limit_notifications.get(process.name, (None, 0))
+        if notified_at is not None and now - notified_at < self._soft_limit_notification_interval:
+            self._soft_limit_notifications[process.name] = (notified_at, not_notified + 1)
+            return
 
+        if not_notified:
+            note = f'{note} ({not_notified} more restarts since last notification)'
+        self._soft_limit_notifications[process.name] = (now, 0)
+        self._message_process_status(process=process, note=note)
+
+    def _reread_status(self):
         try:
-            while True:
-                if self._is_status_file_changed() or first_cycle:
-                    first_cycle = False
-                    self._last_status = self._get_status()
+            self._last_status = self._get_status()
+        except Exception as e:
+            if self._last_status is None:
+                raise
+            log.error(
+                f'cubectl: executor: status file {self._status_file} was not '
+                f'read, last known status is kept: {e}'
+            )
 
-                self._update_processes(status_object=self._last_status)
+    def close(self):
+        if self._control_server is not None:
+            self._control_server.close()
+        self._exit_notifier.close()
+        self._status_file_watcher.close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+        self._notifiers.close()
 
-                sleep(cycle_period)
+    def process(self, cycle_period: int = 1):
+        self.setup()
+
+        try:
+            while self._running:
+                self.cycle()
+                self._profiler.report_if_due()
+
+                # wakes up earlier if any of processes exited, status file
+                # was changed or backoff of crashed process is over
+                self._wakeup.wait(timeout=self.get_wait_timeout(cycle_period))
+                self._wakeup.clear()
+            self._stop_all_processes()
         except KeyboardInterrupt:
             self._stop_all_processes()
         except Exception as e:
             self._stop_all_processes()
             log.critical(f'cubectl: executor: process loop failed: error: {e}')
+        finally:
+            self.close()
+
+    def get_wait_timeout(self, cycle_period: float) -> float:
+        """
+        Time before next cycle, shorter if crashed process is to be restarted
+        or stopping process is to be killed earlier.
+        """
+
+        delays = [
+            delay for x in self._processes
+            for delay in (x.restart_delay, x.stop_timeout_left) if delay is not None
+        ]
+        return min([cycle_period, *delays])
 
     def add_messanger(self, messanger: Messanger):
         self._messanger = messanger
 
-    def _send_logs(self, services: tuple, buffer_file: str, latest: bool = True):
+    def _send_logs(self, services: tuple, buffer_file: str, latest: bool = True, **limits):
         if not services:
             services = [x.name for x in self._processes]
-        logs = self._get_logs(services=services, latest=latest)
-
-        with Path(buffer_file).open('w') as f:
-            yaml.dump(logs, f)
-
-    def _get_logs(self, services: tuple, latest: bool = True) -> dict:
+        logs = self._get_logs(services=services, latest=latest, **limits)
+
+        write_state(buffer_file, logs)
+
+    def _get_logs(
+            self,
+            services: tuple,
+            latest: bool = True,
+            head: int = None,
+            tail: int = None,
+            n_bytes: int = None,
+    ) -> dict:
         result = dict()
         for process in self._processes:
             if process.name in services:
                 process: ServiceProcess
-                result[process.name] = process.get_logs(latest=latest)
+                result[process.name] = process.get_logs(
+                    latest=latest, head=head, tail=tail, n_bytes=n_bytes
+                )
         return result
 
     def _message_process_status(self, process: ServiceProcess, note: str = None):
-        if not self._messanger:
+        if not self._messanger and not self._notifiers:
             log.warning('cubectl: executor: no messanger was supplied.')
             return
 
-        message = {
-            'process_name': process.name,
-            'state': process.state,
-            'note': note,
-            'meta_info': self._meta_info,
-        }
-        self._messanger.post(message=message)
+        message = create_event(
+            'process_state',
+            app=(self._meta_info or dict()).get('app'),
+            process_name=process.name,
+            state=ProcessState(process.state).value,
+            exit_code=process.exit_code,
+            restarts=process.restarts,
+            note=note,
+            meta_info=self._meta_info,
+        )
+        with self._profiler.phase('executor.message'):
+            if _is_failure(process) and self._log_tail_lines and self._log_tail_bytes:
+                message['log_tail'] = process.get_log_tail(
+                    lines=self._log_tail_lines, max_bytes=self._log_tail_bytes
+                )
+            if self._messanger:
+                self._messanger.post(message=message)
+            self._notifiers.post(message=message)
+
+
+def _is_failure(process: ServiceProcess) -> bool:
+    return (
+        process.state in (ProcessState.failed_start_loop, ProcessState.failed_to_start)
+        or process.exit_code not in (None, 0)
+    )
+
+
+def _get_fingerprint(process_status: dict) -> str:
+    """Returns hash of desired status of process from status file."""
+
+    dumped = json.dumps(process_status, sort_keys=True, default=str)
+    return hashlib.blake2b(dumped.encode(), digest_size=16).hexdigest()
@@ -1,8 +1,9 @@
-import yaml
 from pathlib import Path
 import logging
 
 from cubectl.src.utils import resolve_path
+from cubectl.src.utils import read_state, write_state, get_state_file_name
+from cubectl.src.utils import lock_state, update_state, remove_state
 
 from cubectl.src.models import (
     RegisterEntity,
@@ -18,6 +19,9 @@ from cubectl.src.models import (
 
 __all__ = [
     "register_application",
+    "unregister_application",
+    "set_watcher_pid",
+    "migrate_register",
     "create_status_object",
 ]
 
@@ -29,6 +33,7 @@ def register_application(
         register_path: str,
         temp_files_dir: str,
         reinit: bool = False,
+        state_format: str = 'yaml',
 ):
     """Writes new application to register.yaml file."""
 
@@ -36,10 +41,12 @@ def register_application(
     app_name = init_config.installation_name
     register_path = Path(register_path)
 
+    app_dir = f'{temp_files_dir}/{app_name}'
     temp_files = {
-        'status_file': f'{temp_files_dir}/{app_name}/status.yaml',
-        'status_report': f'{temp_files_dir}/{app_name}/status_report.yaml',
-        'log_buffer': f'{temp_files_dir}/{app_name}/log_buffer.yaml',
+        'status_file': f'{app_dir}/{get_state_file_name("status", state_format)}',
+        'status_report': f'{app_dir}/{get_state_file_name("status_report", state_format)}',
+        'log_buffer': f'{app_dir}/{get_state_file_name("log_buffer", state_format)}',
+        'control_socket': f'{app_dir}/control.sock',
     }
     status_file = temp_files['status_file']
 
@@ -48,38 +55,29 @@ def register_application(
         **temp_files,
     )
 
-    register_from_file = None
+    register_path.parent.mkdir(parents=True, exist_ok=True)
 
-    if register_path.is_file():
-        with register_path.open() as f:
-            register_from_file = yaml.load(f, Loader=yaml.FullLoader)
-    else:
-        register_dir = register_path.parent
-        register_dir.mkdir(parents=True, exist_ok=True)
+    with update_state(register_path, default=list()) as register:
+        registered_apps = [x['app_name'] for x in register]
 
-    register = register_from_file if register_from_file else list()
-    registered_apps = [x['app_name'] for x in register]
+        if app_name in registered_apps:
+            if reinit:
+                log.debug(f'cubectl: application_registration: application {app_name} '
+                          f'overriden in register')
+                register[:] = [x for x in register if x['app_name'] != app_name]
+            else:
+                message = (f'cubectl: application_registration: application {app_name} '
+                           f'was not overriden in register, because override is False'
+                           )
+                log.error(message)
+                raise ValueError(message)
 
-    if app_name in registered_apps:
-        if reinit:
-            log.debug(f'cubectl: application_registration: application {app_name} '
-                      f'overriden in register')
-            register = [x for x in register if x['app_name'] != app_name]
-        else:
-            message = (f'cubectl: application_registration: application {app_name} '
-                       f'was not overriden in register, because override is False'
-                       )
-            log.error(message)
-            raise ValueError(message)
-
-    register.append(entity.dict())
-
-    with register_path.open('w') as f:
-        yaml.dump(register, f, Dumper=yaml.Dumper)
-        log.debug(
-            f'cubectl: application_registration: status_file: {status_file}, '
-            f'registered in: {register_path}'
-        )
+        register.append(entity.dict())
+
+    log.debug(
+        f'cubectl: application_registration: status_file: {status_file}, '
+        f'registered in: {register_path}'
+    )
     return temp_files
 
 
@@ -87,9 +85,71 @@ def unregister_application(
         app_name: str,
         register_path: str,
 ):
-    """Writes new application to register.yaml file."""
+    """Removes application from register file."""
+
+    with update_state(register_path, default=list()) as register:
+        register[:] = [x for x in register if x['app_name'] != app_name]
+
+
+def set_watcher_pid(register_path: str, app_names: list, watcher_pid: int):
+    """Saves pid of watcher process managing applications to register."""
+
+    with update_state(register_path, default=list()) as register:
+        for app in register:
+            if app['app_name'] in app_names:
+                app['watcher_pid'] = watcher_pid
+
+
+def migrate_register(register_path: str, state_format: str) -> str:
+    """
+    Converts register and state files of all applications to state_format.
+    Watchers should be restarted after migration.
+
+    Returns:
+        location of migrated register.
+    """
 
     register_path = Path(register_path)
+    with lock_state(register_path):
+        register = read_state(register_path) or list()
+        new_register_path = _migrate_register_files(
+            register=register,
+            register_path=register_path,
+            state_format=state_format,
+        )
+    if new_register_path != register_path:
+        remove_state(register_path)
+    log.debug(
+        f'cubectl: application_registration: register migrated to '
+        f'{new_register_path}'
+    )
+    return str(new_register_path)
+
+
+def _migrate_register_files(register: list, register_path: Path, state_format: str) -> Path:
+    for app in register:
+        for key in ('status_file', 'status_report', 'log_buffer'):
+            if not app.get(key):
+                continue
+            old_file = Path(app[key])
+            new_file = Path(
+                old_file.parent, get_state_file_name(old_file.stem, state_format)
+            )
+            if new_file == old_file:
+                continue
+            if old_file.is_file():
+                with lock_state(old_file):
+                    write_state(new_file, read_state(old_file))
+                remove_state(old_file)
+            app[key] = str(new_file)
+
+    new_register_path = Path(
+        register_path.parent,
+        get_state_file_name(register_path.stem, state_format)
+    )
+    write_state(new_register_path, register)
+    return new_register_path
+
 
 def init_service_status(root_dir, process_init_config: InitProcessConfig):
     """
@@ -199,7 +259,8 @@ def create_status_object(init_config: dict) -> SetupStatus:
     init_config = InitFileModel(**init_config)
     status = SetupStatus(
         jobs=init_jobs(init_config),
-        services=init_services_status(init_config)
+        services=init_services_status(init_config),
+        notifiers=init_config.notifiers,
     )
 
     return status
@@ -1,4 +1,7 @@
 from cubectl.src.models.configurator_request import *
 from cubectl.src.models.init_application import *
 from cubectl.src.models.init_process import *
+from cubectl.src.models.notifier import *
 from cubectl.src.models.setup_status import *
+from cubectl.src.models.output_capture import *
+from cubectl.src.models.log_cursor import *
@@ -2,6 +2,7 @@ from typing import Optional, Union
 from pydantic import BaseModel, validator
 
 from cubectl.src.models.init_process import InitProcessConfig
+from cubectl.src.models.notifier import NotifierConfig
 
 
 __all__ = [
@@ -15,6 +16,7 @@ class RegisterEntity(BaseModel):
     status_file: str
     status_report: Optional[str]
     log_buffer: Optional[str]
+    control_socket: Optional[str]
     watcher_pid: Optional[Union[str, int]]
 
 
@@ -25,3 +27,5 @@ class InitFileModel(BaseModel):
     tear_down_commands: list = []
     root_dir: Optional[str]
     processes: list[InitProcessConfig] = []
+    # notifications about processes of application, in addition to ones from env
+    notifiers: list[NotifierConfig] = []
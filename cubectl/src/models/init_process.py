@@ -1,11 +1,91 @@
-from typing import Optional
-from pydantic import BaseModel
+import signal
+from enum import Enum
+from typing import Optional, Union
+from pydantic import BaseModel, validator
 
 
 __all__ = [
+    "ProcessLimits",
+    "RestartPolicyName",
+    "RestartPolicy",
     "InitProcessConfig",
+    "parse_size",
+    "parse_signal",
 ]
 
+_SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(size: Union[int, str, None]) -> Optional[int]:
+    """Converts size like 512M or 2G to bytes."""
+
+    if size is None or isinstance(size, int):
+        return size
+    size = str(size).strip().upper().rstrip('B')
+    if size and size[-1] in _SIZE_UNITS:
+        return int(float(size[:-1]) * _SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+def parse_signal(value: Union[int, str]) -> signal.Signals:
+    """Converts signal like SIGTERM, TERM, term or 15 to signal.Signals."""
+
+    if isinstance(value, signal.Signals):
+        return value
+    if isinstance(value, int) or str(value).isdigit():
+        return signal.Signals(int(value))
+    name = str(value).strip().upper()
+    name = name if name.startswith('SIG') else f'SIG{name}'
+    if name not in signal.Signals.__members__:
+        raise ValueError(f'unknown signal: {value}')
+    return signal.Signals[name]
+
+
+class ProcessLimits(BaseModel):
+    # hard limits, applied on start up of process
+    max_memory: Optional[int]             # bytes (512M, 2G), cgroup memory.max or RLIMIT_AS
+    max_cpu_percent: Optional[float]      # 100 is one core, cgroup v2 only
+    max_cpu_time: Optional[int]           # seconds of CPU time, RLIMIT_CPU
+    max_open_files: Optional[int]         # RLIMIT_NOFILE
+    nice: Optional[int]                   # -20 (highest priority) .. 19
+    ionice_class: Optional[int]           # 1 realtime, 2 best-effort, 3 idle
+    ionice_level: Optional[int]           # 0 (highest priority) .. 7
+
+    # soft limits, process is restarted by watcher when exceeded
+    soft_max_rss: Optional[int]           # bytes of process and its children
+    soft_max_cpu_percent: Optional[float] # average within sampling window
+
+    @validator('max_memory', 'soft_max_rss', pre=True)
+    def _parse_size(cls, value):
+        return parse_size(value)
+
+
+class RestartPolicyName(str, Enum):
+    always = 'always'
+    on_failure = 'on-failure'
+    never = 'never'
+
+
+class RestartPolicy(BaseModel):
+    policy: RestartPolicyName = RestartPolicyName.always  # restart on exit with any code, non-zero, never
+    backoff: float = 1                    # seconds before second restart within crash_window, first is immediate
+    backoff_multiplier: float = 2         # delay is multiplied for every next crash
+    max_backoff: float = 60               # seconds
+    jitter: float = 0.2                   # delay is randomized by +-20%
+    max_crashes: Optional[int]            # within crash_window before FAILED_TO_START, number_of_start_retries if not set
+    crash_window: float = 300             # seconds crashes are counted within
+    stable_uptime: float = 60             # seconds of uptime after which crashes are forgotten
+
+    class Config:
+        use_enum_values = True
+
+    def should_restart(self, exit_code: int) -> bool:
+        if self.policy == RestartPolicyName.never.value:
+            return False
+        if self.policy == RestartPolicyName.on_failure.value:
+            return exit_code != 0
+        return True
+
 
 class InitProcessConfig(BaseModel):
     name: str
@@ -20,3 +100,17 @@ class InitProcessConfig(BaseModel):
     service: bool = True                  # if true (default false) assigns port and nginx config
     port: Optional[int]
     log: Optional[str]                    # location of log-file
+    limits: Optional[ProcessLimits]       # resource limits of process
+    restart: RestartPolicy = RestartPolicy()  # `restart: on-failure` is short for `restart: {policy: on-failure}`
+    stop_signal: str = 'SIGTERM'          # sent to process group on stop (SIGINT, SIGQUIT, 15...)
+    stop_timeout: float = 10              # seconds before process group is killed with SIGKILL
+
+    @validator('restart', pre=True)
+    def _parse_restart(cls, value):
+        if isinstance(value, str):
+            return {'policy': value}
+        return value if value is not None else dict()
+
+    @validator('stop_signal', pre=True)
+    def _parse_stop_signal(cls, value):
+        return parse_signal(value).name
@@ -0,0 +1,13 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+__all__ = [
+    "LogCursor",
+]
+
+
+class LogCursor(BaseModel):
+    offset: int = 0                       # position in log file read by client
+    inode: Optional[int]                  # log file cursor belongs to
+    updated_at: float = 0                 # time of last use (time.time())
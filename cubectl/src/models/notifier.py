@@ -0,0 +1,34 @@
+from enum import Enum
+from typing import Optional, Union
+from pydantic import BaseModel
+
+
+__all__ = [
+    "NotifierType",
+    "NotifierConfig",
+]
+
+
+class NotifierType(str, Enum):
+    telegram = 'telegram'
+    webhook = 'webhook'
+    unix_socket = 'unix_socket'
+    jsonl = 'jsonl'
+    syslog = 'syslog'
+
+
+class NotifierConfig(BaseModel):
+    type: NotifierType
+    url: Optional[str]                    # webhook: events are POSTed as json lines
+    headers: dict[str, str] = dict()      # webhook: e.g. Authorization
+    path: Optional[str]                   # unix_socket: socket, jsonl: file events are appended to
+    address: Optional[str]                # syslog: /dev/log (default) or host:port (udp)
+    facility: str = 'user'                # syslog
+    tag: str = 'cubectl'                  # syslog
+    token: Optional[str]                  # telegram: CUBECTL_TELEGRAM_TOKEN if not set
+    chat_ids: Optional[Union[str, int, list]]  # telegram: CUBECTL_TELEGRAM_CHAT_IDS if not set
+    timeout: Optional[float]              # seconds, notification_timeout from config if not set
+    max_length: Optional[int]             # except telegram: log tail is shortened to fit (syslog: 8192)
+
+    class Config:
+        use_enum_values = True
@@ -0,0 +1,14 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+__all__ = [
+    "OutputCaptureConfig",
+]
+
+
+class OutputCaptureConfig(BaseModel):
+    log_dir: Optional[str]                # output is kept only in memory if not set
+    max_bytes: int = 10 * 1024 * 1024     # size of log file before rotation
+    backup_count: int = 3                 # number of rotated files kept (<name>.log.1 ...)
+    buffer_lines: int = 1000              # number of recent lines kept in memory
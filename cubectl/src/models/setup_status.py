@@ -2,11 +2,12 @@ from pydantic import BaseModel
 from typing import Optional
 from enum import Enum
 
-from cubectl.src.models import InitProcessConfig
+from cubectl.src.models import InitProcessConfig, NotifierConfig
 
 
 __all__ = [
     "ProcessState",
+    "ResourceUsage",
     "SystemData",
     "ServiceData",
     "ProcessStatus",
@@ -21,11 +22,20 @@ class ProcessState(str, Enum):
     failed_to_start = 'FAILED_TO_START'
 
 
+class ResourceUsage(BaseModel):
+    cpu_percent: Optional[float]          # None until second sample
+    rss: int = 0                          # bytes
+    open_fds: int = 0
+    threads: int = 0
+    processes: int = 1                    # process and its children
+
+
 class SystemData(BaseModel):
     pid: Optional[int]
     state: ProcessState
     error_code: Optional[int]
     started_at: Optional[str]
+    resources: Optional[ResourceUsage]
 
     class Config:  
         use_enum_values = True
@@ -48,3 +58,4 @@ JobName = str
 class SetupStatus(BaseModel):
     jobs: dict[JobName, object] = dict()
     services: list[ProcessStatus] = list()
+    notifiers: list[NotifierConfig] = list()
@@ -1 +1,4 @@
 from cubectl.src.service_process.service_process import ServiceProcess
+from cubectl.src.service_process.exit_notifier import ExitNotifier
+from cubectl.src.service_process.resource_sampler import ResourceSampler, ProcessTable
+from cubectl.src.service_process.limits import CgroupLimiter
@@ -0,0 +1,156 @@
+import os
+import select
+import logging
+import threading
+from typing import Callable, Optional
+
+
+__all__ = [
+    "ExitNotifier",
+]
+
+log = logging.getLogger(__file__)
+
+
+class ExitNotifier:
+    """
+    Pushes child exit notifications instead of polling processes state.
+
+    Every watched pid is tracked with pidfd (linux >= 5.3) from one
+    background thread. If pidfd is not available each pid is waited in its
+    own thread with `os.waitid(..., WEXITED | WNOWAIT)`.
+
+    Neither of backends reaps child, so `Popen.poll()` still returns
+    proper return code afterwards.
+    """
+
+    def __init__(self, on_exit: Optional[Callable[[str], None]] = None):
+        """
+        Arguments:
+            on_exit: called from notifier thread with process name
+                every time watched process exits.
+        """
+
+        self._on_exit = on_exit
+        self._lock = threading.Lock()
+        self._exited: set[str] = set()
+        self._event = threading.Event()
+
+        self._use_pidfd = _is_pidfd_supported()
+        self._poller = None
+        self._pidfds: dict[int, str] = dict()
+        self._wakeup_r, self._wakeup_w = None, None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def watch(self, name: str, pid: int):
+        if self._closed:
+            return
+
+        if not self._use_pidfd:
+            threading.Thread(
+                target=self._waitid_worker, args=(name, pid), daemon=True
+            ).start()
+            return
+
+        try:
+            pidfd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            # process has already exited and was reaped
+            self._notify(name)
+            return
+
+        with self._lock:
+            self._ensure_pidfd_thread()
+            self._pidfds[pidfd] = name
+            self._poller.register(pidfd, select.POLLIN)
+        os.write(self._wakeup_w, b'\0')
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until some process exits or timeout is over."""
+
+        return self._event.wait(timeout)
+
+    def pop_exited(self) -> set:
+        """Returns names of processes exited since last call."""
+
+        with self._lock:
+            exited = self._exited
+            self._exited = set()
+            self._event.clear()
+        return exited
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._wakeup_w is not None:
+            os.write(self._wakeup_w, b'\0')
+
+    def _notify(self, name: str):
+        with self._lock:
+            self._exited.add(name)
+            self._event.set()
+
+        if self._on_exit is not None:
+            try:
+                self._on_exit(name)
+            except Exception as e:
+                log.error(f'cubectl: exit_notifier: on_exit callback failed: {e}')
+
+    def _ensure_pidfd_thread(self):
+        if self._thread is not None:
+            return
+
+        self._poller = select.poll()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        self._poller.register(self._wakeup_r, select.POLLIN)
+        self._thread = threading.Thread(target=self._pidfd_worker, daemon=True)
+        self._thread.start()
+
+    def _pidfd_worker(self):
+        while not self._closed:
+            for fd, _ in self._poller.poll():
+                if fd == self._wakeup_r:
+                    try:
+                        os.read(self._wakeup_r, 1024)
+                    except BlockingIOError:
+                        pass
+                    continue
+
+                with self._lock:
+                    name = self._pidfds.pop(fd, None)
+                    self._poller.unregister(fd)
+                os.close(fd)
+                if name is not None:
+                    self._notify(name)
+
+        with self._lock:
+            for fd in self._pidfds:
+                os.close(fd)
+            self._pidfds.clear()
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+    def _waitid_worker(self, name: str, pid: int):
+        try:
+            os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+        except ChildProcessError:
+            # already reaped by Popen.poll()
+            pass
+        except Exception as e:
+            log.error(f'cubectl: exit_notifier: waitid for {name} failed: {e}')
+            return
+        if not self._closed:
+            self._notify(name)
+
+
+def _is_pidfd_supported() -> bool:
+    if not hasattr(os, 'pidfd_open') or not hasattr(select, 'poll'):
+        return False
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return False
+    return True
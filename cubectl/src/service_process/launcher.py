@@ -0,0 +1,87 @@
+"""
+Applies hard limits to itself and replaces itself with command of process:
+
+    python -I launcher.py '{"rlimits": {"RLIMIT_NOFILE": 64}, "nice": 5}' executor file ...
+
+Limits are set before exec, so they are inherited by every child forked by
+process. Only standard library is used, as launcher is run by interpreter
+of watcher with environment of process.
+"""
+
+import os
+import sys
+import json
+import ctypes
+import ctypes.util
+import platform
+
+try:
+    import resource
+except ImportError:  # not unix
+    resource = None
+
+
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+_SYS_IOPRIO_SET = {'x86_64': 251, 'aarch64': 30, 'i686': 289, 'armv7l': 314}
+# exit code of shell for command not found
+_EXIT_NOT_EXECUTED = 127
+
+
+def main(argv: list) -> int:
+    limits = json.loads(argv[0])
+    command = argv[1:]
+
+    # joined first, children of process are created in cgroup
+    if limits.get('cgroup'):
+        try:
+            with open(os.path.join(limits['cgroup'], 'cgroup.procs'), 'w') as f:
+                f.write(str(os.getpid()))
+        except OSError as e:
+            _error(f'cgroup {limits["cgroup"]} was not joined: {e}')
+
+    for rlimit, value in (limits.get('rlimits') or dict()).items():
+        try:
+            resource.setrlimit(getattr(resource, rlimit), (value, value))
+        except (AttributeError, OSError, ValueError) as e:
+            _error(f'rlimit {rlimit} was not set: {e}')
+
+    if limits.get('nice') is not None:
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, limits['nice'])
+        except OSError as e:
+            _error(f'nice was not set: {e}')
+
+    if limits.get('ionice'):
+        try:
+            _set_io_priority(*limits['ionice'])
+        except OSError as e:
+            _error(f'ionice was not set: {e}')
+
+    try:
+        os.execvp(command[0], command)
+    except OSError as e:
+        _error(f'{command[0]} was not executed: {e}')
+    return _EXIT_NOT_EXECUTED
+
+
+def _set_io_priority(io_class: int, level: int):
+    syscall_number = _SYS_IOPRIO_SET.get(platform.machine())
+    if syscall_number is None:
+        raise OSError(f'ioprio_set is not supported on {platform.machine()}')
+
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    priority = (io_class << _IOPRIO_CLASS_SHIFT) | level
+    # pid 0 is calling process
+    if libc.syscall(syscall_number, _IOPRIO_WHO_PROCESS, 0, priority) < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def _error(message: str):
+    # stderr of process is captured to its output log
+    print(f'cubectl: launcher: {message}', file=sys.stderr, flush=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
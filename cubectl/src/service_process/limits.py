@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+
+from cubectl.src.models import ProcessLimits, ResourceUsage
+
+try:
+    import resource
+except ImportError:  # not unix
+    resource = None
+
+
+__all__ = [
+    "CgroupLimiter",
+    "get_limits_command",
+    "get_exceeded_soft_limit",
+]
+
+log = logging.getLogger(__file__)
+
+_CPU_PERIOD = 100000  # microseconds, cpu.max period
+_LAUNCHER = Path(__file__).with_name('launcher.py')
+
+
+class CgroupLimiter:
+    """
+    Creates own cgroup v2 `root/app/name` for every process and sets
+    memory.max and cpu.max there. Root has to be cgroup delegated to user running
+    watcher, with memory and cpu controllers enabled for its children.
+    """
+
+    def __init__(self, root: str, app: Optional[str] = None):
+        self._root = Path(root)
+        # processes with same name of different applications do not share cgroup
+        self._parent = Path(root, app) if app else self._root
+
+    def is_available(self) -> bool:
+        try:
+            controllers = Path(self._root, 'cgroup.controllers').read_text().split()
+        except OSError:
+            return False
+        return (
+            {'memory', 'cpu'} <= set(controllers)
+            and os.access(self._root, os.W_OK)
+        )
+
+    def prepare(self, name: str, limits: ProcessLimits) -> Path:
+        """
+        Creates cgroup of process, which is joined by process itself before exec.
+
+        Returns:
+            path of cgroup.
+
+        Raises:
+            OSError: if cgroup was not set up.
+        """
+
+        if self._parent != self._root:
+            self._parent.mkdir(exist_ok=True)
+            # controllers are enabled for cgroups of processes of application
+            Path(self._parent, 'cgroup.subtree_control').write_text('+memory +cpu')
+
+        cgroup = Path(self._parent, name)
+        cgroup.mkdir(exist_ok=True)
+
+        memory_max = 'max' if limits.max_memory is None else str(limits.max_memory)
+        Path(cgroup, 'memory.max').write_text(memory_max)
+
+        cpu_max = 'max'
+        if limits.max_cpu_percent is not None:
+            cpu_max = str(int(limits.max_cpu_percent / 100 * _CPU_PERIOD))
+        Path(cgroup, 'cpu.max').write_text(f'{cpu_max} {_CPU_PERIOD}')
+        return cgroup
+
+    def remove(self, name: str):
+        """Removes cgroup of stopped process and cgroup of application if it is left empty."""
+
+        for cgroup in (Path(self._parent, name), self._parent):
+            if cgroup == self._root:
+                return
+            try:
+                cgroup.rmdir()
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                log.debug(f'cubectl: limits: cgroup {cgroup} was not removed: {e}')
+                return
+
+
+def get_limits_command(
+        name: str,
+        limits: Optional[ProcessLimits],
+        cgroup_limiter: Optional[CgroupLimiter] = None,
+) -> list:
+    """
+    Returns prefix of start up command which applies hard limits to process.
+
+    Limits are applied by launcher in child before exec, so children forked
+    by process inherit them too; preexec_fn is not used, as it is not safe
+    in multithreaded watcher. Memory and CPU share are limited with cgroup
+    if it is available, with RLIMIT_AS otherwise.
+    """
+
+    if limits is None:
+        return []
+
+    cgroup = None
+    if cgroup_limiter is not None and cgroup_limiter.is_available():
+        try:
+            cgroup = str(cgroup_limiter.prepare(name=name, limits=limits))
+        except OSError as e:
+            log.warning(f'cubectl: limits: cgroup was not set up for {name}: {e}')
+
+    if limits.max_cpu_percent is not None and cgroup is None:
+        log.warning(f'cubectl: limits: max_cpu_percent of {name} requires cgroup v2, ignored.')
+
+    rlimits = dict()
+    if resource is not None:
+        rlimits = {
+            'RLIMIT_CPU': limits.max_cpu_time,
+            'RLIMIT_NOFILE': limits.max_open_files,
+        }
+        if cgroup is None:
+            rlimits['RLIMIT_AS'] = limits.max_memory
+        rlimits = {k: v for k, v in rlimits.items() if v is not None}
+
+    ionice = None
+    if limits.ionice_class is not None:
+        ionice = [limits.ionice_class, limits.ionice_level or 0]
+
+    if not (cgroup or rlimits or limits.nice is not None or ionice):
+        return []
+
+    arguments = {'cgroup': cgroup, 'rlimits': rlimits, 'nice': limits.nice, 'ionice': ionice}
+    # isolated mode, environment of process does not affect launcher
+    return [sys.executable, '-I', str(_LAUNCHER), json.dumps(arguments)]
+
+
+def get_exceeded_soft_limit(
+        limits: Optional[ProcessLimits],
+        usage: Optional[ResourceUsage],
+        check_cpu: bool = True,
+) -> Optional[str]:
+    """
+    Returns description of exceeded soft limit or None. CPU usage is
+    checked only if `check_cpu`, so short spikes do not restart process.
+    """
+
+    if limits is None or usage is None:
+        return None
+
+    if limits.soft_max_rss is not None and usage.rss > limits.soft_max_rss:
+        return f'rss {usage.rss} > {limits.soft_max_rss}'
+
+    if (check_cpu
+            and limits.soft_max_cpu_percent is not None
+            and usage.cpu_percent is not None
+            and usage.cpu_percent > limits.soft_max_cpu_percent):
+        return f'cpu {usage.cpu_percent}% > {limits.soft_max_cpu_percent}%'
+
+    return None
@@ -0,0 +1,228 @@
+import logging
+import threading
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import IO, Optional
+
+from cubectl.src.models import OutputCaptureConfig
+from cubectl.src.utils import LogReader, DEFAULT_CURSOR
+
+
+__all__ = [
+    "OutputCapture",
+]
+
+log = logging.getLogger(__file__)
+
+READ_SIZE = 64 * 1024
+# longer lines are split, so memory used by buffer is bounded
+MAX_LINE_LENGTH = 16 * 1024
+
+
+class OutputCapture:
+    """
+    Collects stdout/stderr of process.
+
+    Pipe of every started process is drained by reader thread, so child
+    never blocks on full pipe. Output is appended to size-capped log file,
+    which is rotated to <name>.log.1 ... <name>.log.<backup_count>, and
+    recent lines are kept in memory.
+
+    Implements LogReaderProtocol: recent output is served from memory,
+    disk is read only for `head` of log. Ranges of log file are returned
+    for callers reading log file themselves.
+    """
+
+    def __init__(self, name: str, config: Optional[OutputCaptureConfig] = None):
+        self._name = name
+        self._config = config or OutputCaptureConfig()
+        self._log_file: Optional[Path] = None
+        self._file_reader: Optional[LogReader] = None
+        # cursors loaded before log file was created
+        self._cursors: dict = dict()
+        if self._config.log_dir:
+            self._log_file = Path(self._config.log_dir, f'{name}.log')
+
+        self._lines: deque[bytes] = deque(maxlen=self._config.buffer_lines)
+        # number of lines received in total, used as cursor of get_latest_log
+        self._lines_count = 0
+        self._read_cursor = 0
+        self._lock = threading.Lock()
+
+        self._file = None
+        self._readers = 0
+        self._write_failed = False
+
+    @property
+    def log_file(self) -> Optional[Path]:
+        return self._log_file
+
+    def attach(self, pipe: IO[bytes]):
+        """Starts draining of pipe of newly started process."""
+
+        with self._lock:
+            self._readers += 1
+        thread = threading.Thread(target=self._reader, args=(pipe,), daemon=True)
+        thread.start()
+
+    def get_log(self, head: int = None, tail: int = None, n_bytes: int = None):
+        if head:
+            file_reader = self._get_file_reader()
+            if file_reader is None:
+                return _format(list(self._lines)[:head])
+            return file_reader.get_log(head=head)
+
+        with self._lock:
+            lines = list(self._lines)
+            self._read_cursor = self._lines_count
+        return _format(lines, tail=tail, n_bytes=n_bytes)
+
+    def get_latest_log(self, head: int = None, tail: int = None, n_bytes: int = None):
+        """Returns lines received since previous call (if still in memory)."""
+
+        with self._lock:
+            new_lines_count = min(self._lines_count - self._read_cursor, len(self._lines))
+            lines = list(self._lines)[len(self._lines) - new_lines_count:]
+            self._read_cursor = self._lines_count
+
+        if head:
+            lines = lines[:head]
+        return _format(lines, tail=tail, n_bytes=n_bytes)
+
+    def get_tail(self, lines: int, max_bytes: int) -> str:
+        """Last lines of output from memory, cursors are not moved."""
+
+        if lines <= 0 or max_bytes <= 0:
+            return ''
+        with self._lock:
+            recent = list(islice(reversed(self._lines), lines))
+        return _format(recent[::-1], n_bytes=max_bytes)
+
+    def get_log_range(
+            self,
+            latest: bool = True,
+            head: int = None,
+            tail: int = None,
+            n_bytes: int = None,
+            cursor: str = DEFAULT_CURSOR,
+            ack: bool = True,
+    ) -> Optional[dict]:
+        file_reader = self._get_file_reader()
+        if file_reader is None:
+            return None
+        return file_reader.get_log_range(
+            latest=latest, head=head, tail=tail, n_bytes=n_bytes, cursor=cursor, ack=ack
+        )
+
+    def ack_log(self, cursor: str, offset: int):
+        file_reader = self._get_file_reader()
+        if file_reader is not None:
+            file_reader.ack_log(cursor=cursor, offset=offset)
+
+    def get_cursors(self) -> dict:
+        file_reader = self._get_file_reader()
+        return file_reader.get_cursors() if file_reader else dict(self._cursors)
+
+    def set_cursors(self, cursors: dict):
+        file_reader = self._get_file_reader()
+        if file_reader is None:
+            self._cursors.update(cursors)
+        else:
+            file_reader.set_cursors(cursors)
+
+    def expire_cursors(self, ttl: float):
+        file_reader = self._get_file_reader()
+        if file_reader is not None:
+            file_reader.expire_cursors(ttl)
+
+    def _get_file_reader(self) -> Optional[LogReader]:
+        # log file is created on first output
+        if self._file_reader is None and self._log_file and self._log_file.is_file():
+            self._file_reader = LogReader(str(self._log_file))
+            self._file_reader.set_cursors(self._cursors)
+        return self._file_reader
+
+    def _reader(self, pipe: IO[bytes]):
+        partial = b''
+        try:
+            with pipe:
+                while True:
+                    data = pipe.read1(READ_SIZE)
+                    if not data:
+                        break
+                    lines = (partial + data).split(b'\n')
+                    partial = lines.pop()
+                    if len(partial) > MAX_LINE_LENGTH:
+                        lines.append(partial)
+                        partial = b''
+                    self._add(data, [x + b'\n' for x in lines])
+        except Exception as e:
+            log.error(f'cubectl: output_capture: reading output of {self._name} failed: {e}')
+        finally:
+            with self._lock:
+                if partial:
+                    self._add_lines([partial + b'\n'])
+                self._readers -= 1
+                if self._readers == 0:
+                    self._close_file()
+
+    def _add(self, data: bytes, lines: list[bytes]):
+        with self._lock:
+            self._add_lines(lines)
+            self._write(data)
+
+    def _add_lines(self, lines: list[bytes]):
+        for line in lines:
+            for i in range(0, len(line), MAX_LINE_LENGTH):
+                self._lines.append(line[i:i + MAX_LINE_LENGTH])
+                self._lines_count += 1
+
+    def _write(self, data: bytes):
+        if self._log_file is None:
+            return
+
+        try:
+            if self._file is None:
+                self._log_file.parent.mkdir(parents=True, exist_ok=True)
+                self._file = self._log_file.open('ab', buffering=0)
+            position = self._file.tell()
+            if position and position + len(data) > self._config.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._write_failed = False
+        except OSError as e:
+            # output is still drained, so process is not blocked
+            if not self._write_failed:
+                log.error(f'cubectl: output_capture: writing of {self._log_file} failed: {e}')
+            self._write_failed = True
+            self._close_file()
+
+    def _rotate(self):
+        self._close_file()
+        backup_count = self._config.backup_count
+
+        if backup_count > 0:
+            for i in range(backup_count - 1, 0, -1):
+                backup = Path(f'{self._log_file}.{i}')
+                if backup.exists():
+                    backup.replace(f'{self._log_file}.{i + 1}')
+            self._log_file.replace(f'{self._log_file}.1')
+        else:
+            self._log_file.unlink(missing_ok=True)
+
+        self._file = self._log_file.open('ab', buffering=0)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _format(lines: list[bytes], tail: int = None, n_bytes: int = None) -> str:
+    if tail:
+        lines = lines[-tail:]
+    content = b''.join(lines)
+    if n_bytes:
+        content = content[-n_bytes:]
+    return content.decode('utf-8', errors='replace')
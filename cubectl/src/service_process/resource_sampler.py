@@ -0,0 +1,221 @@
+import os
+import time
+import logging
+from collections import deque
+from typing import Optional
+
+from cubectl.src.models import ResourceUsage
+
+
+__all__ = [
+    "ResourceSampler",
+    "ProcessTable",
+]
+
+log = logging.getLogger(__file__)
+
+# number of samples CPU usage is averaged over
+SAMPLE_WINDOW = 5
+# samples requested more often are skipped
+MIN_SAMPLE_INTERVAL = 0.5
+
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class ResourceSampler:
+    """
+    Samples resources used by process and all its children from /proc.
+
+    CPU usage is calculated from CPU time consumed within last
+    SAMPLE_WINDOW samples. On systems without /proc usage is not known.
+    """
+
+    def __init__(self, window: int = SAMPLE_WINDOW):
+        # (time.monotonic(), cpu ticks of process tree)
+        self._samples: deque[tuple[float, int]] = deque(maxlen=window)
+        self._pid: Optional[int] = None
+        self._usage: Optional[ResourceUsage] = None
+
+    @property
+    def usage(self) -> Optional[ResourceUsage]:
+        """Result of last sample."""
+
+        return self._usage
+
+    @property
+    def is_window_full(self) -> bool:
+        """True if CPU usage is averaged over whole window."""
+
+        return len(self._samples) == self._samples.maxlen
+
+    def sample(
+            self,
+            pid: Optional[int],
+            process_table: Optional['ProcessTable'] = None,
+    ) -> Optional[ResourceUsage]:
+        """
+        Arguments:
+            process_table: shared by processes sampled in one pass, new one if not supplied.
+        """
+
+        if pid != self._pid:
+            self._pid = pid
+            self._samples.clear()
+            self._usage = None
+        if pid is None:
+            return None
+
+        now = time.monotonic()
+        if self._samples and now - self._samples[-1][0] < MIN_SAMPLE_INTERVAL:
+            return self._usage
+
+        cpu_ticks, rss, open_fds, threads = 0, 0, 0, 0
+        pids = [pid, *(process_table or ProcessTable()).get_descendants(pid)]
+        found = 0
+        for _pid in pids:
+            stat = _read_stat(_pid)
+            if stat is None:
+                continue
+            found += 1
+            cpu_ticks += stat['cpu_ticks']
+            threads += stat['threads']
+            rss += _read_rss(_pid)
+            open_fds += _count_fds(_pid)
+
+        if not found:
+            self._samples.clear()
+            self._usage = None
+            return None
+
+        cpu_percent = None
+        if self._samples:
+            first_time, first_ticks = self._samples[0]
+            if now > first_time:
+                cpu_percent = max(0, cpu_ticks - first_ticks) / _CLOCK_TICKS / (now - first_time) * 100
+        self._samples.append((now, cpu_ticks))
+
+        self._usage = ResourceUsage(
+            cpu_percent=None if cpu_percent is None else round(cpu_percent, 1),
+            rss=rss,
+            open_fds=open_fds,
+            threads=threads,
+            processes=found,
+        )
+        return self._usage
+
+
+def _read_stat(pid: int) -> Optional[dict]:
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            content = f.read()
+    except OSError:
+        return None
+
+    # name of process (2nd field) may contain spaces and parentheses
+    fields = content[content.rfind(b')') + 2:].split()
+    return {
+        'ppid': int(fields[1]),
+        'cpu_ticks': int(fields[11]) + int(fields[12]),  # utime + stime
+        'threads': int(fields[17]),
+    }
+
+
+def _read_rss(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def _count_fds(pid: int) -> int:
+    try:
+        return len(os.listdir(f'/proc/{pid}/fd'))
+    except OSError:
+        return 0
+
+
+def _get_children(pid: int) -> Optional[list[int]]:
+    """Returns None if /proc/<pid>/task/<tid>/children is not supported."""
+
+    children = []
+    try:
+        tasks = os.listdir(f'/proc/{pid}/task')
+    except OSError:
+        return []
+    for tid in tasks:
+        try:
+            with open(f'/proc/{pid}/task/{tid}/children', 'rb') as f:
+                children.extend(int(x) for x in f.read().split())
+        except FileNotFoundError:
+            if not os.path.isdir(f'/proc/{pid}/task/{tid}'):
+                continue
+            return None
+        except OSError:
+            continue
+    return children
+
+
+class ProcessTable:
+    """
+    Children of processes within one sampling pass. If /proc/<pid>/task/<tid>/children
+    is not supported, map of parent pid to children is read from /proc once
+    and shared by all processes sampled with this table.
+    """
+
+    def __init__(self):
+        self._children_by_parent: Optional[dict[int, list[int]]] = None
+
+    def get_descendants(self, pid: int) -> list[int]:
+        if self._children_by_parent is None:
+            descendants = _get_descendants_by_children_files(pid)
+            if descendants is not None:
+                return descendants
+            self._children_by_parent = _get_children_by_parent()
+        return _walk_children(self._children_by_parent, pid)
+
+
+def _get_descendants(pid: int) -> list[int]:
+    return ProcessTable().get_descendants(pid)
+
+
+def _get_descendants_by_children_files(pid: int) -> Optional[list[int]]:
+    """Returns None if /proc/<pid>/task/<tid>/children is not supported."""
+
+    result = []
+    to_visit = [pid]
+    while to_visit:
+        children = _get_children(to_visit.pop())
+        if children is None:
+            return None
+        result.extend(children)
+        to_visit.extend(children)
+    return result
+
+
+def _get_descendants_by_ppid(pid: int) -> list[int]:
+    """Slower search of children through parent pid of every process."""
+
+    return _walk_children(_get_children_by_parent(), pid)
+
+
+def _get_children_by_parent() -> dict[int, list[int]]:
+    children_by_parent: dict[int, list[int]] = dict()
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        stat = _read_stat(int(name))
+        if stat is not None:
+            children_by_parent.setdefault(stat['ppid'], []).append(int(name))
+    return children_by_parent
+
+
+def _walk_children(children_by_parent: dict[int, list[int]], pid: int) -> list[int]:
+    result = []
+    to_visit = [pid]
+    while to_visit:
+        children = children_by_parent.get(to_visit.pop(), [])
+        result.extend(children)
+        to_visit.extend(children)
+    return result
@@ -1,8 +1,13 @@
 import os
 import io
-from subprocess import Popen
+import time
+import random
+import signal
+import shutil
+import threading
+from collections import deque
+from subprocess import Popen, PIPE, STDOUT
 from typing import Optional
-from time import sleep
 from datetime import datetime
 import logging
 from pathlib import Path
@@ -10,27 +15,45 @@ from pathlib import Path
 import dotenv
 
 from cubectl.src.models import InitProcessConfig
+from cubectl.src.models import RestartPolicy
 from cubectl.src.models import ProcessState
 from cubectl.src.models import ProcessStatus
 from cubectl.src.models import SystemData
 from cubectl.src.models import ServiceData
-from cubectl.src.utils import LogReaderProtocol, LogReader
-
-
-OS_OPERATIONS_DELAY = 0.1
+from cubectl.src.models import OutputCaptureConfig
+from cubectl.src.models import ResourceUsage
+from cubectl.src.utils import LogReaderProtocol, LogReader, DEFAULT_CURSOR, PhaseProfiler
+from cubectl.src.service_process.exit_notifier import ExitNotifier
+from cubectl.src.service_process.output_capture import OutputCapture
+from cubectl.src.service_process.resource_sampler import ResourceSampler, ProcessTable
+from cubectl.src.service_process.limits import CgroupLimiter
+from cubectl.src.service_process.limits import get_limits_command
+from cubectl.src.service_process.limits import get_exceeded_soft_limit
+
+
+# max time to wait for killed process to be reaped
+KILL_WAIT_TIMEOUT = 5
 log = logging.getLogger(__file__)
+# env files are loaded into os.environ, which is shared between processes
+# applied concurrently by Executor
+_ENV_LOCK = threading.Lock()
 
 
 class ServiceProcessException(Exception):
     pass
 
 
-class ServiceProcessNoRetriesException(ServiceProcessException):
-    pass
-
-
 class ServiceProcess:
-    def __init__(self, init_config: dict, number_of_start_retries: int = 10):
+    def __init__(
+            self,
+            init_config: dict,
+            number_of_start_retries: int = 10,
+            exit_notifier: Optional[ExitNotifier] = None,
+            output_capture: Optional[OutputCaptureConfig] = None,
+            cgroup_limiter: Optional[CgroupLimiter] = None,
+            profiler: Optional[PhaseProfiler] = None,
+    ):
+        self._profiler = profiler if profiler is not None else PhaseProfiler()
         self._init_config = InitProcessConfig(**init_config)
         self._start_up_command: list[str] = _create_start_up_command(
             executor=self._init_config.executor,
@@ -41,6 +64,8 @@ class ServiceProcess:
         self._state = ProcessState.stopped
         self._process_started_at = None
         self._process_stopped_at = None
+        # number of times process was started again after first start
+        self._restarts = 0
 
         self._resolve_env()
 
@@ -49,10 +74,26 @@ class ServiceProcess:
             if self._init_config.port:
                 self._port = self._init_config.port
         self._number_of_start_retries = number_of_start_retries
-        self._number_of_start_retries_left = number_of_start_retries
-        self._log_reader: LogReaderProtocol = LogReader(self._init_config.log)
+        # monotonic times of exits within crash window of restart policy
+        self._crashes: deque[float] = deque()
+        # process which exit was already counted
+        self._exit_recorded_for: Optional[Popen] = None
+        # monotonic time before which crashed process is not started again
+        self._next_start_at = 0.0
+        # process exited and is not restarted (restart policy or too many crashes)
+        self._gave_up = False
+        # monotonic time stop signal was sent at, stop_timeout is counted from it
+        self._stop_requested_at: Optional[float] = None
+        # stdout/stderr of process, served as logs if log file is not set
+        self._output = OutputCapture(name=self.name, config=output_capture)
+        self._log_reader: LogReaderProtocol = (
+            LogReader(self._init_config.log) if self._init_config.log else self._output
+        )
         self._informed_about_fail = False
         self._last_status: Optional[ProcessStatus] = None
+        self._exit_notifier = exit_notifier
+        self._resource_sampler = ResourceSampler()
+        self._cgroup_limiter = cgroup_limiter
 
     def start(self):
         real_state = self._get_real_state()
@@ -66,19 +107,45 @@ class ServiceProcess:
                     f'cubectl: ServiceProcess: {self.name} is in {self._state} state. '
                     f'Try to restart process'
                 )
+            self._state = real_state
             return real_state
 
-        if real_state is ProcessState.failed_start_loop:
-            try:
-                self._decrement_retries()
-            except ServiceProcessNoRetriesException:
-                pass
+        # exited process not restarted by policy (e.g. on-failure and exit code 0)
+        if real_state is ProcessState.stopped and self._gave_up:
+            self._state = real_state
+            return real_state
+
+        if real_state is ProcessState.failed_start_loop and time.monotonic() < self._next_start_at:
+            self._state = real_state
+            return real_state
+
+        if self._process is not None:
+            self._restarts += 1
 
         try:
-            self._process = Popen(
-                self._start_up_command,
-                env=self._resolve_env()
+            with self._profiler.phase('process.resolve_env'):
+                env = self._resolve_env()
+            command = get_limits_command(
+                name=self.name,
+                limits=self._init_config.limits,
+                cgroup_limiter=self._cgroup_limiter,
             )
+            # missing executable is not started at all, as without launcher
+            if command and shutil.which(self._start_up_command[0], path=env.get('PATH')) is None:
+                raise FileNotFoundError(f'executable not found: {self._start_up_command[0]}')
+            with self._profiler.phase('process.popen'):
+                self._process = Popen(
+                    [*command, *self._start_up_command],
+                    env=env,
+                    stdout=PIPE,
+                    stderr=STDOUT,
+                    # own process group, so children are stopped together with process
+                    start_new_session=True,
+                )
+            self._stop_requested_at = None
+            self._output.attach(self._process.stdout)
+            if self._exit_notifier is not None:
+                self._exit_notifier.watch(name=self.name, pid=self._process.pid)
         except FileNotFoundError as f:
             log.error(f'cubectl: service_process: {f}')
         except Exception as e:
@@ -87,6 +154,7 @@ class ServiceProcess:
         real_state = self._get_real_state()
         if real_state is ProcessState.started:
             self._process_started_at = datetime.now()
+            self.informed_about_fail_reset()
 
         self._state = real_state
 
@@ -111,6 +179,54 @@ class ServiceProcess:
     def state(self):
         return self._state
 
+    @property
+    def exit_code(self) -> Optional[int]:
+        """Exit code of last started process, None if it is running."""
+
+        return self._get_error_code()
+
+    @property
+    def restarts(self) -> int:
+        return self._restarts
+
+    @property
+    def start_retries_left(self) -> int:
+        """Crashes left within crash window before process is not restarted."""
+
+        if self._gave_up:
+            return 0
+        return max(0, self._get_max_crashes() - self._count_crashes())
+
+    @property
+    def gave_up(self) -> bool:
+        """Exited and is not started again until restart (restart policy or too many crashes)."""
+
+        return self._gave_up
+
+    @property
+    def restart_delay(self) -> Optional[float]:
+        """Seconds left before crashed process is started again, None if none is pending."""
+
+        if self._state is not ProcessState.failed_start_loop:
+            return None
+        return max(0.0, self._next_start_at - time.monotonic())
+
+    @property
+    def stop_timeout_left(self) -> Optional[float]:
+        """Seconds left before process requested to stop is killed, None if no stop is pending."""
+
+        if self._stop_requested_at is None or self._state is not ProcessState.started:
+            return None
+        return max(0.0, self._stop_requested_at + self._init_config.stop_timeout - time.monotonic())
+
+    @property
+    def uptime(self) -> Optional[float]:
+        """Seconds since process was started, None if it is not running."""
+
+        if self._process_started_at is None or self._state is not ProcessState.started:
+            return None
+        return (datetime.now() - self._process_started_at).total_seconds()
+
     @property
     def name(self):
         return self._init_config.name
@@ -122,14 +238,56 @@ class ServiceProcess:
         return self.state is ProcessState.failed_start_loop
 
     def _reset_process_start_retries(self):
-        self._number_of_start_retries_left = self._number_of_start_retries
+        self._crashes.clear()
+        self._next_start_at = 0.0
+        self._gave_up = False
 
-    def _decrement_retries(self):
-        if self._number_of_start_retries_left <= 0:
-            raise ServiceProcessNoRetriesException(
-                'cubectl: ServiceProces: no start up retries left.'
-            )
-        self._number_of_start_retries_left -= 1
+    def _get_max_crashes(self) -> int:
+        max_crashes = self._init_config.restart.max_crashes
+        return max_crashes if max_crashes is not None else self._number_of_start_retries
+
+    def _count_crashes(self) -> int:
+        """Crashes within crash window. Read only, as it is also called by metrics exporter thread."""
+
+        window_start = time.monotonic() - self._init_config.restart.crash_window
+        # copied at once, deque is appended to by loop thread
+        return sum(1 for x in tuple(self._crashes) if x >= window_start)
+
+    def _record_exit(self, exit_code: int):
+        """
+        Called once per exit of process which should be running. Decides
+        whether and when process is started again according to restart policy.
+        """
+
+        policy = self._init_config.restart
+        now = time.monotonic()
+        self._exit_recorded_for = self._process
+
+        if not policy.should_restart(exit_code):
+            log.info(f'cubectl: service_process: {self.name} exited with {exit_code}, '
+                     f'not restarted by policy {policy.policy}.')
+            self._gave_up = True
+            return
+
+        uptime = (datetime.now() - self._process_started_at).total_seconds() if self._process_started_at else 0
+        if uptime >= policy.stable_uptime:
+            self._crashes.clear()
+        window_start = now - policy.crash_window
+        while self._crashes and self._crashes[0] < window_start:
+            self._crashes.popleft()
+        self._crashes.append(now)
+        crashes = len(self._crashes)
+
+        if crashes > self._get_max_crashes():
+            log.error(f'cubectl: service_process: {self.name} crashed {crashes} times '
+                      f'within {policy.crash_window}s, not restarted anymore.')
+            self._gave_up = True
+            return
+
+        self._next_start_at = now + _get_backoff(policy, crashes)
+        log.warning(f'cubectl: service_process: {self.name} exited with {exit_code} '
+                    f'(crash {crashes}/{self._get_max_crashes()}), restart in '
+                    f'{self._next_start_at - now:.1f}s.')
 
     def _status_collect_system_data(self) -> SystemData:
         """
@@ -146,6 +304,7 @@ class ServiceProcess:
             state=real_state,
             error_code=error_code,
             started_at=str(self._process_started_at),
+            resources=self._resource_sampler.usage if real_state is ProcessState.started else None,
         )
 
     def _status_collect_service_data(self) -> ServiceData:
@@ -162,15 +321,13 @@ class ServiceProcess:
 
     def _get_error_code(self):
         if self._process:
-            return self._process.poll()
+            return self._poll()
 
     def _get_real_state(self):
-        sleep(OS_OPERATIONS_DELAY)
-
         if self._process is None:
             return ProcessState.stopped
 
-        error_code = self._process.poll()
+        error_code = self._poll()
 
         if error_code is None:
             return ProcessState.started
@@ -180,25 +337,71 @@ class ServiceProcess:
             return ProcessState.stopped
 
         if self._last_status.system_data.state is ProcessState.started:
-            if self._number_of_start_retries_left <= 0:
-                return ProcessState.failed_to_start
-            return ProcessState.failed_start_loop
+            if self._exit_recorded_for is not self._process:
+                self._record_exit(error_code)
+            if not self._gave_up:
+                return ProcessState.failed_start_loop
+            if error_code == 0 and not self._init_config.restart.should_restart(error_code):
+                return ProcessState.stopped
+            return ProcessState.failed_to_start
 
         if self._last_status.system_data.state is ProcessState.stopped:
             return ProcessState.stopped
 
         return ProcessState.stopped
 
-    def stop(self):
+    def request_stop(self):
+        """
+        Sends stop_signal to process group without waiting, so stops of
+        many processes overlap. stop() waits for rest of stop_timeout.
+        """
+
+        if self._stop_requested_at is not None or self._get_real_state() is not ProcessState.started:
+            return
+        self._stop_requested_at = time.monotonic()
+        # requested exit is not a crash, restart policy does not apply to it
+        self._exit_recorded_for = self._process
+        self._signal_process_group(signal.Signals[self._init_config.stop_signal])
+
+    def enforce_stop_timeout(self):
+        """Kills group of process which did not exit within stop_timeout after request_stop()."""
+
+        if self._stop_requested_at is None:
+            return
+        if time.monotonic() - self._stop_requested_at < self._init_config.stop_timeout:
+            return
+        if self._get_real_state() is ProcessState.started:
+            log.warning(
+                f'cubectl: service_process: {self.name} did not exit within '
+                f'{self._init_config.stop_timeout}s after {self._init_config.stop_signal}, killing it.'
+            )
+            self._signal_process_group(signal.SIGKILL)
+
+    def stop(self, graceful: bool = True):
+        """
+        Sends stop_signal to process group and waits stop_timeout seconds for
+        process to exit, then kills whole group. Not graceful stop kills at once.
+        """
+
         self._reset_process_start_retries()
         real_state = self._get_real_state()
 
         if real_state is not ProcessState.stopped:
             if self._process is not None:
-                self._process.kill()
+                self._exit_recorded_for = self._process
+                with self._profiler.phase('process.stop'):
+                    if not graceful or not self._terminate_process():
+                        self._signal_process_group(signal.SIGKILL)
+                        self._wait_process()
                 self._process_started_at = None
                 self._process_stopped_at = datetime.now()
 
+        if self._cgroup_limiter is not None and self._init_config.limits is not None:
+            self._cgroup_limiter.remove(self.name)
+        self._stop_requested_at = None
+        # exit recorded before stop (e.g. on-failure and exit code 0) does not prevent restart
+        self._reset_process_start_retries()
+
         real_state = self._get_real_state()
 
         if (real_state is ProcessState.failed_start_loop
@@ -206,8 +409,84 @@ class ServiceProcess:
             self._state = ProcessState.stopped
         self._state = self._get_real_state()
 
-    def restart(self):
-        self.stop()
+    def _terminate_process(self) -> bool:
+        """Returns True if process exited within stop_timeout after stop_signal."""
+
+        self.request_stop()
+        timeout = self._init_config.stop_timeout
+        if self._stop_requested_at is not None:
+            timeout -= time.monotonic() - self._stop_requested_at
+        if self._wait_exit(timeout=max(0.0, timeout)):
+            return True
+        log.warning(
+            f'cubectl: service_process: {self.name} did not exit within '
+            f'{self._init_config.stop_timeout}s after {self._init_config.stop_signal}, killing it.'
+        )
+        return False
+
+    def _wait_process(self):
+        if not self._wait_exit(timeout=KILL_WAIT_TIMEOUT):
+            log.error(
+                f'cubectl: service_process: {self.name} was not reaped '
+                f'after kill in {KILL_WAIT_TIMEOUT}s'
+            )
+
+    def _wait_exit(self, timeout: float) -> bool:
+        """Returns False if process is still running after timeout."""
+
+        deadline = time.monotonic() + timeout
+        delay = 0.0005
+        while self._poll() is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            delay = min(delay * 2, remaining, 0.05)
+            time.sleep(delay)
+        return True
+
+    def _poll(self) -> Optional[int]:
+        """
+        Exit code of process, None if it is running. Children left in group of
+        exited process (e.g. orphaned workers holding its ports) are killed before
+        process is reaped: until then its pid, which is pgid of the group, can not
+        be reused, so signal does not reach unrelated processes.
+        """
+
+        if self._process.returncode is None:
+            try:
+                exited = os.waitid(
+                    os.P_PID, self._process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT
+                ) is not None
+            except ChildProcessError:
+                # reaped already, its pid may belong to other process
+                exited = False
+            if exited:
+                self._kill_process_group()
+        return self._process.poll()
+
+    def _signal_process_group(self, sig: signal.Signals) -> bool:
+        """Returns False if no process is left in group."""
+
+        try:
+            # process is leader of its session, so pgid is its pid
+            os.killpg(self._process.pid, sig)
+            return True
+        except ProcessLookupError:
+            return False
+        except Exception as e:
+            log.error(f'cubectl: service_process: {sig.name} was not sent to {self.name}: {e}')
+            return False
+
+    def _kill_process_group(self):
+        """Kills children left after exit of not yet reaped process."""
+
+        if self._signal_process_group(signal.SIGKILL):
+            # children usually are still exiting after requested stop
+            level = logging.DEBUG if self._exit_recorded_for is self._process else logging.WARNING
+            log.log(level, f'cubectl: service_process: children of {self.name} left after its exit were killed.')
+
+    def restart(self, graceful: bool = True):
+        self.stop(graceful=graceful)
         self.start()
 
     def _apply_env_files(self):
@@ -241,10 +520,11 @@ class ServiceProcess:
         and set them up to result dict
         """
 
-        if self._init_config.env_files:
-            self._apply_env_files()
+        with _ENV_LOCK:
+            if self._init_config.env_files:
+                self._apply_env_files()
 
-        result = os.environ.copy()
+            result = os.environ.copy()
 
         if self._init_config.environment:
             for k, v in self._init_config.environment.items():
@@ -297,14 +577,20 @@ class ServiceProcess:
         self._make_to_follow_state(desired_status.state)
 
     def apply_status(self, desired_status: ProcessStatus):
+        with self._profiler.phase('process.apply_status'):
+            self._apply_status(desired_status)
+
+    def _apply_status(self, desired_status: ProcessStatus):
         desired_status.system_data.state = ProcessState(desired_status.system_data.state)
         to_restart = False
         self._last_status = desired_status
 
-        if not _compare_status_init_config(
-            current_status=self._init_config,
-            desired_status=desired_status.init_config
-        ):
+        with self._profiler.phase('process.compare_init_config'):
+            init_config_changed = not _compare_status_init_config(
+                current_status=self._init_config,
+                desired_status=desired_status.init_config
+            )
+        if init_config_changed:
             to_restart = True
             self._make_follow_updated_init(desired_status.init_config)
 
@@ -317,7 +603,8 @@ class ServiceProcess:
 
         if not self._compare_status_system_data(desired_status.system_data):
             # usually no need to restart
-            self._make_to_follow_system_data(desired_status.system_data)
+            with self._profiler.phase(f'process.{desired_status.system_data.state.value.lower()}'):
+                self._make_to_follow_system_data(desired_status.system_data)
 
     # def check_status(self, desired_status: ProcessStatus):
     #     """Check following of status file."""
@@ -347,15 +634,97 @@ class ServiceProcess:
     def is_informed_about_fail(self):
         return self._informed_about_fail
 
-    def get_logs(self, latest: bool = True):
+    def get_logs(
+            self,
+            latest: bool = True,
+            head: int = None,
+            tail: int = None,
+            n_bytes: int = None,
+    ):
         try:
             if latest:
-                return self._log_reader.get_latest_log()
-            return self._log_reader.get_log()
+                return self._log_reader.get_latest_log(head=head, tail=tail, n_bytes=n_bytes)
+            return self._log_reader.get_log(head=head, tail=tail, n_bytes=n_bytes)
         except Exception as e:
             log.critical(f'cubectl: service_process: log_reader failed with error: {e}')
             return ''
 
+    def get_log_tail(self, lines: int, max_bytes: int) -> str:
+        """Bounded tail of log for notifications, does not affect `cubectl logs`."""
+
+        try:
+            return self._log_reader.get_tail(lines=lines, max_bytes=max_bytes)
+        except Exception as e:
+            log.error(f'cubectl: service_process: tail of log of {self.name} was not read: {e}')
+            return ''
+
+    def sample_resources(self, process_table: Optional[ProcessTable] = None):
+        """Samples resources used by process, result is added to status."""
+
+        pid = self.pid if self._get_real_state() is ProcessState.started else None
+        self._resource_sampler.sample(pid, process_table=process_table)
+
+    @property
+    def resources(self) -> Optional[ResourceUsage]:
+        """Last sampled resources, None if process is not running."""
+
+        if self._state is not ProcessState.started:
+            return None
+        return self._resource_sampler.usage
+
+    def check_soft_limits(self) -> Optional[str]:
+        """
+        Checks last sampled resources against soft limits of process.
+
+        Returns:
+            description of exceeded limit or None
+        """
+
+        # already stopped because of exceeded limit
+        if self._stop_requested_at is not None or self._get_real_state() is not ProcessState.started:
+            return None
+        return get_exceeded_soft_limit(
+            limits=self._init_config.limits,
+            usage=self._resource_sampler.usage,
+            check_cpu=self._resource_sampler.is_window_full,
+        )
+
+    def get_log_range(
+            self,
+            latest: bool = True,
+            head: int = None,
+            tail: int = None,
+            n_bytes: int = None,
+            cursor: str = DEFAULT_CURSOR,
+            ack: bool = True,
+    ) -> Optional[dict]:
+        """Returns range of log file to read ({'path', 'offset', 'length'})."""
+
+        try:
+            return self._log_reader.get_log_range(
+                latest=latest,
+                head=head,
+                tail=tail,
+                n_bytes=n_bytes,
+                cursor=cursor,
+                ack=ack,
+            )
+        except Exception as e:
+            log.critical(f'cubectl: service_process: log_reader failed with error: {e}')
+            return None
+
+    def ack_log(self, cursor: str, offset: int):
+        self._log_reader.ack_log(cursor=cursor, offset=offset)
+
+    def get_log_cursors(self) -> dict:
+        return self._log_reader.get_cursors()
+
+    def set_log_cursors(self, cursors: dict):
+        self._log_reader.set_cursors(cursors)
+
+    def expire_log_cursors(self, ttl: float):
+        self._log_reader.expire_cursors(ttl)
+
     def get_log_level(self):
         raise NotImplemented('service_process.py')
 
@@ -375,6 +744,16 @@ def _create_start_up_command(executor: str, file: str, args: dict):
     return [x for x in f'{executor} {file} {args_}'.split() if x]
 
 
+def _get_backoff(policy: RestartPolicy, crashes: int) -> float:
+    """First crash within window is restarted immediately, next ones with exponential backoff."""
+
+    if crashes <= 1:
+        return 0.0
+    delay = policy.backoff * policy.backoff_multiplier ** (crashes - 2)
+    # clamped after jitter, so max_backoff is never exceeded
+    return min(policy.max_backoff, delay * random.uniform(1 - policy.jitter, 1 + policy.jitter))
+
+
 def _compare_status_init_config(current_status: InitProcessConfig, desired_status: InitProcessConfig) -> bool:
     """
     Compares desired_status with current state of process and if not
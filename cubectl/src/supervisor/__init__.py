@@ -0,0 +1 @@
+from cubectl.src.supervisor.supervisor import Supervisor
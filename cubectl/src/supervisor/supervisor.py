@@ -0,0 +1,226 @@
+import os
+import logging
+import threading
+from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from cubectl.src.executor import Executor, ExecutorException
+from cubectl.src.models import OutputCaptureConfig
+from cubectl.src.initialization_functions import set_watcher_pid
+from cubectl.src.utils import Messanger, FileWatcher, MetricFamily, PhaseProfiler, read_state
+
+
+log = logging.getLogger(__file__)
+
+
+class Supervisor:
+    """
+    Runs executors of all applications from register in one loop.
+    Cycles of applications are run in thread pool, so slow cycle of one
+    application (e.g. waiting for stop_timeout) does not delay others.
+
+    Applications added to register (`cubectl init`) are picked up and
+    applications removed from register (`cubectl clean`) are stopped
+    without restarting of supervisor.
+    """
+
+    def __init__(
+            self,
+            register_location: str,
+            concurrency: int = 1,
+            output_capture: Optional[OutputCaptureConfig] = None,
+            log_cursor_ttl: float = 24 * 3600,
+            cgroup_root: Optional[str] = None,
+            notification_options: Optional[dict] = None,
+            log_tail_lines: int = 20,
+            log_tail_bytes: int = 2048,
+            soft_limit_notification_interval: float = 300,
+            profiler: Optional[PhaseProfiler] = None,
+    ):
+        """
+        Arguments:
+            register_location: applications register file.
+            concurrency: passed to every Executor.
+            output_capture: passed to every Executor.
+            log_cursor_ttl: passed to every Executor.
+            cgroup_root: passed to every Executor.
+            notification_options: passed to every Executor.
+            log_tail_lines, log_tail_bytes: passed to every Executor.
+            soft_limit_notification_interval: passed to every Executor.
+            profiler: passed to every Executor.
+        """
+
+        self._register_location = register_location
+        self._concurrency = concurrency
+        self._output_capture = output_capture
+        self._log_cursor_ttl = log_cursor_ttl
+        self._cgroup_root = cgroup_root
+        self._notification_options = notification_options
+        self._log_tail_lines = log_tail_lines
+        self._log_tail_bytes = log_tail_bytes
+        self._soft_limit_notification_interval = soft_limit_notification_interval
+        self._profiler = profiler if profiler is not None else PhaseProfiler()
+        self._wakeup = threading.Event()
+        self._register_watcher = FileWatcher(
+            register_location, on_change=self._wakeup.set
+        )
+        self._executors: dict[str, Executor] = dict()
+        # last submitted cycle of every application
+        self._cycles: dict[str, Future] = dict()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # apps stopped by `cubectl kill`, not managed until removed from register
+        self._detached: set[str] = set()
+        self._messanger: Optional[Messanger] = None
+        self._running = True
+
+    def add_messanger(self, messanger: Messanger):
+        self._messanger = messanger
+        for executor in self._executors.values():
+            executor.add_messanger(messanger)
+
+    @property
+    def apps(self) -> list:
+        return list(self._executors.keys())
+
+    def collect_metrics(self) -> list[MetricFamily]:
+        """Metrics of all executors, labeled with name of application."""
+
+        families = []
+        for executor in list(self._executors.values()):
+            families.extend(executor.collect_metrics())
+        return families
+
+    def shutdown(self):
+        self._running = False
+        self._wakeup.set()
+
+    def _get_register(self) -> list:
+        try:
+            register = read_state(self._register_location)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            log.error(f'cubectl: supervisor: register was not read: {e}')
+            return [{'app_name': x} for x in self._executors]
+        return register if register else []
+
+    def _sync_register(self):
+        register = {x['app_name']: x for x in self._get_register()}
+
+        for app_name in list(self._executors):
+            if app_name not in register:
+                log.info(f'cubectl: supervisor: {app_name} removed from register.')
+                self._remove_app(app_name)
+        self._detached &= set(register)
+
+        added = []
+        for app_name, app in register.items():
+            if app_name in self._executors or app_name in self._detached:
+                continue
+            if self._add_app(app):
+                added.append(app_name)
+
+        if added:
+            try:
+                set_watcher_pid(
+                    register_path=self._register_location,
+                    app_names=added,
+                    watcher_pid=os.getpid(),
+                )
+            except Exception as e:
+                log.error(f'cubectl: supervisor: updating of register with watcher pid failed: {e}')
+            # own change of register should not trigger sync again
+            self._register_watcher.reset()
+
+    def _add_app(self, app: dict) -> bool:
+        app_name = app['app_name']
+        try:
+            executor = Executor(
+                status_file=app['status_file'],
+                meta_info={'app': app_name},
+                concurrency=self._concurrency,
+                control_socket=app.get('control_socket'),
+                wakeup=self._wakeup,
+                output_capture=self._output_capture,
+                log_cursor_ttl=self._log_cursor_ttl,
+                cgroup_root=self._cgroup_root,
+                notification_options=self._notification_options,
+                log_tail_lines=self._log_tail_lines,
+                log_tail_bytes=self._log_tail_bytes,
+                soft_limit_notification_interval=self._soft_limit_notification_interval,
+                profiler=self._profiler,
+            )
+        except (FileNotFoundError, ExecutorException) as e:
+            log.error(f'cubectl: supervisor: {app_name} was not added: {e}')
+            return False
+
+        executor.add_messanger(self._messanger)
+        executor.setup()
+        self._executors[app_name] = executor
+        log.info(f'cubectl: supervisor: {app_name} added.')
+        return True
+
+    def _remove_app(self, app_name: str):
+        executor = self._executors.pop(app_name)
+        cycle = self._cycles.pop(app_name, None)
+        if cycle is not None:
+            wait([cycle])
+        executor._stop_all_processes()
+        executor.close()
+
+    def _stop_all(self):
+        for app_name in list(self._executors):
+            self._remove_app(app_name)
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _cycle(self):
+        if self._register_watcher.is_changed():
+            with self._profiler.phase('supervisor.sync_register'):
+                self._sync_register()
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(thread_name_prefix='cubectl_app_cycle')
+
+        for app_name, executor in list(self._executors.items()):
+            cycle = self._cycles.get(app_name)
+            if cycle is not None and not cycle.done():
+                # previous cycle is still running, application is not waited for
+                continue
+
+            error = cycle.exception() if cycle is not None else None
+            if error is not None:
+                log.critical(
+                    f'cubectl: supervisor: process loop for {app_name} failed: '
+                    f'error: {error}'
+                )
+                self._detached.add(app_name)
+                self._remove_app(app_name)
+                continue
+
+            if not executor.is_running:
+                log.info(f'cubectl: supervisor: {app_name} was shut down.')
+                self._detached.add(app_name)
+                self._remove_app(app_name)
+                continue
+
+            self._cycles[app_name] = self._pool.submit(executor.cycle)
+
+    def process(self, cycle_period: int = 1):
+        self._register_watcher.start()
+        self._sync_register()
+
+        try:
+            while self._running:
+                self._cycle()
+                self._profiler.report_if_due()
+
+                timeout = min([cycle_period, *(
+                    x.get_wait_timeout(cycle_period) for x in list(self._executors.values())
+                )])
+                self._wakeup.wait(timeout=timeout)
+                self._wakeup.clear()
+        finally:
+            self._stop_all()
+            self._register_watcher.close()
@@ -1,12 +1,116 @@
-from cubectl.src.utils.common import *
-from cubectl.src.utils.get_status_file import get_status_file, get_app_name_and_register
-from cubectl.src.utils.nginx_configuration_related import (
-    create_nginx_config,
-    get_all_allocated_ports_by_app,
-    check_service_names_for_duplicates,
-    check_if_launched_as_root,
-)
-from cubectl.src.utils.format_report import format_report, format_logs_response
-from cubectl.src.utils.telegram_utils import Messanger, TelegramMessanger, send_message_to_subscribers
-from cubectl.src.utils.colors import color
-from cubectl.src.utils.log_reader import LogReader, LogReaderProtocol
+"""
+Helpers are imported from their modules on first access (PEP 562), so
+`from cubectl.src.utils import read_state` does not load requests, http
+server or pydantic needed by other helpers. Keeps start up of CLI fast.
+"""
+
+import importlib
+
+
+_MODULES = {
+    'common': [
+        'read_yaml',
+        'resolve_path',
+    ],
+    'get_status_file': [
+        'get_status_file',
+        'get_app_name_and_register',
+        'get_log_files',
+        'get_output_log_dir',
+        'get_log_cursors_file',
+    ],
+    'nginx_configuration_related': [
+        'create_nginx_config',
+        'get_all_allocated_ports_by_app',
+        'check_service_names_for_duplicates',
+        'check_if_launched_as_root',
+    ],
+    'format_report': [
+        'format_report',
+        'format_logs_response',
+        'format_log_line',
+    ],
+    'telegram_utils': [
+        'Messanger',
+        'TelegramMessanger',
+        'send_message_to_subscribers',
+    ],
+    'notifiers': [
+        'NotifierException',
+        'FanOutMessanger',
+        'register_notifier',
+        'create_notifier',
+        'create_notifiers',
+        'get_notifier_key',
+        'get_notifier_configs_from_env',
+        'create_event',
+    ],
+    'notification_dispatcher': [
+        'NotificationDispatcher',
+        'NotificationDeliveryError',
+        'fit_log_tail',
+    ],
+    'colors': [
+        'color',
+    ],
+    'log_reader': [
+        'LogReader',
+        'LogReaderProtocol',
+        'read_log_range',
+        'DEFAULT_CURSOR',
+    ],
+    'log_follower': [
+        'LogFollower',
+    ],
+    'log_search': [
+        'LogIndex',
+        'search_log',
+        'parse_timestamp',
+    ],
+    'control_channel': [
+        'ControlChannelException',
+        'ControlServer',
+        'send_control_request',
+    ],
+    'file_watcher': [
+        'FileWatcher',
+    ],
+    'state_store': [
+        'STATE_FORMATS',
+        'read_state',
+        'write_state',
+        'dump_state',
+        'get_state_file_name',
+        'get_lock_file',
+        'lock_state',
+        'update_state',
+        'remove_state',
+    ],
+    'metrics': [
+        'MetricFamily',
+        'Histogram',
+        'MetricsExporter',
+        'format_metrics',
+    ],
+    'profiler': [
+        'PhaseProfiler',
+    ],
+}
+
+_MODULE_BY_NAME = {name: module for module, names in _MODULES.items() for name in names}
+
+__all__ = list(_MODULE_BY_NAME)
+
+
+def __getattr__(name: str):
+    module = _MODULE_BY_NAME.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(importlib.import_module(f'{__name__}.{module}'), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
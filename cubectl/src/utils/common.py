@@ -2,8 +2,10 @@ import logging
 
 import yaml
 from pathlib import Path
-import pydantic
-from typing import Optional, Union
+from typing import Optional, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pydantic
 
 
 __all__ = [
@@ -16,7 +18,7 @@ log = logging.getLogger(__name__)
 
 def read_yaml(
         config_path: Union[str, Path],
-        validation_model: Optional[pydantic.main.ModelMetaclass] = None
+        validation_model: Optional['pydantic.main.ModelMetaclass'] = None
 ):
     """Function to read STATIC config files."""
 
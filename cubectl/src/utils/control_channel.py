@@ -0,0 +1,130 @@
+import json
+import socket
+import logging
+import threading
+import socketserver
+from pathlib import Path
+from typing import Callable, Optional
+
+
+__all__ = [
+    "ControlChannelException",
+    "ControlServer",
+    "send_control_request",
+]
+
+log = logging.getLogger(__file__)
+
+# one request and one response per connection, both are json objects
+# terminated by new line:
+#   request:  {"command": "status", "arguments": {}}
+#   response: {"ok": true, "result": ...} | {"ok": false, "error": "..."}
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+class ControlChannelException(Exception):
+    pass
+
+
+class _ControlRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        handlers: dict = self.server.handlers
+
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_SIZE))
+            command = request['command']
+            arguments = request.get('arguments') or dict()
+            if command not in handlers:
+                raise ControlChannelException(f'unknown command: {command}')
+            response = {'ok': True, 'result': handlers[command](**arguments)}
+        except Exception as e:
+            log.error(f'cubectl: control_channel: request failed: {e}')
+            response = {'ok': False, 'error': str(e)}
+
+        self.wfile.write(json.dumps(response, default=str).encode() + b'\n')
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """
+    Serves commands for watcher over unix domain socket.
+
+    Handlers are called from server threads with arguments supplied by
+    client, returned value has to be json serializable.
+    """
+
+    def __init__(self, socket_path: str, handlers: dict[str, Callable]):
+        self._socket_path = Path(socket_path)
+        self._handlers = handlers
+        self._server: Optional[_ThreadingUnixServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._socket_path.parent.mkdir(parents=True, exist_ok=True)
+        # socket left after killed watcher
+        self._socket_path.unlink(missing_ok=True)
+
+        self._server = _ThreadingUnixServer(
+            str(self._socket_path), _ControlRequestHandler
+        )
+        self._server.handlers = self._handlers
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        log.debug(f'cubectl: control_channel: serving on {self._socket_path}')
+
+    def close(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._socket_path.unlink(missing_ok=True)
+
+
+def send_control_request(
+        socket_path: Optional[str],
+        command: str,
+        timeout: float = 5,
+        **arguments
+):
+    """
+    Sends command to watcher and returns its result.
+
+    Raises:
+        ControlChannelException: if watcher is not reachable or command failed.
+    """
+
+    if not socket_path or not Path(socket_path).exists():
+        raise ControlChannelException(
+            f'cubectl: control_channel: socket not found: {socket_path}'
+        )
+
+    request = json.dumps({'command': command, 'arguments': arguments})
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(str(socket_path))
+            s.sendall(request.encode() + b'\n')
+            with s.makefile('rb') as f:
+                raw_response = f.readline()
+    except OSError as e:
+        raise ControlChannelException(
+            f'cubectl: control_channel: {socket_path} not reachable: {e}'
+        )
+
+    if not raw_response:
+        raise ControlChannelException(
+            f'cubectl: control_channel: no response for {command}'
+        )
+
+    response = json.loads(raw_response)
+    if not response.get('ok'):
+        raise ControlChannelException(
+            f'cubectl: control_channel: {command} failed: {response.get("error")}'
+        )
+    return response.get('result')
@@ -0,0 +1,182 @@
+import os
+import select
+import ctypes
+import ctypes.util
+import struct
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+
+__all__ = [
+    "FileWatcher",
+]
+
+log = logging.getLogger(__file__)
+
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class FileWatcher:
+    """
+    Detects changes of one file.
+
+    With inotify (linux) parent directory of file is watched, so file
+    replaced by rename is detected as well. Burst of events is coalesced
+    into one `on_change` call.
+
+    `is_changed` also compares (st_mtime_ns, st_size, st_ino) of file,
+    which is the only detection method if inotify is not available.
+    """
+
+    def __init__(
+            self,
+            file_path: str,
+            on_change: Optional[Callable[[], None]] = None,
+            coalesce_delay: float = 0.05,
+            watch_modify: bool = False,
+    ):
+        """
+        Arguments:
+            file_path: file to watch, may not exist yet.
+            on_change: called from watcher thread when file was changed.
+            coalesce_delay: events received within this period after
+                first one are reported as one change.
+            watch_modify: report every write, not only closing of file.
+                Needed for files kept open by writer (logs).
+        """
+
+        self._file = Path(file_path)
+        self._on_change = on_change
+        self._coalesce_delay = coalesce_delay
+        self._mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if watch_modify:
+            self._mask |= _IN_MODIFY
+
+        self._changed = threading.Event()
+        self._signature = _get_signature(self._file)
+        self._inotify_fd: Optional[int] = None
+        self._wakeup_r, self._wakeup_w = None, None
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def is_event_driven(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """Starts inotify thread; does nothing if inotify is not available."""
+
+        try:
+            self._inotify_fd = _inotify_watch(self._file.parent, self._mask)
+        except OSError as e:
+            log.debug(f'cubectl: file_watcher: inotify is not used for {self._file}: {e}')
+            return
+
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def is_changed(self) -> bool:
+        """Returns True once for every change since last call."""
+
+        notified = self._changed.is_set()
+        self._changed.clear()
+
+        signature = _get_signature(self._file)
+        if signature != self._signature:
+            self._signature = signature
+            return True
+        return notified
+
+    def reset(self):
+        """Marks current state of file as seen."""
+
+        self._changed.clear()
+        self._signature = _get_signature(self._file)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._wakeup_w is not None:
+            os.write(self._wakeup_w, b'\0')
+
+    def _worker(self):
+        fds = [self._inotify_fd, self._wakeup_r]
+
+        while not self._closed:
+            ready, _, _ = select.select(fds, [], [])
+            if self._wakeup_r in ready:
+                break
+            if not self._read_events():
+                continue
+
+            # coalescing burst of writes
+            while not self._closed:
+                ready, _, _ = select.select(fds, [], [], self._coalesce_delay)
+                if not ready or self._wakeup_r in ready:
+                    break
+                self._read_events()
+
+            self._changed.set()
+            if self._on_change is not None:
+                try:
+                    self._on_change()
+                except Exception as e:
+                    log.error(f'cubectl: file_watcher: on_change callback failed: {e}')
+
+        for fd in (self._inotify_fd, self._wakeup_r, self._wakeup_w):
+            os.close(fd)
+
+    def _read_events(self) -> bool:
+        """Returns True if any of events is related to watched file."""
+
+        try:
+            data = os.read(self._inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+
+        related = False
+        offset = 0
+        while offset < len(data):
+            _, _, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b'\0').decode(errors='replace')
+            offset += name_len
+            if name == self._file.name:
+                related = True
+        return related
+
+
+def _get_signature(file: Path) -> Optional[tuple]:
+    try:
+        s = file.stat()
+    except FileNotFoundError:
+        return None
+    return s.st_mtime_ns, s.st_size, s.st_ino
+
+
+def _inotify_watch(directory: Path, mask: int) -> int:
+    library = ctypes.util.find_library('c')
+    libc = ctypes.CDLL(library, use_errno=True)
+    if not hasattr(libc, 'inotify_init1'):
+        raise OSError('inotify is not supported')
+
+    fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    wd = libc.inotify_add_watch(fd, str(directory).encode(), mask)
+    if wd < 0:
+        errno = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(errno, f'inotify_add_watch failed for {directory}')
+    return fd
@@ -23,18 +23,20 @@ def format_report(report: dict, app_name: str = None) -> str:
 
     Report Format:
 
-        Name             State                  Pid   Port    Uptime
+        Name             State                  Pid   Port    Uptime     CPU%  RSS     FDs  Threads
         Services
-          kanban         started                120   9301    00:23:54
+          kanban         started                120   9301    00:23:54   2.5   120.3M  14   3
           tenants        stopped                121   9302    00:03:21
         Workers
           get_cdr        failed_starting_loop   122
-          get_sim_info   started                123           00:23:41
+          get_sim_info   started                123           00:23:41   0.0   40.1M   5    1
+
+    Resources (CPU%, RSS, FDs, Threads) include children of process.
     """
     result = ''
     if app_name:
         result += f'Installation: {app_name}\n'
-    header = ('Name', 'State', 'Pid', 'Port', 'Uptime', 'ErrorCode')
+    header = ('Name', 'State', 'Pid', 'Port', 'Uptime', 'ErrorCode', 'CPU%', 'RSS', 'FDs', 'Threads')
     template = '{:<20}' * 2 + '{:<10}' * (len(header) - 2) + '\n'
     workers = []
     services = []
@@ -64,7 +66,9 @@ def format_report(report: dict, app_name: str = None) -> str:
         if started_at is not None and started_at != 'None':
             uptime = get_up_time(started_at)
 
-        row = (name, state, pid, port, uptime, error_code)
+        row = (name, state, pid, port, uptime, error_code, *format_resources(
+            service_info['system_data'].get('resources')
+        ))
         if service_info['init_config']['service']:
             services.append(row)
         else:
@@ -88,11 +92,37 @@ def format_report(report: dict, app_name: str = None) -> str:
     return result
 
 
+def format_size(size: int) -> str:
+    for unit in ('B', 'K', 'M', 'G'):
+        if size < 1024:
+            return f'{size:.1f}{unit}' if unit != 'B' else f'{size}{unit}'
+        size /= 1024
+    return f'{size:.1f}T'
+
+
+def format_resources(resources: dict = None) -> tuple:
+    """Returns (CPU%, RSS, FDs, Threads) columns of report."""
+
+    if not resources:
+        return '', '', '', ''
+
+    cpu_percent = resources.get('cpu_percent')
+    return (
+        '' if cpu_percent is None else cpu_percent,
+        format_size(resources.get('rss', 0)),
+        resources.get('open_fds', ''),
+        resources.get('threads', ''),
+    )
+
+
+SERVICE_COLORS = [color.white, color.green, color.blue, color.cyan, color.magenta]
+
+
 def format_logs_response(logs_response: dict, app_name: str = None) -> str:
     if not logs_response:
         return f"No logs found for {app_name}."
 
-    colors = [color.white, color.green, color.blue, color.cyan, color.magenta]
+    colors = SERVICE_COLORS
 
     result = f"Installation: {app_name}\n"
 
@@ -107,3 +137,13 @@ def format_logs_response(logs_response: dict, app_name: str = None) -> str:
         result += color.end
 
     return result
+
+
+def format_log_line(service_name: str, line: str, index: int = 0, width: int = 0) -> str:
+    """
+    Formats line of followed logs: service name prefix is colored the same
+    way as in format_logs_response.
+    """
+
+    service_color = SERVICE_COLORS[index % len(SERVICE_COLORS)]
+    return f"{service_color}{service_name:<{width}}{color.end} | {line.rstrip(chr(10))}"
@@ -1,7 +1,8 @@
-import yaml
 from pathlib import Path
 import logging
 
+from cubectl.src.utils.state_store import read_state
+
 
 log = logging.getLogger(__file__)
 
@@ -35,8 +36,7 @@ def get_app_name_and_register(
         get_default_if_not_found=True
 ) -> (AppName, RegisterLocation):
     try:
-        with Path(register_location).open() as f:
-            register: dict = yaml.load(f, Loader=yaml.Loader)
+        register: list = read_state(register_location)
     except FileNotFoundError:
         raise FileNotFoundError(
             f'cubectl: get_status_file: register not found: {register_location}'
@@ -64,3 +64,42 @@ def get_app_name_and_register(
         )
     else:
         return app_name, register
+
+
+def get_output_log_dir(status_file: str) -> Path:
+    """Directory of logs with captured stdout/stderr of services."""
+
+    return Path(Path(status_file).parent, 'logs')
+
+
+def get_log_cursors_file(status_file: str) -> Path:
+    """File with named log cursors of clients kept by watcher."""
+
+    status_file = Path(status_file)
+    return Path(status_file.parent, f'log_cursors{status_file.suffix}')
+
+
+def get_log_files(status_file: str, services: tuple = None) -> dict:
+    """
+    Returns log files of services from status file.
+
+    Arguments:
+        status_file:
+        services: names of services, all services if empty.
+
+    Returns:
+        {<service_name>: <log_file>}, log file from init file or file with
+        captured output if log file is not set.
+    """
+
+    status = read_state(status_file) or dict()
+    result = dict()
+
+    for process_status in status.get('services', []):
+        init_config = process_status['init_config']
+        if services and init_config['name'] not in services:
+            continue
+        result[init_config['name']] = init_config.get('log') or str(
+            Path(get_output_log_dir(status_file), f"{init_config['name']}.log")
+        )
+    return result
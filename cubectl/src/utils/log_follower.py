@@ -0,0 +1,155 @@
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Optional
+
+from cubectl.src.utils.file_watcher import FileWatcher
+from cubectl.src.utils.log_reader import tail_lines
+
+
+__all__ = [
+    "LogFollower",
+]
+
+log = logging.getLogger(__file__)
+
+# maximum size read from one file at once, other files are served in between
+READ_CHUNK_SIZE = 256 * 1024
+# line without new line longer than this is emitted in parts
+MAX_LINE_LENGTH = 64 * 1024
+
+
+class _FollowedFile:
+    def __init__(self, service_name: str, path: Path):
+        self.service_name = service_name
+        self.path = path
+        self.has_more = False
+        self._offset = 0
+        self._inode = None
+        self._partial = b''
+
+    def seek_end(self, tail: int = None) -> list[str]:
+        """Skips existing content of file, returns its last `tail` lines."""
+
+        try:
+            with self.path.open('rb') as f:
+                self._inode = os.fstat(f.fileno()).st_ino
+                content = tail_lines(f, lines=tail) if tail else b''
+                self._offset = f.seek(0, os.SEEK_END)
+        except FileNotFoundError:
+            return []
+        return _decode_lines(content.splitlines(keepends=True))
+
+    def read_new(self) -> list[str]:
+        """Returns complete lines appended since last call."""
+
+        self.has_more = False
+        try:
+            s = self.path.stat()
+        except FileNotFoundError:
+            return []
+
+        # rotated or truncated file is read from the start
+        if s.st_ino != self._inode or s.st_size < self._offset:
+            self._inode = s.st_ino
+            self._offset = 0
+            self._partial = b''
+
+        if s.st_size == self._offset:
+            return []
+
+        with self.path.open('rb') as f:
+            f.seek(self._offset)
+            data = f.read(READ_CHUNK_SIZE)
+        self._offset += len(data)
+        self.has_more = self._offset < s.st_size
+
+        lines = (self._partial + data).splitlines(keepends=True)
+        self._partial = b''
+        if lines and not lines[-1].endswith(b'\n'):
+            self._partial = lines.pop()
+        if len(self._partial) > MAX_LINE_LENGTH:
+            lines.append(self._partial)
+            self._partial = b''
+        return _decode_lines(lines)
+
+
+class LogFollower:
+    """
+    Streams lines appended to log files of several services.
+
+    Files are read from the position where following started, only new
+    lines are reported. Changes are detected with FileWatcher, files are
+    also checked every `poll_period` seconds, so followed file may not
+    exist yet or be rotated.
+    """
+
+    def __init__(self, log_files: dict[str, str], poll_period: float = 1):
+        """
+        Arguments:
+            log_files: {<service_name>: <log_file>}
+            poll_period: maximal time between checks of files.
+        """
+
+        self._files = [
+            _FollowedFile(service_name, Path(log_file))
+            for service_name, log_file in log_files.items()
+        ]
+        self._poll_period = poll_period
+        self._wakeup = threading.Event()
+        self._watchers = [
+            FileWatcher(str(x.path), on_change=self._wakeup.set, watch_modify=True)
+            for x in self._files
+        ]
+        self._running = True
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+    def read_new(self) -> list[tuple[str, str]]:
+        """Returns (service_name, line) of lines appended since last call."""
+
+        result = []
+        for file in self._files:
+            result.extend((file.service_name, x) for x in file.read_new())
+        return result
+
+    def follow(
+            self,
+            on_line: Callable[[str, str], None],
+            tail: Optional[int] = None,
+    ):
+        """
+        Calls on_line(service_name, line) for every new line until stop()
+        is called.
+
+        Arguments:
+            on_line: line handler.
+            tail: number of already existing lines of each file to show.
+        """
+
+        for watcher in self._watchers:
+            watcher.start()
+
+        try:
+            for file in self._files:
+                for line in file.seek_end(tail=tail):
+                    on_line(file.service_name, line)
+
+            while self._running:
+                for service_name, line in self.read_new():
+                    on_line(service_name, line)
+
+                if any(x.has_more for x in self._files):
+                    continue
+                self._wakeup.wait(timeout=self._poll_period)
+                self._wakeup.clear()
+        finally:
+            for watcher in self._watchers:
+                watcher.close()
+
+
+def _decode_lines(lines: list[bytes]) -> list[str]:
+    return [x.decode('utf-8', errors='replace') for x in lines]
@@ -1,127 +1,275 @@
 import os
+import mmap
+import time
 
 from pathlib import Path
 from logging import getLogger
 from time import sleep
-from typing import Protocol
+from typing import Optional, Protocol
+
+from cubectl.src.models.log_cursor import LogCursor
 
 
 __all__ = [
     "LogReaderProtocol",
     "LogReader",
+    "read_log_range",
+    "DEFAULT_CURSOR",
 ]
 
 log = getLogger(__file__)
 
 
+# size of block read from the end of file while looking for last lines
+TAIL_BLOCK_SIZE = 64 * 1024
+# cursor of get_log and get_latest_log, never expires
+DEFAULT_CURSOR = 'default'
+
+
 class LogReaderProtocol(Protocol):
-    def get_log(self, head: int = None, tail: int = None):
+    def get_log(self, head: int = None, tail: int = None, n_bytes: int = None):
+        ...
+
+    def get_latest_log(self, head: int = None, tail: int = None, n_bytes: int = None):
+        ...
+
+    def get_log_range(
+            self,
+            latest: bool = True,
+            head: int = None,
+            tail: int = None,
+            n_bytes: int = None,
+            cursor: str = DEFAULT_CURSOR,
+            ack: bool = True,
+    ) -> Optional[dict]:
         ...
 
-    def get_latest_log(self, head: int = None, tail: int = None):
+    def get_tail(self, lines: int, max_bytes: int) -> str:
+        ...
+
+    def ack_log(self, cursor: str, offset: int):
+        ...
+
+    def get_cursors(self) -> dict:
+        ...
+
+    def set_cursors(self, cursors: dict):
+        ...
+
+    def expire_cursors(self, ttl: float):
         ...
 
 
 class LogReader:
     def __init__(self, log_file: str):
         self._raw_log_file = log_file
-        if not log_file or not Path(log_file).is_file():
+        self._log = Path(log_file).resolve() if log_file else None
+        if not self._log or not self._log.is_file():
             log.warning(
                 f'cubectl: service_process: LogReader: log file {log_file}, not found.'
             )
-            self._log = None
-        else:
-            self._log = Path(log_file)
-        self._seek_cursor = None
-        self._file_stat = None
-
-    def get_log(self, head: int = None, tail: int = None):
-        if not self._log:
+        # client name -> position of client in log file
+        self._cursors: dict[str, LogCursor] = dict()
+
+    def get_log(self, head: int = None, tail: int = None, n_bytes: int = None):
+        """
+        Arguments:
+            head: return only first lines of file.
+            tail: return only last lines of file.
+            n_bytes: return only last bytes of file.
+
+        Only requested part of file is read, whole file is read if none
+        of arguments is supplied.
+        """
+
+        log_range = self.get_log_range(latest=False, head=head, tail=tail, n_bytes=n_bytes)
+        if log_range is None:
             return f"No logfile found for {self._raw_log_file}."
+        return _decode(read_log_range(**log_range))
 
-        self._update_file_info()
+    def get_latest_log(self, head: int = None, tail: int = None, n_bytes: int = None):
+        log_range = self.get_log_range(latest=True, head=head, tail=tail, n_bytes=n_bytes)
+        if log_range is None:
+            return f"No logfile found for {self._raw_log_file}."
+        return _decode(read_log_range(**log_range))
+
+    def get_log_range(
+            self,
+            latest: bool = True,
+            head: int = None,
+            tail: int = None,
+            n_bytes: int = None,
+            cursor: str = DEFAULT_CURSOR,
+            ack: bool = True,
+    ) -> Optional[dict]:
+        """
+        Returns part of log file to be read by caller and moves cursor to
+        its end. Content is not read, except of looking for line ends
+        for head and tail.
+
+        Arguments:
+            latest: only part of file after cursor.
+            head, tail, n_bytes: see get_log.
+            cursor: name of client, every client reads log independently.
+            ack: move cursor right away. Otherwise cursor is moved by
+                ack_log after client has read the range, so range not
+                acknowledged (interrupted client) is returned again.
+
+        Returns:
+            {'path': <absolute path>, 'offset': int, 'length': int}
+            None if log file does not exist.
+        """
+
+        if not self._log or not self._log.is_file():
+            return None
+
+        log_cursor = self._cursors.setdefault(cursor, LogCursor())
+        log_cursor.updated_at = time.time()
+
+        with self._log.open('rb') as f:
+            s = os.fstat(f.fileno())
+            # new, rotated or truncated file is read from the start
+            if s.st_ino != log_cursor.inode or s.st_size < log_cursor.offset:
+                log_cursor.inode = s.st_ino
+                log_cursor.offset = 0
+
+            offset, end = get_part_range(
+                fd=f,
+                head=head,
+                tail=tail,
+                n_bytes=n_bytes,
+                start=log_cursor.offset if latest else 0,
+                end=s.st_size,
+            )
 
-        with self._log.open() as f:
-            try:
-                result = get_file_lines(fd=f, head=head, tail=tail)
-                self._seek_cursor = f.tell()
-            except UnicodeDecodeError as ude:
-                log.warning(f'cubectl: log_reader: logfile: {self._log} raised {ude} during reading.')
-                self._seek_cursor = 0
+        if ack:
+            log_cursor.offset = end
+        return {'path': str(self._log), 'offset': offset, 'length': end - offset}
 
-        self._update_file_info()
-        return "".join(result)
+    def get_tail(self, lines: int, max_bytes: int) -> str:
+        """
+        Returns at most last `lines` lines and `max_bytes` bytes of log
+        without moving cursors. No more than max_bytes of file is read.
+        """
 
-    def get_latest_log(self, head: int = None, tail: int = None):
-        result = []
+        if lines <= 0 or max_bytes <= 0 or not self._log or not self._log.is_file():
+            return ''
 
-        if not self._log:
-            return f"No logfile found for {self._raw_log_file}."
+        with self._log.open('rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            start = find_tail_start(f, lines=lines, start=max(0, end - max_bytes), end=end)
+            f.seek(start)
+            return _decode(f.read(end - start))
 
-        if _is_new_file(new_stat=self._log.stat(), old_stat=self._file_stat):
-            return self.get_log(head=head, tail=tail)
-
-        if _is_file_changed(new_stat=self._log.stat(), old_stat=self._file_stat):
-            with self._log.open() as f:
-                self._update_file_info()
-                try:
-                    result = get_file_lines(fd=f, head=head, tail=tail, seek_cursor=self._seek_cursor)
-                    self._seek_cursor = f.tell()
-                except UnicodeDecodeError as ude:
-                    log.warning(f'cubectl: log_reader: logfile: {self._log} raised {ude} during reading.')
-                    self._seek_cursor = 0
-
-        self._update_file_info()
-        return "".join(result)
-
-    def _update_file_info(self):
-        s = self._log.stat()
-        if self._file_stat is None:
-            self._seek_cursor = 0
-        elif s.st_size < self._file_stat.st_size:
-            self._seek_cursor = s.st_size
-        self._file_stat = s
-
-
-def truncate_list(list_object: list, head=None, tail=None):
-    result = list_object.copy()
-    if head:
-        result = result[:head]
-    if tail:
-        result = result[-tail:]
-    return result
+    def ack_log(self, cursor: str, offset: int):
+        """Moves cursor to the end of range read by client."""
 
+        log_cursor = self._cursors.get(cursor)
+        if log_cursor is None:
+            return
+        log_cursor.offset = offset
+        log_cursor.updated_at = time.time()
 
-def get_file_lines(fd, head: int = None, tail: int = None, seek_cursor: int = 0):
-    result = []
-    fd.seek(seek_cursor)
+    def get_cursors(self) -> dict:
+        return {k: v.dict() for k, v in self._cursors.items()}
 
-    if head:
-        for _ in range(head):
-            result.append(fd.readline())
-    else:
-        for line in fd.readlines():
-            result.append(line)
+    def set_cursors(self, cursors: dict):
+        self._cursors.update({k: LogCursor(**v) for k, v in cursors.items()})
 
-    return truncate_list(result, tail=tail)
+    def expire_cursors(self, ttl: float):
+        """Drops cursors of clients not seen for ttl seconds."""
 
+        expired_before = time.time() - ttl
+        for name, log_cursor in list(self._cursors.items()):
+            if name != DEFAULT_CURSOR and log_cursor.updated_at < expired_before:
+                del self._cursors[name]
 
-def _is_file_changed(new_stat: os.stat_result, old_stat: os.stat_result = None) -> bool:
-    is_changed = False
 
-    if old_stat is None:
-        is_changed = True
+def _decode(content: bytes) -> str:
+    return content.decode('utf-8', errors='replace')
 
-    if new_stat.st_mtime != old_stat.st_mtime:
-        is_changed = True
 
-    return is_changed
+def read_log_range(path: str, offset: int, length: int) -> bytes:
+    """Reads part of log file returned by LogReader.get_log_range."""
 
+    if length <= 0:
+        return b''
 
-def _is_new_file(new_stat: os.stat_result, old_stat: os.stat_result = None) -> bool:
-    if old_stat is not None:
-        return new_stat.st_ctime < old_stat.st_ctime
-    return True
+    with open(path, 'rb') as f:
+        if offset >= os.fstat(f.fileno()).st_size:
+            return b''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[offset:offset + length]
+
+
+def get_part_range(
+        fd,
+        head: int = None,
+        tail: int = None,
+        n_bytes: int = None,
+        start: int = 0,
+        end: int = None,
+) -> tuple[int, int]:
+    """Returns (offset, end) of requested part of binary file after start."""
+
+    if end is None:
+        end = fd.seek(0, os.SEEK_END)
+
+    if head:
+        return start, min(end, find_head_end(fd, lines=head, start=start))
+    if tail:
+        return find_tail_start(fd, lines=tail, start=start, end=end), end
+    if n_bytes:
+        return max(start, end - n_bytes), end
+    return start, end
+
+
+def find_head_end(fd, lines: int, start: int = 0) -> int:
+    fd.seek(start)
+    for _ in range(lines):
+        if not fd.readline():
+            break
+    return fd.tell()
+
+
+def find_tail_start(fd, lines: int, start: int = 0, end: int = None) -> int:
+    """
+    Returns offset of first of last lines of binary file after start.
+    File is read by blocks backwards from the end, so time does not
+    depend on file size.
+    """
+
+    if end is None:
+        end = fd.seek(0, os.SEEK_END)
+    position = end
+    new_lines_found = 0
+
+    while position > start:
+        size = min(TAIL_BLOCK_SIZE, position - start)
+        position -= size
+        fd.seek(position)
+        block = fd.read(size)
+
+        index = len(block)
+        while True:
+            index = block.rfind(b'\n', 0, index)
+            if index < 0:
+                break
+            # new line ending last line does not start new one
+            if position + index == end - 1:
+                continue
+            new_lines_found += 1
+            if new_lines_found == lines:
+                return position + index + 1
+    return start
+
+
+def tail_lines(fd, lines: int, start: int = 0) -> bytes:
+    """Returns last lines of binary file after start offset."""
+
+    end = fd.seek(0, os.SEEK_END)
+    fd.seek(find_tail_start(fd, lines=lines, start=start, end=end))
+    return fd.read(end - fd.tell())
 
 
 def main():
@@ -0,0 +1,226 @@
+import re
+import mmap
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Union
+
+from cubectl.src.utils.state_store import read_state, write_state
+
+
+__all__ = [
+    "LogIndex",
+    "search_log",
+    "parse_timestamp",
+]
+
+log = logging.getLogger(__file__)
+
+# distance in bytes between entries of sparse index
+INDEX_STEP = 1024 * 1024
+# timestamp is looked for at the beginning of line only
+TIMESTAMP_SEARCH_LENGTH = 64
+_TIMESTAMP_PATTERN = re.compile(
+    rb'(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})'
+)
+
+
+def parse_timestamp(line: bytes) -> Optional[datetime]:
+    """Returns timestamp from beginning of log line (2023-01-31 12:00:00 / ISO)."""
+
+    match = _TIMESTAMP_PATTERN.search(line, 0, TIMESTAMP_SEARCH_LENGTH)
+    if match is None:
+        return None
+    try:
+        return datetime.fromisoformat(
+            f'{match.group(1).decode()} {match.group(2).decode()}'
+        )
+    except ValueError:
+        return None
+
+
+class LogIndex:
+    """
+    Sparse index of log file: offset of line start every INDEX_STEP bytes
+    together with timestamp of that line.
+
+    Index is saved to separate file and is updated incrementally, only
+    part of log appended since previous update is indexed. Rotated or
+    truncated log is indexed again.
+    """
+
+    def __init__(self, log_file: Union[str, Path], index_file: Union[str, Path]):
+        self._log_file = Path(log_file)
+        self._index_file = Path(index_file)
+        # [[offset, timestamp or None], ...]
+        self._entries: list[list] = list()
+        self._inode = None
+        self._indexed_size = 0
+
+    @property
+    def entries(self) -> list:
+        return self._entries
+
+    def update(self, mm: mmap.mmap):
+        """Indexes part of mapped log file not indexed yet."""
+
+        self._load()
+        size = len(mm)
+        inode = self._log_file.stat().st_ino
+        if inode != self._inode or size < self._indexed_size:
+            self._entries = [[0, _get_timestamp_value(mm, 0)]]
+            self._inode = inode
+            self._indexed_size = 0
+
+        if size == self._indexed_size:
+            return
+
+        offset = self._entries[-1][0] + INDEX_STEP
+        while offset < size:
+            line_start = mm.find(b'\n', offset) + 1
+            if line_start <= 0 or line_start >= size:
+                break
+            self._entries.append([line_start, _get_timestamp_value(mm, line_start)])
+            offset = line_start + INDEX_STEP
+
+        self._indexed_size = size
+        self._save()
+
+    def get_start_offset(self, since: Optional[datetime]) -> int:
+        """
+        Returns offset of indexed line, after which lines newer than
+        `since` may appear. Timestamps in log are expected to grow.
+        """
+
+        if since is None:
+            return 0
+
+        since_value = since.timestamp()
+        result = 0
+        for offset, timestamp in self._entries:
+            if timestamp is not None and timestamp >= since_value:
+                break
+            result = offset
+        return result
+
+    def _load(self):
+        if self._inode is not None:
+            return
+        try:
+            index = read_state(self._index_file) or dict()
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            log.warning(f'cubectl: log_search: index {self._index_file} is not valid: {e}')
+            return
+        self._inode = index.get('inode')
+        self._indexed_size = index.get('size', 0)
+        self._entries = index.get('entries') or [[0, None]]
+
+    def _save(self):
+        self._index_file.parent.mkdir(parents=True, exist_ok=True)
+        write_state(
+            self._index_file,
+            {
+                'inode': self._inode,
+                'size': self._indexed_size,
+                'entries': self._entries,
+            },
+        )
+
+
+def search_log(
+        log_file: Union[str, Path],
+        pattern: str,
+        since: Optional[datetime] = None,
+        context: int = 0,
+        index_file: Union[str, Path] = None,
+        max_matches: int = None,
+) -> list[list[str]]:
+    """
+    Searches log file for lines matching regular expression.
+
+    File is memory mapped and searched by regular expression directly,
+    without reading it line by line. With `since` search starts from
+    position found with LogIndex, lines with timestamp older than `since`
+    are skipped, lines without timestamp are not filtered out.
+
+    Arguments:
+        log_file:
+        pattern: regular expression.
+        since: search only lines logged after this time.
+        context: number of lines shown before and after matched line.
+        index_file: location of index, index is not used if not supplied.
+        max_matches: stop after this number of matched lines.
+
+    Returns:
+        groups of lines: matched line with its context, groups of
+        overlapping contexts are merged.
+    """
+
+    log_file = Path(log_file)
+    if not log_file.is_file() or log_file.stat().st_size == 0:
+        return []
+
+    regex = re.compile(pattern.encode(), re.MULTILINE)
+    since_value = since.timestamp() if since else None
+
+    with log_file.open('rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        if index_file is not None:
+            index = LogIndex(log_file=log_file, index_file=index_file)
+            index.update(mm)
+            start = index.get_start_offset(since)
+
+        # [[first_line_start, last_line_end], ...]
+        ranges: list[list[int]] = []
+        matches = 0
+        position = start
+
+        while max_matches is None or matches < max_matches:
+            match = regex.search(mm, position)
+            if match is None or match.start() >= len(mm):
+                break
+            line_start = mm.rfind(b'\n', 0, match.start()) + 1
+            line_end = _get_line_end(mm, match.start())
+            position = line_end
+
+            if since_value is not None:
+                timestamp = _get_timestamp_value(mm, line_start)
+                if timestamp is not None and timestamp < since_value:
+                    continue
+
+            first = line_start
+            for _ in range(context):
+                if first == 0:
+                    break
+                first = mm.rfind(b'\n', 0, first - 1) + 1
+            last = line_end
+            for _ in range(context):
+                if last >= len(mm):
+                    break
+                last = _get_line_end(mm, last)
+
+            # context of neighbour matches is shown as one group
+            if ranges and context and first <= ranges[-1][1]:
+                ranges[-1][1] = last
+            else:
+                ranges.append([first, last])
+            matches += 1
+
+        return [
+            mm[first:last].decode('utf-8', errors='replace').splitlines(keepends=True)
+            for first, last in ranges
+        ]
+
+
+def _get_line_end(mm: mmap.mmap, position: int) -> int:
+    """Returns offset after new line ending line at position."""
+
+    end = mm.find(b'\n', position)
+    return len(mm) if end < 0 else end + 1
+
+
+def _get_timestamp_value(mm: mmap.mmap, line_start: int) -> Optional[float]:
+    timestamp = parse_timestamp(mm[line_start:line_start + TIMESTAMP_SEARCH_LENGTH])
+    return timestamp.timestamp() if timestamp else None
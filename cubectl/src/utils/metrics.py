@@ -0,0 +1,212 @@
+import os
+import logging
+import tempfile
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Optional
+
+
+__all__ = [
+    "MetricFamily",
+    "Histogram",
+    "MetricsExporter",
+    "format_metrics",
+]
+
+log = logging.getLogger(__file__)
+
+# seconds, reconcile cycle is usually a few milliseconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricFamily:
+    """Samples of one metric in Prometheus text exposition format."""
+
+    def __init__(self, name: str, metric_type: str, documentation: str):
+        self.name = name
+        self.type = metric_type
+        self.documentation = documentation
+        # (name suffix, labels, value)
+        self.samples: list[tuple[str, dict, float]] = []
+
+    def add(self, labels: dict, value: float, suffix: str = ''):
+        self.samples.append((suffix, labels, value))
+
+
+class Histogram:
+    """Cumulative histogram of observed values, safe for concurrent use."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self._buckets = tuple(sorted(buckets))
+        # last counter is for values above highest bucket
+        self._counts = [0] * (len(self._buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect_left(self._buckets, value)] += 1
+            self._sum += value
+
+    def add_to(self, family: MetricFamily, labels: dict):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        cumulative = 0
+        for bucket, count in zip(self._buckets, counts):
+            cumulative += count
+            family.add({**labels, 'le': _format_value(bucket)}, cumulative, suffix='_bucket')
+        cumulative += counts[-1]
+        family.add({**labels, 'le': '+Inf'}, cumulative, suffix='_bucket')
+        family.add(labels, total, suffix='_sum')
+        family.add(labels, cumulative, suffix='_count')
+
+
+def format_metrics(families: list[MetricFamily]) -> str:
+    """Families with same name (e.g. from several executors) are merged."""
+
+    merged: dict[str, MetricFamily] = dict()
+    for family in families:
+        if family.name not in merged:
+            merged[family.name] = MetricFamily(family.name, family.type, family.documentation)
+        merged[family.name].samples.extend(family.samples)
+
+    lines = []
+    for family in merged.values():
+        lines.append(f'# HELP {family.name} {_escape(family.documentation, quote=False)}')
+        lines.append(f'# TYPE {family.name} {family.type}')
+        for suffix, labels, value in family.samples:
+            lines.append(f'{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        try:
+            body = format_metrics(self.server.collect()).encode()
+        except Exception as e:
+            log.error(f'cubectl: metrics: collecting failed: {e}')
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsExporter:
+    """
+    Exposes metrics returned by `collect` over HTTP (/metrics) and/or
+    writes them periodically to file for node_exporter textfile collector.
+    """
+
+    def __init__(
+            self,
+            collect: Callable[[], list[MetricFamily]],
+            port: Optional[int] = None,
+            host: str = '127.0.0.1',
+            textfile: Optional[str] = None,
+            textfile_period: float = 15,
+    ):
+        """
+        Arguments:
+            collect: returns current metrics, called from exporter threads.
+            port: port of HTTP endpoint, not served if None (0 is any port).
+            host: address of HTTP endpoint.
+            textfile: file (*.prom) to write metrics to, replaced atomically.
+            textfile_period: seconds between writes of textfile.
+        """
+
+        self._collect = collect
+        self._port = port
+        self._host = host
+        self._textfile = Path(textfile) if textfile else None
+        self._textfile_period = textfile_period
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    @property
+    def port(self) -> Optional[int]:
+        return self._server.server_address[1] if self._server else None
+
+    def start(self):
+        if self._port is not None:
+            try:
+                self._server = ThreadingHTTPServer((self._host, self._port), _MetricsRequestHandler)
+            except OSError as e:
+                log.error(f'cubectl: metrics: endpoint was not started on {self._host}:{self._port}: {e}')
+            else:
+                self._server.daemon_threads = True
+                self._server.collect = self._collect
+                self._start_thread(self._server.serve_forever)
+                log.debug(f'cubectl: metrics: serving on {self._host}:{self.port}')
+
+        if self._textfile is not None:
+            self._start_thread(self._write_textfile_loop)
+
+    def close(self):
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+
+    def write_textfile(self):
+        content = format_metrics(self._collect())
+        self._textfile.parent.mkdir(parents=True, exist_ok=True)
+        # collector should never read partially written file
+        fd, temp_path = tempfile.mkstemp(dir=self._textfile.parent, prefix='.cubectl_metrics')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self._textfile)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def _start_thread(self, target: Callable):
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _write_textfile_loop(self):
+        while True:
+            try:
+                self.write_textfile()
+            except Exception as e:
+                log.error(f'cubectl: metrics: writing of {self._textfile} failed: {e}')
+            if self._stop.wait(self._textfile_period):
+                break
+
+
+def _escape(value: str, quote: bool = True) -> str:
+    value = value.replace('\\', '\\\\').replace('\n', '\\n')
+    return value.replace('"', '\\"') if quote else value
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
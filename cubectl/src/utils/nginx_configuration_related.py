@@ -3,7 +3,7 @@ import os
 import logging
 from typing import Optional
 
-from cubectl.src.utils import read_yaml
+from cubectl.src.utils.state_store import read_state
 
 
 log = logging.getLogger(__file__)
@@ -49,7 +49,7 @@ def get_all_allocated_ports_by_app(register: list):
 
     for app in (x for x in register):
         try:
-            status = read_yaml(app['status_file'])
+            status = read_state(app['status_file'])
         except FileNotFoundError:
             log.warning(f"cubectl: get_all_allocated_ports_by_app: "
                         f"status_file for {app['app_name']}: "
@@ -0,0 +1,260 @@
+import time
+import logging
+import threading
+from typing import Callable, Optional
+
+
+__all__ = [
+    "NotificationDispatcher",
+    "NotificationDeliveryError",
+    "fit_log_tail",
+]
+
+log = logging.getLogger(__file__)
+
+# prepended to log tail shortened to fit size limit of notifier
+TRUNCATED_MARK = '[...] '
+
+
+class NotificationDeliveryError(Exception):
+    """
+    Raised by `deliver` of NotificationDispatcher.
+
+    Arguments:
+        retry: delivery may succeed later (timeout, 429, 5xx).
+        retry_after: seconds to wait before next attempt, requested by receiver.
+    """
+
+    def __init__(self, message: str, retry: bool = True, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry = retry
+        self.retry_after = retry_after
+
+
+class _Destination:
+    def __init__(self):
+        self.messages: list[str] = []
+        self.dropped = 0
+        # monotonic time before which nothing is sent to destination
+        self.not_before = 0.0
+        self.first_queued_at = 0.0
+        self.failures = 0
+
+
+class NotificationDispatcher:
+    """
+    Delivers notifications from background thread, so `submit` never blocks.
+
+    Messages are queued per destination (e.g. telegram chat). Destination
+    receives at most one message per `min_interval`, messages queued in the
+    meantime (restart storm) are sent as one digest. Failed deliveries are
+    retried with exponential backoff, other destinations are not delayed.
+    """
+
+    def __init__(
+            self,
+            deliver: Callable[[str, str], None],
+            min_interval: float = 1,
+            coalesce_window: float = 2,
+            retries: int = 5,
+            backoff: float = 1,
+            max_backoff: float = 60,
+            max_pending: int = 100,
+            max_length: Optional[int] = 4096,
+            format_batch: Optional[Callable[[list[str], int], str]] = None,
+            name: str = 'notifications',
+    ):
+        """
+        Arguments:
+            deliver: sends text to destination, raises NotificationDeliveryError
+                (or any other exception, which is retried) on failure.
+            min_interval: min seconds between messages to one destination.
+            coalesce_window: seconds first message of burst waits for others.
+            retries: attempts of delivery after first failed one.
+            backoff: delay before first retry, doubled for every next one.
+            max_backoff: max delay between retries.
+            max_pending: messages kept per destination, oldest are dropped.
+            max_length: max length of sent text (4096 for telegram), not
+                limited if None.
+            format_batch: joins messages sent together and number of
+                dropped ones into one text, digest for humans by default.
+            name: name of worker thread and prefix of logs.
+        """
+
+        self._deliver = deliver
+        self._min_interval = min_interval
+        self._coalesce_window = coalesce_window
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._max_pending = max_pending
+        self._max_length = max_length
+        self._format_batch = format_batch or _format_digest
+        self._name = name
+        self._destinations: dict[str, _Destination] = dict()
+        self._condition = threading.Condition()
+        self._closing = False
+        self._flush_deadline = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self.delivered = 0
+        self.failed = 0
+
+    def submit(self, destination: str, text: str):
+        with self._condition:
+            if self._closing:
+                log.warning(f'cubectl: {self._name}: dispatcher is closed, message dropped.')
+                return
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f'cubectl-{self._name}', daemon=True
+                )
+                self._thread.start()
+
+            state = self._destinations.get(destination)
+            if state is None:
+                state = self._destinations[destination] = _Destination()
+            if not state.messages:
+                state.first_queued_at = time.monotonic()
+            state.messages.append(text)
+            if len(state.messages) > self._max_pending:
+                del state.messages[0]
+                state.dropped += 1
+            self._condition.notify()
+
+    def pending(self) -> int:
+        with self._condition:
+            return sum(len(x.messages) for x in self._destinations.values())
+
+    def close(self, timeout: float = 5):
+        """Sends queued messages (ignoring rate limit) for at most `timeout` seconds."""
+
+        with self._condition:
+            self._closing = True
+            self._flush_deadline = time.monotonic() + timeout
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout + 1)
+            if thread.is_alive():
+                log.warning(f'cubectl: {self._name}: not all notifications were sent.')
+
+    def _ready_at(self, state: _Destination) -> float:
+        if self._closing:
+            return 0.0 if state.failures == 0 else state.not_before
+        return max(state.not_before, state.first_queued_at + self._coalesce_window)
+
+    def _next(self) -> Optional[tuple[str, list[str], int]]:
+        """Waits for destination ready to be sent to. Returns None on close."""
+
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._closing and now >= self._flush_deadline:
+                    return None
+
+                wait_until = None
+                for destination, state in self._destinations.items():
+                    if not state.messages:
+                        continue
+                    ready_at = self._ready_at(state)
+                    if ready_at <= now:
+                        messages, dropped = state.messages, state.dropped
+                        state.messages, state.dropped = [], 0
+                        return destination, messages, dropped
+                    wait_until = ready_at if wait_until is None else min(wait_until, ready_at)
+
+                if self._closing:
+                    if wait_until is None:
+                        return None
+                    wait_until = min(wait_until, self._flush_deadline)
+                self._condition.wait(None if wait_until is None else wait_until - now)
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            destination, messages, dropped = item
+            self._send(destination, messages, dropped)
+
+    def _send(self, destination: str, messages: list[str], dropped: int):
+        text = self._format_batch(messages, dropped)
+        if self._max_length is not None and len(text) > self._max_length:
+            text = text[:self._max_length - 3] + '...'
+
+        error = None
+        try:
+            self._deliver(destination, text)
+        except NotificationDeliveryError as e:
+            error = e
+        except Exception as e:
+            error = NotificationDeliveryError(str(e))
+
+        with self._condition:
+            state = self._destinations[destination]
+            if error is None:
+                self.delivered += 1
+                state.failures = 0
+                state.not_before = time.monotonic() + self._min_interval
+                return
+
+            state.failures += 1
+            if not error.retry or state.failures > self._retries:
+                self.failed += 1
+                log.error(f'cubectl: {self._name}: delivery to {destination} failed, '
+                          f'{len(messages)} message(s) dropped: {error}')
+                state.failures = 0
+                state.not_before = time.monotonic() + self._min_interval
+                return
+
+            delay = min(self._backoff * 2 ** (state.failures - 1), self._max_backoff)
+            if error.retry_after is not None:
+                delay = max(delay, error.retry_after)
+            log.warning(f'cubectl: {self._name}: delivery to {destination} failed, '
+                        f'retry {state.failures}/{self._retries} in {delay:.1f}s: {error}')
+            # messages queued meanwhile are sent with failed ones as one digest
+            state.messages = messages + state.messages
+            state.dropped += dropped
+            overflow = len(state.messages) - self._max_pending
+            if overflow > 0:
+                del state.messages[:overflow]
+                state.dropped += overflow
+            state.not_before = time.monotonic() + delay
+
+
+def _format_digest(messages: list[str], dropped: int) -> str:
+    if len(messages) == 1 and not dropped:
+        return messages[0]
+
+    header = f'{len(messages) + dropped} notifications'
+    if dropped:
+        header += f' ({dropped} oldest dropped)'
+    return '\n\n'.join([header + ':', *messages])
+
+
+def fit_log_tail(message: dict, render: Callable[[dict], str], max_length: Optional[int]) -> str:
+    """
+    Renders message, beginning of its `log_tail` is cut so rendered text
+    fits max_length. Text may still be longer if message is long without it.
+    """
+
+    text = render(message)
+    log_tail = message.get('log_tail')
+    if max_length is None or not log_tail:
+        return text
+
+    if len(text) <= max_length:
+        return text
+
+    def shortened(keep: int) -> str:
+        return render({**message, 'log_tail': TRUNCATED_MARK + log_tail[-keep:] if keep else ''})
+
+    # rendering may escape tail (e.g. json), so longest fitting end of it is searched
+    low, high = 0, len(log_tail) - 1
+    while low < high:
+        keep = (low + high + 1) // 2
+        if len(shortened(keep)) <= max_length:
+            low = keep
+        else:
+            high = keep - 1
+    return shortened(low)
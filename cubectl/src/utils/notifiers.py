@@ -0,0 +1,378 @@
+import os
+import json
+import socket
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Union
+
+from cubectl.src.models.notifier import NotifierConfig, NotifierType
+from cubectl.src.utils.telegram_utils import Messanger, TelegramMessanger
+from cubectl.src.utils.notification_dispatcher import (
+    NotificationDispatcher,
+    NotificationDeliveryError,
+    fit_log_tail,
+)
+
+
+__all__ = [
+    "NotifierException",
+    "FanOutMessanger",
+    "WebhookMessanger",
+    "UnixSocketMessanger",
+    "JsonlMessanger",
+    "SyslogMessanger",
+    "register_notifier",
+    "create_notifier",
+    "create_notifiers",
+    "get_notifier_key",
+    "get_notifier_configs_from_env",
+    "create_event",
+]
+
+log = logging.getLogger(__file__)
+
+# states of processes reported with error severity to syslog
+FAILED_STATES = ('FAILED_START_LOOP', 'FAILED_TO_START')
+# default max size of syslog message, rsyslog drops longer ones
+SYSLOG_MAX_LENGTH = 8192
+SYSLOG_FACILITIES = {
+    'kern': 0, 'user': 1, 'daemon': 3, 'syslog': 5,
+    **{f'local{i}': 16 + i for i in range(8)},
+}
+
+_factories: dict[str, Callable[..., Messanger]] = dict()
+
+
+class NotifierException(Exception):
+    pass
+
+
+def create_event(event: str, **fields) -> dict:
+    """Structured notification, serialized as json by local sinks."""
+
+    return {
+        'event': event,
+        'timestamp': datetime.now().astimezone().isoformat(timespec='seconds'),
+        'host': socket.gethostname(),
+        **fields,
+    }
+
+
+class FanOutMessanger:
+    """Posts every message to all messangers, failure of one does not affect others."""
+
+    def __init__(self, messangers: Optional[list[Messanger]] = None):
+        self._messangers = list(messangers or [])
+
+    def __bool__(self):
+        return bool(self._messangers)
+
+    def __len__(self):
+        return len(self._messangers)
+
+    def add(self, messanger: Optional[Messanger]):
+        if messanger is not None:
+            self._messangers.append(messanger)
+
+    def post(self, message: Union[str, dict]):
+        for messanger in self._messangers:
+            try:
+                messanger.post(message)
+            except Exception as e:
+                log.error(f'cubectl: notifiers: {type(messanger).__name__} failed: {e}')
+
+    def close(self, timeout: float = 5):
+        for messanger in self._messangers:
+            close = getattr(messanger, 'close', None)
+            if close is not None:
+                close(timeout=timeout)
+
+
+class _JsonLinesMessanger(ABC):
+    """
+    Base of local sinks: message is serialized to one json line and sent
+    from background thread, lines queued meanwhile are sent together.
+    Log tail of message is shortened, so line is not longer than max_length.
+    """
+
+    destination = ''
+
+    def __init__(self, max_length: Optional[int] = None, **dispatcher_options):
+        self._max_length = max_length
+        dispatcher_options.setdefault('min_interval', 0)
+        dispatcher_options.setdefault('coalesce_window', 0)
+        dispatcher_options.setdefault('max_pending', 1000)
+        dispatcher_options.setdefault('name', type(self).__name__)
+        self._dispatcher = NotificationDispatcher(
+            deliver=self._deliver,
+            max_length=None,
+            format_batch=self._format_batch,
+            **dispatcher_options,
+        )
+
+    def post(self, message: Union[str, dict]):
+        if not isinstance(message, dict):
+            message = create_event('message', text=str(message))
+        text = fit_log_tail(message, self._serialize, self._max_length)
+        self._dispatcher.submit(destination=self.destination, text=text)
+
+    def close(self, timeout: float = 5):
+        self._dispatcher.close(timeout=timeout)
+
+    def _serialize(self, message: dict) -> str:
+        return json.dumps(message, default=str)
+
+    def _format_batch(self, lines: list[str], dropped: int) -> str:
+        if dropped:
+            lines = [self._serialize(create_event('dropped', count=dropped)), *lines]
+        return '\n'.join(lines)
+
+    @abstractmethod
+    def _deliver(self, destination: str, text: str):
+        """Sends json lines to destination, errors are retried as in NotificationDispatcher."""
+
+
+class WebhookMessanger(_JsonLinesMessanger):
+    """POSTs events to url as json lines (application/x-ndjson)."""
+
+    def __init__(self, url: str, headers: Optional[dict] = None, timeout: float = 10, **dispatcher_options):
+        self.destination = url
+        self._headers = {'Content-Type': 'application/x-ndjson', **(headers or dict())}
+        self._timeout = timeout
+        self._session = None
+        super().__init__(**dispatcher_options)
+
+    def close(self, timeout: float = 5):
+        super().close(timeout=timeout)
+        if self._session is not None:
+            self._session.close()
+
+    def _deliver(self, destination: str, text: str):
+        if self._session is None:
+            # requests is slow to import, it is loaded only when event is sent
+            import requests
+
+            self._session = requests.Session()
+
+        r = self._session.post(
+            url=destination, data=text.encode(), headers=self._headers, timeout=self._timeout
+        )
+        if r.status_code < 300:
+            return
+        retry_after = r.headers.get('Retry-After')
+        raise NotificationDeliveryError(
+            f'{r.status_code} {r.reason}',
+            retry=r.status_code == 429 or r.status_code >= 500,
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+
+
+class UnixSocketMessanger(_JsonLinesMessanger):
+    """Writes events as json lines to listener of unix stream socket."""
+
+    def __init__(self, path: str, timeout: float = 10, **dispatcher_options):
+        self.destination = path
+        self._timeout = timeout
+        super().__init__(**dispatcher_options)
+
+    def _deliver(self, destination: str, text: str):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(self._timeout)
+            s.connect(destination)
+            s.sendall(text.encode() + b'\n')
+
+
+class JsonlMessanger(_JsonLinesMessanger):
+    """Appends events as json lines to file."""
+
+    def __init__(self, path: str, **dispatcher_options):
+        self.destination = path
+        super().__init__(**dispatcher_options)
+
+    def _deliver(self, destination: str, text: str):
+        Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        with open(destination, 'a') as f:
+            f.write(text + '\n')
+
+
+class SyslogMessanger(_JsonLinesMessanger):
+    """Sends events as json to syslog, failed states with error severity."""
+
+    def __init__(
+            self,
+            address: Optional[str] = None,
+            facility: str = 'user',
+            tag: str = 'cubectl',
+            timeout: float = 10,
+            max_length: Optional[int] = SYSLOG_MAX_LENGTH,
+            **dispatcher_options,
+    ):
+        if facility not in SYSLOG_FACILITIES:
+            raise NotifierException(f'unknown syslog facility: {facility}')
+        self.destination = address or '/dev/log'
+        self._facility = SYSLOG_FACILITIES[facility]
+        self._tag = tag
+        self._timeout = timeout
+        super().__init__(max_length=max_length, **dispatcher_options)
+
+    def _serialize(self, message: dict) -> str:
+        # 3 - error, 5 - notice
+        severity = 3 if message.get('state') in FAILED_STATES else 5
+        return f'<{self._facility * 8 + severity}>{self._tag}[{os.getpid()}]: {super()._serialize(message)}'
+
+    def _deliver(self, destination: str, text: str):
+        if destination.startswith('/'):
+            family, address = socket.AF_UNIX, destination
+        else:
+            host, _, port = destination.rpartition(':')
+            family, address = socket.AF_INET, (host or 'localhost', int(port or 514))
+
+        with socket.socket(family, socket.SOCK_DGRAM) as s:
+            s.settimeout(self._timeout)
+            s.connect(address)
+            # one datagram per event
+            for line in text.split('\n'):
+                s.send(line.encode())
+
+
+def register_notifier(notifier_type: str):
+    """Decorator of factory creating messanger from NotifierConfig and dispatcher options."""
+
+    def decorator(factory: Callable[..., Messanger]):
+        _factories[notifier_type] = factory
+        return factory
+    return decorator
+
+
+@register_notifier(NotifierType.telegram.value)
+def _create_telegram(config: NotifierConfig, **options) -> Optional[Messanger]:
+    token = config.token or os.getenv('CUBECTL_TELEGRAM_TOKEN')
+    chat_ids = config.chat_ids or os.getenv('CUBECTL_TELEGRAM_CHAT_IDS')
+    if not token or not chat_ids:
+        log.warning('cubectl: notifiers: telegram notifier was not configured: '
+                    'token or chat_ids were not supplied.')
+        return None
+    messanger = TelegramMessanger(token=token, **options)
+    messanger.add_subscribers(ids=chat_ids)
+    return messanger
+
+
+@register_notifier(NotifierType.webhook.value)
+def _create_webhook(config: NotifierConfig, **options) -> Messanger:
+    if not config.url:
+        raise NotifierException('url of webhook notifier is not set')
+    return WebhookMessanger(url=config.url, headers=config.headers, **options)
+
+
+@register_notifier(NotifierType.unix_socket.value)
+def _create_unix_socket(config: NotifierConfig, **options) -> Messanger:
+    if not config.path:
+        raise NotifierException('path of unix_socket notifier is not set')
+    return UnixSocketMessanger(path=config.path, **options)
+
+
+@register_notifier(NotifierType.jsonl.value)
+def _create_jsonl(config: NotifierConfig, **options) -> Messanger:
+    if not config.path:
+        raise NotifierException('path of jsonl notifier is not set')
+    options.pop('timeout', None)
+    return JsonlMessanger(path=config.path, **options)
+
+
+@register_notifier(NotifierType.syslog.value)
+def _create_syslog(config: NotifierConfig, **options) -> Messanger:
+    return SyslogMessanger(address=config.address, facility=config.facility, tag=config.tag, **options)
+
+
+def create_notifier(config: Union[NotifierConfig, dict], **options) -> Optional[Messanger]:
+    """
+    Arguments:
+        config: NotifierConfig or its dict.
+        options: timeout and NotificationDispatcher options (retries, backoff...),
+            telegram rate limit options are not applied to local sinks.
+    """
+
+    if isinstance(config, dict):
+        config = NotifierConfig(**config)
+    factory = _factories.get(config.type)
+    if factory is None:
+        raise NotifierException(f'unknown notifier type: {config.type}')
+
+    if config.timeout is not None:
+        options['timeout'] = config.timeout
+    if config.type != NotifierType.telegram.value:
+        for option in ('min_interval', 'coalesce_window', 'max_pending'):
+            options.pop(option, None)
+        if config.max_length is not None:
+            options['max_length'] = config.max_length
+    return factory(config, **options)
+
+
+def get_notifier_key(config: Union[NotifierConfig, dict]) -> tuple:
+    """Type and destination of notifier, notifiers with same key would send every event twice."""
+
+    if isinstance(config, dict):
+        config = NotifierConfig(**config)
+    if config.type == NotifierType.telegram.value:
+        chat_ids = config.chat_ids or os.getenv('CUBECTL_TELEGRAM_CHAT_IDS') or ''
+        if not isinstance(chat_ids, list):
+            chat_ids = str(chat_ids).split(',')
+        return (
+            config.type,
+            config.token or os.getenv('CUBECTL_TELEGRAM_TOKEN'),
+            tuple(sorted({str(x).strip() for x in chat_ids if str(x).strip()})),
+        )
+    return config.type, config.url or config.path or config.address or '/dev/log'
+
+
+def create_notifiers(
+        configs: list[Union[NotifierConfig, dict]],
+        exclude: Iterable[Union[NotifierConfig, dict]] = (),
+        **options,
+) -> FanOutMessanger:
+    """
+    Invalid notifiers are logged and skipped, so are duplicates and
+    notifiers with same type and destination as one of `exclude`.
+    """
+
+    keys = set()
+    for config in exclude:
+        try:
+            keys.add(get_notifier_key(config))
+        except Exception:
+            pass
+
+    notifiers = FanOutMessanger()
+    for config in configs:
+        try:
+            key = get_notifier_key(config)
+            if key in keys:
+                log.info(f'cubectl: notifiers: {key[0]} notifier skipped, same one is already configured.')
+                continue
+            keys.add(key)
+            notifiers.add(create_notifier(config, **options))
+        except Exception as e:
+            log.error(f'cubectl: notifiers: notifier {config} was not created: {e}')
+    return notifiers
+
+
+def get_notifier_configs_from_env() -> list[dict]:
+    """
+    Telegram notifier if CUBECTL_TELEGRAM_TOKEN is set and notifiers from
+    CUBECTL_NOTIFIERS (json list of NotifierConfig).
+    """
+
+    configs = []
+    if os.getenv('CUBECTL_TELEGRAM_TOKEN'):
+        configs.append({'type': NotifierType.telegram.value})
+
+    notifiers = os.getenv('CUBECTL_NOTIFIERS')
+    if notifiers:
+        try:
+            loaded = json.loads(notifiers)
+            configs.extend(loaded if isinstance(loaded, list) else [loaded])
+        except ValueError as e:
+            log.error(f'cubectl: notifiers: CUBECTL_NOTIFIERS is not valid json: {e}')
+    return configs
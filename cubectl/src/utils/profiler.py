@@ -0,0 +1,129 @@
+import math
+import time
+import cProfile
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Optional
+
+
+__all__ = [
+    "PhaseProfiler",
+]
+
+log = logging.getLogger(__file__)
+
+# durations kept per phase between reports
+MAX_SAMPLES = 10000
+_NULL_CONTEXT = nullcontext()
+
+
+class PhaseProfiler:
+    """
+    Measures durations of named phases of watcher loop.
+
+    Disabled profiler costs one attribute check per phase, so phases are
+    left in code permanently. Summary (p50/p99 per phase) of durations
+    collected since previous summary is logged every `report_period`.
+
+    Optionally cProfile of main thread is toggled by `toggle_cprofile`
+    (on SIGUSR1): first call starts collecting, second one dumps stats
+    to `dump_dir` and stops.
+    """
+
+    def __init__(
+            self,
+            enabled: bool = False,
+            report_period: float = 60,
+            dump_dir: Optional[str] = None,
+    ):
+        self.enabled = enabled
+        self._report_period = report_period
+        self._dump_dir = Path(dump_dir) if dump_dir else Path.cwd()
+        self._durations: dict[str, deque[float]] = dict()
+        self._lock = threading.Lock()
+        self._reported_at = time.monotonic()
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def phase(self, name: str):
+        """Context manager measuring duration of phase `name`."""
+
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name: str):
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, time.monotonic() - started_at)
+
+    def record(self, name: str, duration: float):
+        with self._lock:
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = deque(maxlen=MAX_SAMPLES)
+            durations.append(duration)
+
+    def summary(self, reset: bool = False) -> dict[str, dict]:
+        """
+        Returns:
+            {phase: {'count', 'p50', 'p99', 'max', 'total'}}, seconds
+        """
+
+        with self._lock:
+            collected = {k: sorted(v) for k, v in self._durations.items() if v}
+            if reset:
+                self._durations = dict()
+
+        return {
+            name: {
+                'count': len(durations),
+                'p50': _percentile(durations, 0.5),
+                'p99': _percentile(durations, 0.99),
+                'max': durations[-1],
+                'total': sum(durations),
+            }
+            for name, durations in collected.items()
+        }
+
+    def report_if_due(self):
+        if not self.enabled or time.monotonic() - self._reported_at < self._report_period:
+            return
+        self._reported_at = time.monotonic()
+
+        summary = self.summary(reset=True)
+        for name, stats in sorted(summary.items(), key=lambda x: -x[1]['total']):
+            log.info(
+                f'cubectl: profiler: {name}: count={stats["count"]} '
+                f'p50={stats["p50"] * 1000:.2f}ms p99={stats["p99"] * 1000:.2f}ms '
+                f'max={stats["max"] * 1000:.2f}ms total={stats["total"]:.3f}s'
+            )
+
+    def toggle_cprofile(self) -> Optional[Path]:
+        """
+        Returns:
+            file stats were dumped to, None if collecting was started.
+        """
+
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+            log.info('cubectl: profiler: cProfile started, send SIGUSR1 again to dump stats.')
+            return None
+
+        self._cprofile.disable()
+        self._dump_dir.mkdir(parents=True, exist_ok=True)
+        dump_file = Path(self._dump_dir, f'cubectl_{time.strftime("%Y%m%d_%H%M%S")}.prof')
+        self._cprofile.dump_stats(dump_file)
+        self._cprofile = None
+        log.info(f'cubectl: profiler: cProfile stats dumped to {dump_file}')
+        return dump_file
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    return sorted_values[max(0, math.ceil(q * len(sorted_values)) - 1)]
@@ -0,0 +1,149 @@
+import os
+import json
+import stat
+import fcntl
+import logging
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Union
+
+import yaml
+
+
+__all__ = [
+    "STATE_FORMATS",
+    "read_state",
+    "write_state",
+    "dump_state",
+    "get_state_file_name",
+    "get_lock_file",
+    "lock_state",
+    "update_state",
+    "remove_state",
+]
+
+log = logging.getLogger(__name__)
+
+# state format -> file extension
+STATE_FORMATS = {
+    'yaml': 'yaml',
+    'json': 'json',
+}
+
+# libyaml bindings are used if PyYAML was built with them
+_YAML_LOADER = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+_YAML_DUMPER = getattr(yaml, 'CDumper', yaml.Dumper)
+
+
+def get_state_file_name(name: str, state_format: str) -> str:
+    if state_format not in STATE_FORMATS:
+        raise ValueError(
+            f'cubectl: state_store: unknown state format: {state_format}. '
+            f'Expected one of: {list(STATE_FORMATS)}'
+        )
+    return f'{name}.{STATE_FORMATS[state_format]}'
+
+
+def _get_format(path: Path) -> str:
+    return 'json' if path.suffix == '.json' else 'yaml'
+
+
+def read_state(path: Union[str, Path]):
+    """
+    Reads status, report, log buffer or register file.
+    Format is chosen by file extension (.json or yaml otherwise).
+
+    Returns:
+        None for empty file.
+    """
+
+    path = Path(path)
+    with path.open() as f:
+        if _get_format(path) == 'json':
+            content = f.read()
+            return json.loads(content) if content.strip() else None
+        return yaml.load(f, Loader=_YAML_LOADER)
+
+
+def dump_state(state, state_format: str = 'yaml') -> str:
+    if state_format == 'json':
+        return json.dumps(state, default=str)
+    return yaml.dump(state, Dumper=_YAML_DUMPER)
+
+
+def write_state(path: Union[str, Path], state):
+    """
+    Writes state atomically: content is written to temporary file in the
+    same directory, which then replaces target file. Readers see either
+    old or new content, never partially written one.
+    """
+
+    path = Path(path)
+    content = dump_state(state, state_format=_get_format(path))
+
+    fd, temp_path = tempfile.mkstemp(
+        dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        # mkstemp creates file readable by owner only
+        mode = stat.S_IMODE(path.stat().st_mode) if path.exists() else 0o644
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def get_lock_file(path: Union[str, Path]) -> Path:
+    path = Path(path)
+    return Path(path.parent, f'.{path.name}.lock')
+
+
+@contextmanager
+def lock_state(path: Union[str, Path]):
+    """
+    Holds exclusive advisory lock of state file for read-modify-write.
+    Lock is taken on separate file, because state file itself is replaced
+    on every write.
+    """
+
+    lock_file = get_lock_file(path)
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with lock_file.open('a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def update_state(path: Union[str, Path], default=None):
+    """
+    Reads state under lock, yields it to be changed in place and writes
+    it back. Nothing is written if exception is raised inside of block.
+
+    Example:
+        with update_state(status_file) as status:
+            status['jobs'] = {}
+    """
+
+    with lock_state(path):
+        try:
+            state = read_state(path)
+        except FileNotFoundError:
+            state = None
+        if state is None:
+            state = default
+        yield state
+        write_state(path, state)
+
+
+def remove_state(path: Union[str, Path]):
+    """Deletes state file together with its lock file."""
+
+    Path(path).unlink(missing_ok=True)
+    get_lock_file(path).unlink(missing_ok=True)
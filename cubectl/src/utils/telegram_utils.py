@@ -2,12 +2,17 @@ import io
 
 import yaml
 import json
-import requests
 from pydantic import BaseModel
 from typing import Union, Protocol
 import builtins
 import logging
 
+from cubectl.src.utils.notification_dispatcher import (
+    NotificationDispatcher,
+    NotificationDeliveryError,
+    fit_log_tail,
+)
+
 
 __all__ = [
     "send_message",
@@ -19,6 +24,9 @@ __all__ = [
 
 log = logging.getLogger(__file__)
 
+# max length of text of telegram message
+TELEGRAM_MAX_LENGTH = 4096
+
 
 class Messanger(Protocol):
     def post(self, message: Union[str, dict]):
@@ -26,9 +34,26 @@ class Messanger(Protocol):
 
 
 class TelegramMessanger:
-    def __init__(self, token):
+    """
+    Posts messages to subscribed chats from background thread
+    (see NotificationDispatcher), so watcher is not blocked by Telegram API.
+    """
+
+    def __init__(self, token, timeout: float = 10, **dispatcher_options):
+        """
+        Arguments:
+            token: telegram bot token.
+            timeout: seconds of connecting to and reading from Telegram API.
+            dispatcher_options: rate limit, retries and coalescing,
+                see NotificationDispatcher.
+        """
+
         self._token = token
         self._subscribers = []
+        self._timeout = timeout
+        self._session = None
+        dispatcher_options.setdefault('name', 'TelegramMessanger')
+        self._dispatcher = NotificationDispatcher(deliver=self._deliver, **dispatcher_options)
 
     def add_subscribers(self, ids: Union[int, str, list, tuple, set]):
         if isinstance(ids, str) and ids.count(',') != 0:
@@ -51,11 +76,49 @@ class TelegramMessanger:
             return
 
         if isinstance(message, dict):
-            message = self._prepare_message(message)
+            message = fit_log_tail(message, self._prepare_message, TELEGRAM_MAX_LENGTH)
 
         for subscriber in self._subscribers:
-            body = self._create_body(message=message, chat_id=subscriber)
-            send_message(request=body, telegram_token=self._token)
+            self._dispatcher.submit(destination=str(subscriber), text=str(message))
+
+    def close(self, timeout: float = 5):
+        """Sends queued messages for at most `timeout` seconds."""
+
+        self._dispatcher.close(timeout=timeout)
+        if self._session is not None:
+            self._session.close()
+
+    def _deliver(self, chat_id: str, text: str):
+        """Called from thread of dispatcher only."""
+
+        if self._session is None:
+            # requests is slow to import, it is loaded only when message is sent
+            import requests
+
+            self._session = requests.Session()
+
+        body = self._create_body(message=text, chat_id=chat_id)
+        try:
+            r = self._session.post(
+                url=f'https://api.telegram.org/bot{self._token}/sendMessage',
+                data=body,
+                timeout=self._timeout,
+            )
+        except Exception as e:
+            # token is part of url and may be in text of error
+            raise NotificationDeliveryError(str(e).replace(self._token, '<token>'))
+
+        if r.status_code == 200:
+            return
+        try:
+            response = r.json()
+        except ValueError:
+            response = {}
+        description = f'{r.status_code} {response.get("description", "")}'.strip()
+        if r.status_code == 429:
+            retry_after = response.get('parameters', {}).get('retry_after')
+            raise NotificationDeliveryError(description, retry_after=retry_after)
+        raise NotificationDeliveryError(description, retry=r.status_code >= 500)
 
     @staticmethod
     def _prepare_message(message: dict) -> str:
@@ -65,6 +128,8 @@ class TelegramMessanger:
         """
 
         message_copy = message.copy()
+        # multiline log is more readable as is than as yaml string
+        log_tail = message_copy.pop('log_tail', None)
 
         # transform non python types to strings
         if isinstance(message, dict):
@@ -74,6 +139,8 @@ class TelegramMessanger:
 
         with io.StringIO() as s:
             yaml.dump(message_copy, s)
+            if log_tail:
+                s.write(f'log_tail:\n{log_tail}')
             return s.getvalue()
 
     @staticmethod
@@ -93,8 +160,11 @@ class SendMessageSimplified(BaseModel):
     allow_sending_without_reply: bool = None
 
 
-def make_post_request(url: str, json_body: dict):
-    r = requests.post(url=url, data=json_body)
+def make_post_request(url: str, json_body: dict, timeout: float = 10):
+    # requests is slow to import, it is loaded only when message is sent
+    import requests
+
+    r = requests.post(url=url, data=json_body, timeout=timeout)
     return r.json(), r.status_code
 
 
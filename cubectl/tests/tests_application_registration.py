@@ -1,11 +1,14 @@
 import unittest
+import tempfile
 from pathlib import Path
 from pprint import pprint
 
 from src.initialization_functions.application_registration import register_application
 from src.initialization_functions.application_registration import init_service_status
 from src.initialization_functions.application_registration import create_status_object
+from src.initialization_functions.application_registration import unregister_application
 from src.utils.common import read_yaml
+from src.utils.state_store import read_state, write_state
 
 from src.models import InitProcessConfig
 
@@ -34,6 +37,16 @@ class TestInitializationBasic(unittest.TestCase):
         )
 
 
+class TestUnregisterApplication(unittest.TestCase):
+    def test_unregister_application(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            register = Path(temp_dir, 'register.yaml')
+            write_state(register, [{'app_name': 'app_0'}, {'app_name': 'app_1'}])
+
+            unregister_application(app_name='app_0', register_path=str(register))
+            self.assertEqual(read_state(register), [{'app_name': 'app_1'}])
+
+
 class TestInitializationCreateStatusObject(unittest.TestCase):
     init_file_location = 'assets/utils_tests/init_create_status.yaml'
     status_file_location = 'assets/utils_tests/status_file.yaml'
@@ -1,10 +1,15 @@
 import unittest
+import tempfile
+from unittest import mock
 from pprint import pprint
 from time import sleep
 from pathlib import Path
 
+import yaml
+
 from src.configurator import Configurator
 from src.executor import Executor
+from src.models import ProcessState
 
 from src.utils import read_yaml
 
@@ -52,3 +57,27 @@ class TestConfiguratorBasic(unittest.TestCase):
         print(one)
         print('***')
         print(two)
+
+
+class TestConfiguratorStop(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.status_file = Path(self.temp_dir.name, 'status.yaml')
+        self.status_file.write_text(yaml.dump({'jobs': {}, 'services': [{
+            'init_config': {'name': 'worker'},
+            'system_data': {'state': ProcessState.started.value},
+        }]}))
+        register = Path(self.temp_dir.name, 'register.yaml')
+        register.write_text(yaml.dump([{'app_name': 'app', 'status_file': str(self.status_file)}]))
+        self.c = Configurator(config={'temp_dir': self.temp_dir.name}, app_register=str(register))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_stop_without_watcher_request(self):
+        with mock.patch.object(self.c, '_request_watcher') as request_watcher:
+            self.c.stop(app_name='app', services=tuple(), notify_watcher=False)
+        request_watcher.assert_not_called()
+
+        status = read_yaml(str(self.status_file))
+        self.assertEqual(status['services'][0]['system_data']['state'], ProcessState.stopped.value)
@@ -0,0 +1,51 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+from cubectl.src.utils.control_channel import ControlServer
+from cubectl.src.utils.control_channel import ControlChannelException
+from cubectl.src.utils.control_channel import send_control_request
+
+
+class TestControlChannelBasic(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = str(Path(self.temp_dir.name, 'control.sock'))
+        self.server = ControlServer(
+            socket_path=self.socket_path,
+            handlers={
+                'echo': lambda **kwargs: kwargs,
+                'fail': self._fail,
+            },
+        )
+        self.server.start()
+
+    def tearDown(self) -> None:
+        self.server.close()
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def _fail():
+        raise ValueError('failed on purpose')
+
+    def test_request_response(self):
+        result = send_control_request(self.socket_path, 'echo', services=['a'])
+        self.assertEqual(result, {'services': ['a']})
+
+    def test_failed_command(self):
+        with self.assertRaises(ControlChannelException):
+            send_control_request(self.socket_path, 'fail')
+
+    def test_unknown_command(self):
+        with self.assertRaises(ControlChannelException):
+            send_control_request(self.socket_path, 'not_existing')
+
+    def test_socket_not_found(self):
+        with self.assertRaises(ControlChannelException):
+            send_control_request(self.socket_path + '_', 'echo')
+        with self.assertRaises(ControlChannelException):
+            send_control_request(None, 'echo')
+
+    def test_socket_removed_on_close(self):
+        self.server.close()
+        self.assertFalse(Path(self.socket_path).exists())
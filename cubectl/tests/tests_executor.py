@@ -0,0 +1,344 @@
+import json
+import time
+import threading
+import unittest
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+from cubectl.src.executor import Executor
+from cubectl.src.models import ProcessState
+from cubectl.src.utils import format_metrics
+
+
+def _process_status(name: str, state: ProcessState) -> dict:
+    return {
+        'init_config': {
+            'name': name,
+            'executor': 'python',
+            'file': 'assets/example_services/example_service_0.py',
+            'arguments': {'--name': name},
+            'service': False,
+        },
+        'service_data': None,
+        'system_data': {'state': state.value},
+    }
+
+
+class TestExecutorConcurrent(unittest.TestCase):
+    names = [f'worker_{i}' for i in range(4)]
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.status_file = Path(self.temp_dir.name, 'status.yaml')
+        self.status = {
+            'jobs': {},
+            'services': [
+                _process_status(name, ProcessState.started) for name in self.names
+            ],
+        }
+        with self.status_file.open('w') as f:
+            yaml.dump(self.status, f)
+        self.e = Executor(str(self.status_file), concurrency=4)
+
+    def tearDown(self) -> None:
+        self.e._stop_all_processes()
+        self.temp_dir.cleanup()
+
+    def test_update_processes_concurrently(self):
+        # passed only if statuses of all processes are applied at the same time
+        barrier = threading.Barrier(len(self.names), timeout=5)
+        for name in self.names:
+            process = self.e._get_process_by_name(name)
+            apply_status = process.apply_status
+
+            def wait_for_others(process_status, apply_status=apply_status):
+                barrier.wait()
+                apply_status(process_status)
+            process.apply_status = wait_for_others
+
+        started_at = time.monotonic()
+        self.e._update_processes(status_object=self.status)
+        self.assertLess(time.monotonic() - started_at, 4)
+        self.assertFalse(barrier.broken)
+
+        for name in self.names:
+            process = self.e._get_process_by_name(name)
+            self.assertEqual(process.state, ProcessState.started)
+
+        for service in self.status['services']:
+            service['system_data']['state'] = ProcessState.stopped.value
+        self.e._update_processes(status_object=self.status)
+
+        for name in self.names:
+            process = self.e._get_process_by_name(name)
+            self.assertEqual(process.state, ProcessState.stopped)
+
+
+class TestExecutorStop(unittest.TestCase):
+    names = [f'worker_{i}' for i in range(4)]
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.status_file = Path(self.temp_dir.name, 'status.yaml')
+        script = Path(self.temp_dir.name, 'ignores_sigterm.sh')
+        script.write_text("trap '' TERM\nsleep 60 &\nwait\n")
+        self.status = {'jobs': {}, 'services': []}
+        for name in self.names:
+            process_status = _process_status(name, ProcessState.started)
+            process_status['init_config'].update(
+                executor='sh', file=str(script), arguments={}, dotenv=False, stop_timeout=0.5,
+            )
+            self.status['services'].append(process_status)
+        with self.status_file.open('w') as f:
+            yaml.dump(self.status, f)
+        # processes are updated one by one
+        self.e = Executor(str(self.status_file))
+
+    def tearDown(self) -> None:
+        self.e._stop_all_processes()
+        self.temp_dir.cleanup()
+
+    def test_stop_timeouts_overlap(self):
+        self.e._update_processes(status_object=self.status)
+        for service in self.status['services']:
+            service['system_data']['state'] = ProcessState.stopped.value
+
+        started_at = time.monotonic()
+        with self.assertLogs(level='WARNING'):
+            self.e._update_processes(status_object=self.status)
+        self.assertLess(time.monotonic() - started_at, 1.5)
+        for name in self.names:
+            self.assertEqual(self.e._get_process_by_name(name).state, ProcessState.stopped)
+
+    def test_restart_stop_timeouts_overlap(self):
+        self.e._update_processes(status_object=self.status)
+        pids = {name: self.e._get_process_by_name(name).pid for name in self.names}
+
+        started_at = time.monotonic()
+        with self.assertLogs(level='WARNING'):
+            self.e.restart(services=[])
+        self.assertLess(time.monotonic() - started_at, 1.5)
+        for name in self.names:
+            process = self.e._get_process_by_name(name)
+            self.assertEqual(process.state, ProcessState.started)
+            self.assertNotEqual(process.pid, pids[name])
+
+
+class TestExecutorIncremental(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.status_file = Path(self.temp_dir.name, 'status.yaml')
+        self.status = {
+            'jobs': {},
+            'services': [_process_status('worker', ProcessState.started)],
+        }
+        with self.status_file.open('w') as f:
+            yaml.dump(self.status, f)
+        self.e = Executor(str(self.status_file))
+        self.process = self.e._get_process_by_name('worker')
+
+    def tearDown(self) -> None:
+        self.e._stop_all_processes()
+        self.temp_dir.cleanup()
+
+    def test_unchanged_process_is_skipped(self):
+        self.e._update_processes(status_object=self.status)
+        pid = self.process.pid
+
+        # exit notification is consumed, so process looks unchanged
+        self.process._process.kill()
+        self.assertTrue(self.e._exit_notifier.wait(timeout=5))
+        self.e._exit_notifier.pop_exited()
+        self.e._update_processes(status_object=self.status)
+        self.assertEqual(self.process.pid, pid)
+
+    def test_failed_status_is_applied_again(self):
+        with mock.patch.object(self.process, 'apply_status', side_effect=OSError('no memory')) as apply_status:
+            with self.assertLogs(level='ERROR'):
+                self.e._update_processes(status_object=self.status)
+            self.assertEqual(apply_status.call_count, 1)
+
+        self.e._update_processes(status_object=self.status)
+        self.assertEqual(self.process.state, ProcessState.started)
+
+    def test_not_started_process_is_started_again(self):
+        popen = 'cubectl.src.service_process.service_process.Popen'
+        with mock.patch(popen, side_effect=BlockingIOError(11, 'Resource temporarily unavailable')):
+            with self.assertLogs(level='ERROR'):
+                self.e._update_processes(status_object=self.status)
+        self.assertEqual(self.process.state, ProcessState.stopped)
+
+        # no exit is notified, process is started because its state differs from desired one
+        self.e._update_processes(status_object=self.status)
+        self.assertEqual(self.process.state, ProcessState.started)
+
+    def test_exited_process_is_reconciled(self):
+        self.e._update_processes(status_object=self.status)
+        pid = self.process.pid
+
+        self.process._process.kill()
+        self.assertTrue(self.e._exit_notifier.wait(timeout=5))
+        self.e._update_processes(status_object=self.status)
+        self.assertNotEqual(self.process.pid, pid)
+        self.assertEqual(self.process.state, ProcessState.started)
+
+    def test_gave_up_process_is_not_applied_again(self):
+        self.status['services'][0]['init_config']['restart'] = 'never'
+        self.e._update_processes(status_object=self.status)
+        self.process._process.kill()
+        self.assertTrue(self.e._exit_notifier.wait(timeout=5))
+        self.e._update_processes(status_object=self.status)
+        self.assertTrue(self.process.gave_up)
+
+        with mock.patch.object(self.process, 'apply_status') as apply_status:
+            self.e._update_processes(status_object=self.status)
+        apply_status.assert_not_called()
+
+    def test_unchanged_status_is_not_checked(self):
+        self.e._update_processes(status_object=self.status)
+
+        fingerprint = 'cubectl.src.executor.executor._get_fingerprint'
+        with mock.patch(fingerprint) as get_fingerprint:
+            self.e._update_processes(status_object=self.status, status_changed=False)
+        get_fingerprint.assert_not_called()
+
+    def test_metrics(self):
+        self.e._meta_info = {'app': 'test_app'}
+        self.e.cycle()
+        self.process._process.kill()
+        self.assertTrue(self.e._exit_notifier.wait(timeout=5))
+        self.e.cycle()
+
+        metrics = format_metrics(self.e.collect_metrics())
+        labels = 'app="test_app",process="worker"'
+        self.assertIn(f'cubectl_process_state{{{labels},state="STARTED"}} 1', metrics)
+        self.assertIn(f'cubectl_process_restarts_total{{{labels}}} 1', metrics)
+        self.assertIn('cubectl_reconcile_duration_seconds_count{app="test_app"} 2', metrics)
+
+    def test_notifiers_from_status_file(self):
+        events_file = Path(self.temp_dir.name, 'events.jsonl')
+        self.status['notifiers'] = [{'type': 'jsonl', 'path': str(events_file)}]
+        with self.status_file.open('w') as f:
+            yaml.dump(self.status, f)
+        e = Executor(str(self.status_file), meta_info={'app': 'test_app'})
+
+        e._message_process_status(process=e._get_process_by_name('worker'), note='test')
+        e.close()
+
+        event = json.loads(events_file.read_text())
+        self.assertEqual(event['event'], 'process_state')
+        self.assertEqual(event['app'], 'test_app')
+        self.assertEqual(event['process_name'], 'worker')
+        self.assertEqual(event['state'], 'STOPPED')
+        self.assertEqual(event['note'], 'test')
+        self.assertNotIn('log_tail', event)
+
+    def test_soft_limit_restart_does_not_block_cycle(self):
+        script = Path(self.temp_dir.name, 'ignores_sigterm.sh')
+        script.write_text("trap '' TERM\nsleep 60 &\nwait\n")
+        process_status = _process_status('greedy', ProcessState.started)
+        process_status['init_config'].update(
+            executor='sh', file=str(script), arguments={}, dotenv=False,
+            stop_timeout=0.5, limits={'soft_max_rss': 1024},
+        )
+        self.status['services'] = [process_status]
+        with self.status_file.open('w') as f:
+            yaml.dump(self.status, f)
+        e = Executor(str(self.status_file), soft_limit_notification_interval=60)
+        notes = []
+        e.add_messanger(mock.Mock(post=lambda message: notes.append(message['note'])))
+        process = e._get_process_by_name('greedy')
+        try:
+            with self.assertLogs(level='WARNING'):
+                started_at = time.monotonic()
+                e.cycle()
+                self.assertLess(time.monotonic() - started_at, 0.4)
+                pid = process.pid
+                self.assertAlmostEqual(e.get_wait_timeout(cycle_period=5), 0.5, delta=0.1)
+
+                # killed after stop_timeout and started again by reconcile
+                while process.pid == pid and time.monotonic() - started_at < 5:
+                    e._wakeup.wait(timeout=e.get_wait_timeout(cycle_period=0.1))
+                    e._wakeup.clear()
+                    e.cycle()
+            self.assertNotEqual(process.pid, pid)
+            self.assertEqual(process.state, ProcessState.started)
+            self.assertEqual(process.start_retries_left, 10)
+            # second restart is not notified within interval
+            self.assertEqual(len(notes), 1)
+            self.assertEqual(e._soft_limit_notifications['greedy'][1], 1)
+            self.assertIn('soft limit exceeded', notes[0])
+        finally:
+            e._stop_all_processes()
+            e.close()
+
+    def test_failure_event_has_log_tail(self):
+        events_file = Path(self.temp_dir.name, 'events.jsonl')
+        script = Path(self.temp_dir.name, 'failing.sh')
+        script.write_text('for i in $(seq 1 50); do echo "line $i"; done\nexit 3\n')
+        process_status = _process_status('failing', ProcessState.started)
+        process_status['init_config'].update(executor='sh', file=str(script), arguments={})
+        self.status['services'] = [process_status]
+        self.status['notifiers'] = [{'type': 'jsonl', 'path': str(events_file)}]
+        with self.status_file.open('w') as f:
+            yaml.dump(self.status, f)
+        e = Executor(str(self.status_file), log_tail_lines=5, log_tail_bytes=1024)
+
+        process = e._get_process_by_name('failing')
+        e._update_processes(status_object=self.status)
+        self.assertTrue(e._exit_notifier.wait(timeout=5))
+        time.sleep(0.2)
+        e._message_process_status(process=process)
+        e.close()
+
+        event = json.loads(events_file.read_text())
+        self.assertEqual(event['exit_code'], 3)
+        self.assertEqual(event['log_tail'], ''.join(f'line {i}\n' for i in range(46, 51)))
+
+
+class TestExecutorLogCursors(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.status_file = Path(self.temp_dir.name, 'status.yaml')
+        self.log_file = Path(self.temp_dir.name, 'worker.log')
+        self.log_file.write_text('line 0\nline 1\n')
+        process_status = _process_status('worker', ProcessState.stopped)
+        process_status['init_config']['log'] = str(self.log_file)
+        with self.status_file.open('w') as f:
+            yaml.dump({'jobs': {}, 'services': [process_status]}, f)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_not_acknowledged_range_is_returned_again(self):
+        e = Executor(str(self.status_file))
+        first = e._get_log_ranges_locked(cursor='a')['worker']
+        self.assertEqual(first['length'], self.log_file.stat().st_size)
+        self.assertEqual(e._get_log_ranges_locked(cursor='a')['worker'], first)
+
+        e._ack_logs_locked(cursor='a', offsets={'worker': first['length']})
+        self.assertEqual(e._get_log_ranges_locked(cursor='a')['worker']['length'], 0)
+        # other client is not affected
+        self.assertEqual(e._get_log_ranges_locked(cursor='b')['worker'], first)
+
+    def test_cursors_are_persisted(self):
+        e = Executor(str(self.status_file))
+        log_range = e._get_log_ranges_locked(cursor='a')['worker']
+        e._ack_logs_locked(cursor='a', offsets={'worker': log_range['length']})
+
+        with self.log_file.open('a') as f:
+            f.write('line 2\n')
+        e = Executor(str(self.status_file))
+        log_range = e._get_log_ranges_locked(cursor='a')['worker']
+        self.assertEqual(log_range['length'], len('line 2\n'))
+
+    def test_cursors_expire(self):
+        e = Executor(str(self.status_file), log_cursor_ttl=0)
+        log_range = e._get_log_ranges_locked(cursor='a')['worker']
+        e._ack_logs_locked(cursor='a', offsets={'worker': log_range['length']})
+
+        e = Executor(str(self.status_file))
+        self.assertEqual(e._get_log_ranges_locked(cursor='a')['worker'], log_range)
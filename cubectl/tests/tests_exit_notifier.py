@@ -0,0 +1,39 @@
+import unittest
+from subprocess import Popen
+
+from cubectl.src.service_process.exit_notifier import ExitNotifier
+
+
+class TestExitNotifierBasic(unittest.TestCase):
+    def test_exit_is_notified(self):
+        notified = []
+        n = ExitNotifier(on_exit=notified.append)
+        p = Popen(['sleep', '0.1'])
+        n.watch(name='sleeper', pid=p.pid)
+
+        self.assertTrue(n.wait(timeout=5))
+        self.assertEqual(n.pop_exited(), {'sleeper'})
+        self.assertEqual(notified, ['sleeper'])
+        # child is not reaped by notifier
+        self.assertEqual(p.wait(timeout=5), 0)
+        n.close()
+
+    def test_already_reaped_process(self):
+        n = ExitNotifier()
+        p = Popen(['true'])
+        p.wait()
+        n.watch(name='done', pid=p.pid)
+
+        self.assertTrue(n.wait(timeout=5))
+        self.assertEqual(n.pop_exited(), {'done'})
+        n.close()
+
+    def test_no_exit_timeout(self):
+        n = ExitNotifier()
+        p = Popen(['sleep', '5'])
+        n.watch(name='sleeper', pid=p.pid)
+
+        self.assertFalse(n.wait(timeout=0.2))
+        p.kill()
+        p.wait()
+        n.close()
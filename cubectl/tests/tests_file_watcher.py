@@ -0,0 +1,50 @@
+import os
+import unittest
+import tempfile
+import threading
+from pathlib import Path
+
+from cubectl.src.utils.file_watcher import FileWatcher
+
+
+class TestFileWatcherBasic(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file = Path(self.temp_dir.name, 'status.yaml')
+        self.file.write_text('services: []\n')
+        self.changed = threading.Event()
+        self.watcher = FileWatcher(str(self.file), on_change=self.changed.set)
+        self.watcher.start()
+
+    def tearDown(self) -> None:
+        self.watcher.close()
+        self.temp_dir.cleanup()
+
+    def test_not_changed(self):
+        self.assertFalse(self.watcher.is_changed())
+
+    def test_changes_within_same_second(self):
+        self.file.write_text('services: [1]\n')
+        self.assertTrue(self.watcher.is_changed())
+        self.assertFalse(self.watcher.is_changed())
+
+        self.file.write_text('services: [2]\n')
+        self.assertTrue(self.watcher.is_changed())
+
+    def test_replaced_file_wakes_up(self):
+        if not self.watcher.is_event_driven:
+            self.skipTest('inotify is not available')
+
+        temp_file = Path(self.temp_dir.name, 'status.yaml.tmp')
+        temp_file.write_text('services: [3]\n')
+        os.replace(temp_file, self.file)
+
+        self.assertTrue(self.changed.wait(timeout=5))
+        self.assertTrue(self.watcher.is_changed())
+
+    def test_reset(self):
+        self.file.write_text('services: [4]\n')
+        if self.watcher.is_event_driven:
+            self.assertTrue(self.changed.wait(timeout=5))
+        self.watcher.reset()
+        self.assertFalse(self.watcher.is_changed())
@@ -0,0 +1,149 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from subprocess import Popen, PIPE
+
+from cubectl.src.models import ProcessLimits, ResourceUsage, parse_size
+from cubectl.src.service_process.limits import CgroupLimiter, get_limits_command, get_exceeded_soft_limit
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class TestParseSize(unittest.TestCase):
+    def test_units(self):
+        self.assertEqual(parse_size('512M'), 512 * 1024 ** 2)
+        self.assertEqual(parse_size('1.5k'), 1536)
+        self.assertEqual(parse_size('2GB'), 2 * 1024 ** 3)
+        self.assertEqual(parse_size('100'), 100)
+        self.assertEqual(parse_size(100), 100)
+        self.assertIsNone(parse_size(None))
+
+    def test_model(self):
+        limits = ProcessLimits(max_memory='1G', soft_max_rss='10M')
+        self.assertEqual(limits.max_memory, 1024 ** 3)
+        self.assertEqual(limits.soft_max_rss, 10 * 1024 ** 2)
+
+
+class TestSoftLimits(unittest.TestCase):
+    def test_exceeded(self):
+        limits = ProcessLimits(soft_max_rss='1M', soft_max_cpu_percent=50)
+        self.assertIsNone(get_exceeded_soft_limit(limits, ResourceUsage(cpu_percent=10, rss=1024)))
+        self.assertIn('rss', get_exceeded_soft_limit(limits, ResourceUsage(cpu_percent=10, rss=2 * 1024 ** 2)))
+        self.assertIn('cpu', get_exceeded_soft_limit(limits, ResourceUsage(cpu_percent=90, rss=1024)))
+        self.assertIsNone(get_exceeded_soft_limit(limits, ResourceUsage(cpu_percent=90), check_cpu=False))
+        self.assertIsNone(get_exceeded_soft_limit(None, ResourceUsage(cpu_percent=90)))
+        self.assertIsNone(get_exceeded_soft_limit(limits, None))
+
+
+class TestCgroupLimiter(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_not_available(self):
+        self.assertFalse(CgroupLimiter(str(self.root)).is_available())
+        Path(self.root, 'cgroup.controllers').write_text('cpu io\n')
+        self.assertFalse(CgroupLimiter(str(self.root)).is_available())
+
+    def test_prepare(self):
+        Path(self.root, 'cgroup.controllers').write_text('cpuset cpu io memory pids\n')
+        limiter = CgroupLimiter(str(self.root))
+        self.assertTrue(limiter.is_available())
+
+        cgroup = limiter.prepare(
+            name='service_0',
+            limits=ProcessLimits(max_memory='256M', max_cpu_percent=50),
+        )
+        self.assertEqual(cgroup, Path(self.root, 'service_0'))
+        self.assertEqual(Path(cgroup, 'memory.max').read_text(), str(256 * 1024 ** 2))
+        self.assertEqual(Path(cgroup, 'cpu.max').read_text(), '50000 100000')
+
+    def test_cgroups_of_applications_are_separated(self):
+        Path(self.root, 'cgroup.controllers').write_text('cpu memory\n')
+        for app, max_memory in (('app_0', '256M'), ('app_1', '1G')):
+            CgroupLimiter(str(self.root), app=app).prepare(
+                name='web', limits=ProcessLimits(max_memory=max_memory),
+            )
+
+        self.assertEqual(Path(self.root, 'app_0', 'web', 'memory.max').read_text(), str(256 * 1024 ** 2))
+        self.assertEqual(Path(self.root, 'app_1', 'web', 'memory.max').read_text(), str(1024 ** 3))
+        self.assertEqual(Path(self.root, 'app_0', 'cgroup.subtree_control').read_text(), '+memory +cpu')
+
+    def test_remove(self):
+        limiter = CgroupLimiter(str(self.root), app='app_0')
+        Path(self.root, 'app_0', 'web').mkdir(parents=True)
+        Path(self.root, 'app_0', 'worker').mkdir()
+
+        limiter.remove('web')
+        self.assertEqual([x.name for x in Path(self.root, 'app_0').iterdir()], ['worker'])
+        limiter.remove('worker')
+        self.assertFalse(Path(self.root, 'app_0').exists())
+        # already removed
+        limiter.remove('worker')
+        self.assertTrue(self.root.exists())
+
+
+@unittest.skipIf(resource is None or not hasattr(resource, 'prlimit'), 'requires prlimit')
+class TestLimitsCommand(unittest.TestCase):
+    # process forks child and prints its pid, limits of child are checked
+    forking_command = ['sh', '-c', 'sleep 30 & echo $!; wait']
+
+    def setUp(self) -> None:
+        self.process = None
+
+    def tearDown(self) -> None:
+        if self.process is not None:
+            os.killpg(self.process.pid, 9)
+            self.process.wait()
+            self.process.stdout.close()
+
+    def _start(self, command: list) -> int:
+        self.process = Popen(
+            [*command, *self.forking_command], stdout=PIPE, start_new_session=True,
+        )
+        return int(self.process.stdout.readline())
+
+    def test_no_limits(self):
+        self.assertEqual(get_limits_command(name='sleeper', limits=None), [])
+        self.assertEqual(get_limits_command(name='sleeper', limits=ProcessLimits(soft_max_rss='1G')), [])
+
+    def test_limits_inherited_by_children(self):
+        command = get_limits_command(
+            name='sleeper',
+            limits=ProcessLimits(max_open_files=64, max_memory='4G', max_cpu_time=100, nice=5),
+        )
+        child = self._start(command)
+
+        for pid in (self.process.pid, child):
+            self.assertEqual(resource.prlimit(pid, resource.RLIMIT_NOFILE), (64, 64))
+            self.assertEqual(resource.prlimit(pid, resource.RLIMIT_AS), (4 * 1024 ** 3,) * 2)
+            self.assertEqual(resource.prlimit(pid, resource.RLIMIT_CPU), (100, 100))
+            self.assertEqual(os.getpriority(os.PRIO_PROCESS, pid), 5)
+
+    def test_memory_in_cgroup(self):
+        with tempfile.TemporaryDirectory() as root:
+            Path(root, 'cgroup.controllers').write_text('cpu memory\n')
+            command = get_limits_command(
+                name='sleeper',
+                limits=ProcessLimits(max_memory='4G'),
+                cgroup_limiter=CgroupLimiter(root),
+            )
+            child = self._start(command)
+
+            self.assertTrue(Path(root, 'sleeper', 'memory.max').is_file())
+            # joined by process itself before exec, so its children are created in cgroup
+            self.assertEqual(Path(root, 'sleeper', 'cgroup.procs').read_text(), str(self.process.pid))
+        # not limited twice with rlimit
+        self.assertEqual(resource.prlimit(child, resource.RLIMIT_AS)[0], resource.RLIM_INFINITY)
+
+
+if __name__ == '__main__':
+    unittest.main()
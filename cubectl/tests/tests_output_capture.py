@@ -0,0 +1,76 @@
+import sys
+import time
+import unittest
+import tempfile
+from pathlib import Path
+from subprocess import Popen, PIPE, STDOUT
+
+from cubectl.src.models import OutputCaptureConfig
+from cubectl.src.service_process.output_capture import OutputCapture
+
+
+def _run(capture: OutputCapture, code: str):
+    process = Popen([sys.executable, '-c', code], stdout=PIPE, stderr=STDOUT)
+    capture.attach(process.stdout)
+    process.wait(timeout=10)
+    # reader thread finishes after end of output
+    deadline = time.monotonic() + 5
+    while capture._readers and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestOutputCaptureBasic(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_memory_only(self):
+        capture = OutputCapture('service', OutputCaptureConfig(buffer_lines=3))
+        _run(capture, 'import sys\nfor i in range(10): print(i)\nprint("err", file=sys.stderr)')
+
+        self.assertIsNone(capture.log_file)
+        self.assertEqual(capture.get_log(), '8\n9\nerr\n')
+        self.assertEqual(capture.get_log(tail=1), 'err\n')
+
+    def test_latest(self):
+        capture = OutputCapture('service')
+        _run(capture, 'print("first")')
+        self.assertEqual(capture.get_latest_log(), 'first\n')
+        self.assertEqual(capture.get_latest_log(), '')
+
+        _run(capture, 'print("second")')
+        self.assertEqual(capture.get_latest_log(), 'second\n')
+        self.assertEqual(capture.get_log(), 'first\nsecond\n')
+
+    def test_tail_does_not_move_cursor(self):
+        capture = OutputCapture('service')
+        _run(capture, 'for i in range(10): print(i)')
+
+        self.assertEqual(capture.get_tail(lines=2, max_bytes=1024), '8\n9\n')
+        self.assertEqual(capture.get_tail(lines=5, max_bytes=3), '\n9\n')
+        self.assertEqual(capture.get_latest_log(tail=1), '9\n')
+
+    def test_rotation(self):
+        config = OutputCaptureConfig(
+            log_dir=self.temp_dir.name, max_bytes=1000, backup_count=2
+        )
+        capture = OutputCapture('service', config)
+        for _ in range(5):
+            _run(capture, 'print("x" * 599)')
+
+        files = sorted(x.name for x in Path(self.temp_dir.name).iterdir())
+        self.assertEqual(files, ['service.log', 'service.log.1', 'service.log.2'])
+        for file in files:
+            self.assertLessEqual(Path(self.temp_dir.name, file).stat().st_size, 1000)
+        self.assertEqual(capture.get_log(head=1), 'x' * 599 + '\n')
+
+    def test_no_new_line_at_end(self):
+        capture = OutputCapture('service')
+        _run(capture, 'print("a\\nb", end="")')
+        self.assertEqual(capture.get_log(), 'a\nb\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import unittest
+from subprocess import Popen
+from unittest import mock
+
+from cubectl.src.service_process import resource_sampler
+from cubectl.src.service_process.resource_sampler import ResourceSampler
+from cubectl.src.utils.format_report import format_report
+
+
+BUSY_CHILD = (
+    'import subprocess, sys, time\n'
+    'child = subprocess.Popen([sys.executable, "-c", "while True: pass"])\n'
+    'time.sleep(60)\n'
+)
+
+
+@unittest.skipUnless(os.path.isdir('/proc'), 'requires /proc')
+class TestResourceSamplerBasic(unittest.TestCase):
+    def setUp(self) -> None:
+        self.process = Popen([sys.executable, '-c', BUSY_CHILD])
+        self.min_interval = resource_sampler.MIN_SAMPLE_INTERVAL
+        resource_sampler.MIN_SAMPLE_INTERVAL = 0
+
+    def tearDown(self) -> None:
+        resource_sampler.MIN_SAMPLE_INTERVAL = self.min_interval
+        for pid in resource_sampler._get_descendants(self.process.pid):
+            os.kill(pid, 9)
+        self.process.kill()
+        self.process.wait()
+
+    def _wait_for_child(self):
+        deadline = time.monotonic() + 5
+        while not resource_sampler._get_descendants(self.process.pid):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+
+    def test_sample_process_tree(self):
+        self._wait_for_child()
+        sampler = ResourceSampler()
+
+        usage = sampler.sample(self.process.pid)
+        self.assertIsNone(usage.cpu_percent)
+        self.assertEqual(usage.processes, 2)
+        self.assertGreater(usage.rss, 0)
+        self.assertGreaterEqual(usage.open_fds, 3)
+        self.assertGreaterEqual(usage.threads, 2)
+
+        time.sleep(0.5)
+        usage = sampler.sample(self.process.pid)
+        # busy child is counted
+        self.assertGreater(usage.cpu_percent, 30)
+
+    def test_descendants_by_ppid(self):
+        self._wait_for_child()
+        self.assertEqual(
+            sorted(resource_sampler._get_descendants_by_ppid(self.process.pid)),
+            sorted(resource_sampler._get_descendants(self.process.pid)),
+        )
+
+    def test_children_by_parent_are_read_once_per_pass(self):
+        self._wait_for_child()
+        children_by_parent = mock.Mock(wraps=resource_sampler._get_children_by_parent)
+        with mock.patch.object(resource_sampler, '_get_children', return_value=None), \
+                mock.patch.object(resource_sampler, '_get_children_by_parent', children_by_parent):
+            process_table = resource_sampler.ProcessTable()
+            for _ in range(3):
+                usage = ResourceSampler().sample(self.process.pid, process_table=process_table)
+                self.assertEqual(usage.processes, 2)
+        self.assertEqual(children_by_parent.call_count, 1)
+
+    def test_not_existing_process(self):
+        self.process.kill()
+        self.process.wait()
+        self.assertIsNone(ResourceSampler().sample(self.process.pid))
+
+
+class TestFormatReportResources(unittest.TestCase):
+    def test_columns(self):
+        report = {
+            'worker': {
+                'init_config': {'service': False},
+                'service_data': {'port': None},
+                'system_data': {
+                    'state': 'STARTED',
+                    'pid': 1,
+                    'error_code': None,
+                    'started_at': None,
+                    'resources': {
+                        'cpu_percent': 12.5,
+                        'rss': 3 * 1024 * 1024,
+                        'open_fds': 7,
+                        'threads': 2,
+                    },
+                },
+            },
+        }
+        result = format_report(report)
+        self.assertIn('CPU%', result)
+        row = [x for x in result.splitlines() if x.startswith('worker')][0]
+        self.assertEqual(row.split()[-4:], ['12.5', '3.0M', '7', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,16 @@
+import os
+import time
+import signal
+import tempfile
 import unittest
+from pathlib import Path
+from unittest import mock
 from pprint import pprint
 
 from cubectl.src.models import ProcessState
 from cubectl.src.models import ProcessStatus
-from cubectl.src.service_process.service_process import ServiceProcess
+from cubectl.src.models import RestartPolicy
+from cubectl.src.service_process.service_process import ServiceProcess, _get_backoff
 
 
 class TestServiceProcessBasic(unittest.TestCase):
@@ -50,6 +57,46 @@ class TestServiceProcessBasic(unittest.TestCase):
         pr.stop()
         self.assertNotEqual(pid_before, pid_after)
 
+    def test_graceful_restart_process(self):
+        pr = ServiceProcess(init_config=self.init_config_ok)
+        pr.start()
+        pid_before = pr.pid
+        pr.restart(graceful=True)
+        pid_after = pr.pid
+        pr.stop()
+        self.assertNotEqual(pid_before, pid_after)
+
+    def test_soft_limits(self):
+        pr = ServiceProcess(init_config={**self.init_config_ok, 'limits': {'soft_max_rss': '1K'}})
+        self.assertIsNone(pr.check_soft_limits())
+        pr.start()
+        pr.sample_resources()
+        self.assertIn('rss', pr.check_soft_limits())
+        pr.stop()
+        self.assertIsNone(pr.check_soft_limits())
+
+    def test_hard_limits(self):
+        pr = ServiceProcess(init_config={**self.init_config_ok, 'limits': {'max_open_files': 64}})
+        pr.start()
+        try:
+            self.assertEqual(pr.state, ProcessState.started)
+            # limits are applied by launcher, which is replaced with process itself
+            deadline = time.monotonic() + 5
+            while b'launcher' in Path(f'/proc/{pr.pid}/cmdline').read_bytes() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            with open(f'/proc/{pr.pid}/limits') as f:
+                self.assertRegex(f.read(), r'Max open files +64 +64')
+        finally:
+            pr.stop()
+
+    def test_hard_limits_of_not_existing_executor(self):
+        pr = ServiceProcess(init_config={
+            **self.init_config_ok, 'executor': 'not_existing_executor', 'limits': {'max_open_files': 64},
+        })
+        with self.assertLogs(level='ERROR'):
+            pr.start()
+        self.assertIsNone(pr.pid)
+
     def test_compare_and_apply_status(self):
         """
         'init_config': {
@@ -102,3 +149,256 @@ class TestServiceProcessBasic(unittest.TestCase):
         pr.start()
         # pprint(pr.status().dict())
         pr.stop()
+
+
+class TestServiceProcessRestartPolicy(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _crashing_process(self, exit_code: int, **restart) -> ServiceProcess:
+        script = Path(self.temp_dir.name, f'exit_{exit_code}.sh')
+        script.write_text(f'sleep 0.1\nexit {exit_code}\n')
+        init_config = {
+            'name': 'crashing',
+            'executor': 'sh',
+            'file': str(script),
+            'dotenv': False,
+            'service': False,
+            'restart': restart,
+        }
+        pr = ServiceProcess(init_config=init_config, number_of_start_retries=3)
+        pr.apply_status(ProcessStatus(
+            init_config=init_config, service_data={}, system_data={'state': ProcessState.started}
+        ))
+        return pr
+
+    @staticmethod
+    def _wait_exit(pr: ServiceProcess):
+        pr._process.wait(timeout=5)
+
+    def test_backoff(self):
+        pr = self._crashing_process(1, backoff=0.3, jitter=0)
+
+        # first crash is restarted immediately
+        self._wait_exit(pr)
+        pr.start()
+        self.assertEqual(pr.restarts, 1)
+        self.assertEqual(pr.start_retries_left, 2)
+
+        # second one after backoff
+        self._wait_exit(pr)
+        pr.start()
+        self.assertEqual(pr.state, ProcessState.failed_start_loop)
+        self.assertEqual(pr.restarts, 1)
+        self.assertAlmostEqual(pr.restart_delay, 0.3, delta=0.05)
+        time.sleep(0.3)
+        pr.start()
+        self.assertEqual(pr.restarts, 2)
+        pr.stop()
+
+    def test_too_many_crashes(self):
+        pr = self._crashing_process(1, backoff=0)
+        for _ in range(3):
+            self._wait_exit(pr)
+            pr.start()
+
+        self._wait_exit(pr)
+        with self.assertLogs(level='ERROR'):
+            pr.start()
+        self.assertEqual(pr.state, ProcessState.failed_to_start)
+        self.assertEqual(pr.start_retries_left, 0)
+        self.assertEqual(pr.restarts, 3)
+
+        # stop resets crashes
+        pr.stop()
+        self.assertEqual(pr.start_retries_left, 3)
+
+    def test_stable_uptime_resets_crashes(self):
+        pr = self._crashing_process(1, stable_uptime=0)
+        for _ in range(5):
+            self._wait_exit(pr)
+            pr.start()
+        self.assertEqual(pr.restarts, 5)
+        self.assertEqual(pr.start_retries_left, 2)
+        pr.stop()
+
+    def test_on_failure(self):
+        pr = self._crashing_process(0, policy='on-failure')
+        self._wait_exit(pr)
+        pr.start()
+        self.assertEqual(pr.state, ProcessState.stopped)
+        self.assertEqual(pr.restarts, 0)
+
+        pr = self._crashing_process(2, policy='on-failure')
+        self._wait_exit(pr)
+        pr.start()
+        self.assertEqual(pr.restarts, 1)
+        pr.stop()
+
+    def test_never(self):
+        pr = self._crashing_process(2, policy='never')
+        self._wait_exit(pr)
+        pr.start()
+        self.assertEqual(pr.state, ProcessState.failed_to_start)
+        self.assertEqual(pr.restarts, 0)
+
+        # restart is explicit and is not affected by policy
+        pr.restart()
+        self.assertEqual(pr.restarts, 1)
+        pr.stop()
+
+    def test_restart_is_not_crash(self):
+        for restart in ('never', 'on-failure'):
+            script = Path(self.temp_dir.name, 'exits_0_on_sigterm.sh')
+            script.write_text("trap 'exit 0' TERM\nsleep 60 &\nwait\n")
+            init_config = {
+                'name': 'restarted',
+                'executor': 'sh',
+                'file': str(script),
+                'dotenv': False,
+                'service': False,
+                'restart': restart,
+            }
+            pr = ServiceProcess(init_config=init_config)
+            pr.apply_status(ProcessStatus(
+                init_config=init_config, service_data={}, system_data={'state': ProcessState.started}
+            ))
+            pid = pr.pid
+
+            pr.restart()
+            self.assertEqual(pr.state, ProcessState.started)
+            self.assertNotEqual(pr.pid, pid)
+            self.assertEqual(pr.start_retries_left, 10)
+            pr.stop()
+
+    def test_start_retries_left_is_read_only(self):
+        pr = ServiceProcess(init_config={**TestServiceProcessBasic.init_config_ok, 'restart': {'crash_window': 10}})
+        now = time.monotonic()
+        pr._crashes.extend([now - 20, now - 1])
+        self.assertEqual(pr.start_retries_left, 9)
+        # called by metrics thread, crashes are pruned by loop thread only
+        self.assertEqual(len(pr._crashes), 2)
+
+    def test_backoff_does_not_exceed_max_backoff(self):
+        policy = RestartPolicy(backoff=1, max_backoff=10, jitter=0.5)
+        delays = [_get_backoff(policy, crashes=10) for _ in range(100)]
+        self.assertLessEqual(max(delays), 10)
+        self.assertEqual(_get_backoff(policy, crashes=1), 0)
+
+    def test_policy_shorthand(self):
+        init_config = {**TestServiceProcessBasic.init_config_ok, 'restart': 'never'}
+        pr = ServiceProcess(init_config=init_config)
+        self.assertEqual(pr.status().init_config.restart.policy, 'never')
+
+
+class TestServiceProcessStop(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.child_pid_file = Path(self.temp_dir.name, 'child.pid')
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _process_with_child(self, script: str, end: str = 'wait', **init_config) -> ServiceProcess:
+        path = Path(self.temp_dir.name, 'service.sh')
+        path.write_text(f'{script}\nsleep 60 &\necho $! > {self.child_pid_file}\n{end}\n')
+        init_config = {
+            'name': 'with_child',
+            'executor': 'sh',
+            'file': str(path),
+            'dotenv': False,
+            'service': False,
+            **init_config,
+        }
+        pr = ServiceProcess(init_config=init_config)
+        pr.start()
+        for _ in range(50):
+            if self.child_pid_file.exists() and self.child_pid_file.read_text().strip():
+                break
+            time.sleep(0.05)
+        return pr
+
+    def _is_child_alive(self, pid: str = None) -> bool:
+        stat = Path('/proc', pid or self.child_pid_file.read_text().strip(), 'stat')
+        # killed child is reparented and may stay zombie for a while
+        for _ in range(20):
+            if not stat.exists() or stat.read_text().rsplit(')', 1)[1].split()[0] == 'Z':
+                return False
+            time.sleep(0.05)
+        return True
+
+    def test_children_are_stopped(self):
+        pr = self._process_with_child('')
+        self.assertTrue(self._is_child_alive())
+
+        started_at = time.monotonic()
+        pr.stop()
+        self.assertLess(time.monotonic() - started_at, 2)
+        self.assertEqual(pr.state, ProcessState.stopped)
+        self.assertFalse(self._is_child_alive())
+
+    def test_group_is_killed_after_stop_timeout(self):
+        pr = self._process_with_child("trap '' TERM", stop_timeout=0.5)
+
+        started_at = time.monotonic()
+        with self.assertLogs(level='WARNING'):
+            pr.stop()
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.5)
+        self.assertEqual(pr.state, ProcessState.stopped)
+        self.assertFalse(self._is_child_alive())
+
+    def test_stop_signal(self):
+        signalled = Path(self.temp_dir.name, 'signalled')
+        pr = self._process_with_child(f"trap 'touch {signalled}; exit 0' INT", stop_signal='INT')
+        self.assertEqual(pr.status().init_config.stop_signal, 'SIGINT')
+
+        pr.stop()
+        self.assertTrue(signalled.exists())
+        # background sleep ignores SIGINT, it is killed after exit of process
+        self.assertFalse(self._is_child_alive())
+
+    def test_children_of_crashed_process_are_killed(self):
+        pr = self._process_with_child('', end='sleep 0.3\nexit 1')
+        # exit is waited for without reaping of process
+        os.waitid(os.P_PID, pr.pid, os.WEXITED | os.WNOWAIT)
+        child_pid = self.child_pid_file.read_text().strip()
+        self.assertTrue(self._is_child_alive(child_pid))
+
+        with self.assertLogs(level='WARNING'):
+            pr.start()
+        self.assertFalse(self._is_child_alive(child_pid))
+        pr.stop()
+
+    def test_group_of_reaped_process_is_not_signalled(self):
+        pr = self._process_with_child('', end='sleep 0.3\nexit 1')
+        # reaped, its pid may be reused
+        pr._process.wait(timeout=5)
+        child_pid = self.child_pid_file.read_text().strip()
+        try:
+            with mock.patch('os.killpg') as killpg:
+                pr.stop()
+            killpg.assert_not_called()
+        finally:
+            os.kill(int(child_pid), signal.SIGKILL)
+
+    def test_request_stop_does_not_wait(self):
+        pr = self._process_with_child("trap '' TERM", stop_timeout=0.5)
+
+        started_at = time.monotonic()
+        pr.request_stop()
+        self.assertLess(time.monotonic() - started_at, 0.1)
+        time.sleep(0.5)
+        # stop_timeout has already passed
+        with self.assertLogs(level='WARNING'):
+            pr.stop()
+        self.assertLess(time.monotonic() - started_at, 1)
+
+    def test_invalid_stop_signal(self):
+        init_config = {**TestServiceProcessBasic.init_config_ok, 'stop_signal': 'SIGNOPE'}
+        with self.assertRaises(ValueError):
+            ServiceProcess(init_config=init_config)
+        init_config['stop_signal'] = 15
+        self.assertEqual(ServiceProcess(init_config=init_config).status().init_config.stop_signal, 'SIGTERM')
@@ -0,0 +1,88 @@
+import threading
+import unittest
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import yaml
+
+from cubectl.src.supervisor import Supervisor
+
+
+def _status(name: str) -> dict:
+    return {
+        'jobs': {},
+        'services': [{
+            'init_config': {
+                'name': name,
+                'executor': 'python',
+                'file': 'assets/example_services/example_service_0.py',
+                'service': False,
+            },
+            'service_data': None,
+            'system_data': {'state': 'STOPPED'},
+        }],
+    }
+
+
+class TestSupervisorRegister(unittest.TestCase):
+    apps = ('app_0', 'app_1')
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.register_location = str(Path(self.temp_dir.name, 'register.yaml'))
+        self.register = []
+        for app_name in self.apps:
+            status_file = Path(self.temp_dir.name, app_name, 'status.yaml')
+            status_file.parent.mkdir()
+            status_file.write_text(yaml.dump(_status(f'{app_name}_worker')))
+            self.register.append(
+                {'app_name': app_name, 'status_file': str(status_file)}
+            )
+        self._write_register()
+        self.s = Supervisor(register_location=self.register_location)
+
+    def tearDown(self) -> None:
+        self.s._stop_all()
+        self.temp_dir.cleanup()
+
+    def _write_register(self):
+        Path(self.register_location).write_text(yaml.dump(self.register))
+
+    def test_apps_added_and_removed(self):
+        self.s._sync_register()
+        self.assertEqual(sorted(self.s.apps), list(self.apps))
+
+        register = yaml.safe_load(Path(self.register_location).read_text())
+        self.assertTrue(all(x['watcher_pid'] for x in register))
+
+        self.register = self.register[1:]
+        self._write_register()
+        self.s._sync_register()
+        self.assertEqual(self.s.apps, ['app_1'])
+
+    def test_shut_down_app_is_detached(self):
+        self.s._sync_register()
+        self.s._executors['app_0'].shutdown()
+        self.s._cycle()
+        self.assertEqual(self.s.apps, ['app_1'])
+
+        self.s._sync_register()
+        self.assertEqual(self.s.apps, ['app_1'])
+
+    def test_slow_app_does_not_delay_others(self):
+        self.s._sync_register()
+        released = threading.Event()
+        slow = mock.Mock(side_effect=lambda: released.wait(timeout=5))
+        fast = mock.Mock()
+        self.s._executors['app_0'].cycle = slow
+        self.s._executors['app_1'].cycle = fast
+        try:
+            for _ in range(3):
+                self.s._cycle()
+                self.s._cycles['app_1'].result(timeout=5)
+        finally:
+            released.set()
+
+        self.assertEqual(slow.call_count, 1)
+        self.assertEqual(fast.call_count, 3)
@@ -0,0 +1,94 @@
+import unittest
+import tempfile
+import threading
+from pathlib import Path
+
+from cubectl.src.utils.log_follower import LogFollower
+from cubectl.src.utils.get_status_file import get_log_files
+from cubectl.src.utils.state_store import write_state
+
+
+class TestLogFollowerBasic(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_0 = Path(self.temp_dir.name, 'service_0.log')
+        self.log_1 = Path(self.temp_dir.name, 'service_1.log')
+        self.log_0.write_text('old 0\nold 1\n')
+        self.follower = LogFollower(
+            {'service_0': str(self.log_0), 'service_1': str(self.log_1)},
+            poll_period=0.05,
+        )
+
+    def tearDown(self) -> None:
+        self.follower.stop()
+        self.temp_dir.cleanup()
+
+    def test_only_new_lines(self):
+        for file in self.follower._files:
+            file.seek_end()
+
+        with self.log_0.open('a') as f:
+            f.write('new 0\npartial')
+        self.log_1.write_text('created\n')
+
+        self.assertEqual(
+            self.follower.read_new(),
+            [('service_0', 'new 0\n'), ('service_1', 'created\n')],
+        )
+
+        with self.log_0.open('a') as f:
+            f.write(' line\n')
+        self.assertEqual(self.follower.read_new(), [('service_0', 'partial line\n')])
+
+    def test_truncated(self):
+        for file in self.follower._files:
+            file.seek_end()
+
+        self.log_0.write_text('after\n')
+        self.assertEqual(self.follower.read_new(), [('service_0', 'after\n')])
+
+    def test_follow(self):
+        received = []
+        got_line = threading.Event()
+
+        def on_line(service_name, line):
+            received.append((service_name, line))
+            if line == 'new\n':
+                got_line.set()
+
+        thread = threading.Thread(
+            target=self.follower.follow, kwargs={'on_line': on_line, 'tail': 1}
+        )
+        thread.start()
+        try:
+            while not received:
+                got_line.wait(0.01)
+            with self.log_0.open('a') as f:
+                f.write('new\n')
+            self.assertTrue(got_line.wait(5))
+        finally:
+            self.follower.stop()
+            thread.join(5)
+
+        self.assertEqual(received, [('service_0', 'old 1\n'), ('service_0', 'new\n')])
+
+    def test_get_log_files(self):
+        status_file = Path(self.temp_dir.name, 'status.yaml')
+        write_state(status_file, {'jobs': {}, 'services': [
+            {'init_config': {'name': 'a', 'log': '/tmp/a.log'}},
+            {'init_config': {'name': 'b', 'log': None}},
+            {'init_config': {'name': 'c', 'log': '/tmp/c.log'}},
+        ]})
+        self.assertEqual(
+            get_log_files(str(status_file)),
+            {
+                'a': '/tmp/a.log',
+                'b': str(Path(self.temp_dir.name, 'logs', 'b.log')),
+                'c': '/tmp/c.log',
+            },
+        )
+        self.assertEqual(get_log_files(str(status_file), ('c',)), {'c': '/tmp/c.log'})
+
+
+if __name__ == '__main__':
+    unittest.main()
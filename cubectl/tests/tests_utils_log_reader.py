@@ -0,0 +1,127 @@
+import unittest
+import tempfile
+from pathlib import Path
+
+from cubectl.src.utils import log_reader
+from cubectl.src.utils.log_reader import LogReader, tail_lines, read_log_range
+
+
+class TestLogReaderBasic(unittest.TestCase):
+    lines = [f'line {i}\n' for i in range(1000)]
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_file = Path(self.temp_dir.name, 'service.log')
+        self.log_file.write_text(''.join(self.lines))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_full(self):
+        self.assertEqual(LogReader(str(self.log_file)).get_log(), ''.join(self.lines))
+
+    def test_tail(self):
+        reader = LogReader(str(self.log_file))
+        self.assertEqual(reader.get_log(tail=3), ''.join(self.lines[-3:]))
+        self.assertEqual(reader.get_log(tail=5000), ''.join(self.lines))
+
+    def test_tail_small_blocks(self):
+        block_size = log_reader.TAIL_BLOCK_SIZE
+        log_reader.TAIL_BLOCK_SIZE = 7
+        try:
+            with self.log_file.open('rb') as f:
+                for n in (1, 2, 10, 999, 1000, 1001):
+                    self.assertEqual(
+                        tail_lines(f, lines=n).decode(), ''.join(self.lines[-n:])
+                    )
+        finally:
+            log_reader.TAIL_BLOCK_SIZE = block_size
+
+    def test_tail_no_trailing_new_line(self):
+        self.log_file.write_text('a\nb\nc')
+        self.assertEqual(LogReader(str(self.log_file)).get_log(tail=2), 'b\nc')
+
+    def test_bounded_tail(self):
+        reader = LogReader(str(self.log_file))
+        self.assertEqual(reader.get_tail(lines=3, max_bytes=1024), ''.join(self.lines[-3:]))
+        self.assertEqual(reader.get_tail(lines=100, max_bytes=12), '98\nline 999\n')
+
+        # tail is read while looking for lines in long line
+        self.log_file.write_text('x' * 1024 * 1024)
+        self.assertEqual(reader.get_tail(lines=3, max_bytes=10), 'x' * 10)
+
+        # cursor of `cubectl logs` is not moved
+        self.assertEqual(len(reader.get_latest_log()), 1024 * 1024)
+
+    def test_head(self):
+        reader = LogReader(str(self.log_file))
+        self.assertEqual(reader.get_log(head=2), ''.join(self.lines[:2]))
+
+    def test_bytes(self):
+        reader = LogReader(str(self.log_file))
+        self.assertEqual(reader.get_log(n_bytes=len(self.lines[-1])), self.lines[-1])
+
+    def test_latest_tail(self):
+        reader = LogReader(str(self.log_file))
+        reader.get_log(tail=1)
+        self.assertEqual(reader.get_latest_log(tail=1), '')
+
+        new_lines = ['new 1\n', 'new 2\n', 'new 3\n']
+        with self.log_file.open('a') as f:
+            f.write(''.join(new_lines))
+        self.assertEqual(reader.get_latest_log(tail=2), ''.join(new_lines[-2:]))
+
+    def test_latest_only_new_part(self):
+        with self.log_file.open('rb') as f:
+            start = len(''.join(self.lines[:-2]).encode())
+            self.assertEqual(
+                tail_lines(f, lines=10, start=start).decode(), ''.join(self.lines[-2:])
+            )
+
+    def test_invalid_utf8(self):
+        self.log_file.write_bytes(b'ok\n\xff\xfe\n')
+        self.assertEqual(LogReader(str(self.log_file)).get_log(tail=1), '��\n')
+
+    def test_range(self):
+        reader = LogReader(str(self.log_file))
+        log_range = reader.get_log_range(tail=2)
+        self.assertEqual(log_range['path'], str(self.log_file.resolve()))
+        self.assertEqual(read_log_range(**log_range).decode(), ''.join(self.lines[-2:]))
+
+        self.assertEqual(reader.get_log_range()['length'], 0)
+        with self.log_file.open('a') as f:
+            f.write('new\n')
+        log_range = reader.get_log_range()
+        self.assertEqual(read_log_range(**log_range), b'new\n')
+
+    def test_range_rotated(self):
+        reader = LogReader(str(self.log_file))
+        reader.get_log_range()
+        self.log_file.rename(f'{self.log_file}.1')
+        self.log_file.write_text('rotated\n')
+        self.assertEqual(reader.get_latest_log(), 'rotated\n')
+
+    def test_not_existing(self):
+        reader = LogReader(str(Path(self.temp_dir.name, 'none.log')))
+        self.assertIsNone(reader.get_log_range())
+        self.assertIn('No logfile found', reader.get_latest_log())
+
+    def test_cursors(self):
+        reader = LogReader(str(self.log_file))
+        size = self.log_file.stat().st_size
+        self.assertEqual(reader.get_log_range(cursor='a', ack=False)['length'], size)
+        self.assertEqual(reader.get_log_range(cursor='a', ack=False)['length'], size)
+        reader.ack_log(cursor='a', offset=size)
+        self.assertEqual(reader.get_log_range(cursor='a')['length'], 0)
+        self.assertEqual(reader.get_log_range(cursor='b')['length'], size)
+
+        other = LogReader(str(self.log_file))
+        other.set_cursors(reader.get_cursors())
+        self.assertEqual(other.get_log_range(cursor='a')['length'], 0)
+
+        reader.expire_cursors(ttl=-1)
+        self.assertEqual(list(reader.get_cursors()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
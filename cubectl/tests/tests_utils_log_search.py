@@ -0,0 +1,71 @@
+import unittest
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from cubectl.src.utils import log_search
+from cubectl.src.utils.log_search import search_log, parse_timestamp
+from cubectl.src.utils.state_store import read_state
+
+
+class TestLogSearchBasic(unittest.TestCase):
+    started_at = datetime(2023, 1, 31, 12, 0, 0)
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.log_file = Path(self.temp_dir.name, 'service.log')
+        self.index_file = Path(self.temp_dir.name, '.index', 'service.json')
+        self.lines = [
+            f'{self.started_at + timedelta(seconds=i)} INFO line {i}'
+            + (' ERROR' if i % 100 == 0 else '') + '\n'
+            for i in range(1000)
+        ]
+        self.log_file.write_text(''.join(self.lines))
+        self.index_step = log_search.INDEX_STEP
+        log_search.INDEX_STEP = 1000
+
+    def tearDown(self) -> None:
+        log_search.INDEX_STEP = self.index_step
+        self.temp_dir.cleanup()
+
+    def test_parse_timestamp(self):
+        self.assertEqual(parse_timestamp(b'2023-01-31T12:00:00.123 x'), self.started_at)
+        self.assertIsNone(parse_timestamp(b'no time'))
+
+    def test_search(self):
+        groups = search_log(self.log_file, 'ERROR')
+        self.assertEqual(groups, [[self.lines[i]] for i in range(0, 1000, 100)])
+
+    def test_context(self):
+        groups = search_log(self.log_file, r'line (100|101|500)\b', context=1)
+        self.assertEqual(groups, [self.lines[99:103], self.lines[499:502]])
+
+    def test_since(self):
+        since = self.started_at + timedelta(seconds=650)
+        groups = search_log(
+            self.log_file, 'ERROR', since=since, index_file=self.index_file
+        )
+        self.assertEqual(groups, [[self.lines[i]] for i in (700, 800, 900)])
+
+    def test_index_is_incremental(self):
+        search_log(self.log_file, 'ERROR', index_file=self.index_file)
+        entries = read_state(self.index_file)['entries']
+        self.assertGreater(len(entries), 10)
+        for offset, _ in entries:
+            self.assertTrue(offset == 0 or self.log_file.read_bytes()[offset - 1:offset] == b'\n')
+
+        with self.log_file.open('a') as f:
+            f.write(''.join(self.lines))
+        search_log(self.log_file, 'ERROR', index_file=self.index_file)
+        updated = read_state(self.index_file)
+        self.assertEqual(updated['entries'][:len(entries)], entries)
+        self.assertEqual(updated['size'], self.log_file.stat().st_size)
+
+    def test_max_matches_and_empty(self):
+        self.assertEqual(len(search_log(self.log_file, 'ERROR', max_matches=2)), 2)
+        self.assertEqual(search_log(Path(self.temp_dir.name, 'none.log'), 'x'), [])
+        self.assertEqual(len(search_log(self.log_file, '^')), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+import urllib.request
+from pathlib import Path
+from unittest import mock
+
+from cubectl.src.utils.metrics import MetricFamily, Histogram, MetricsExporter, format_metrics
+
+
+def _collect() -> list[MetricFamily]:
+    family = MetricFamily('test_value', 'gauge', 'Test value.')
+    family.add({'name': 'a"b'}, 1.5)
+    return [family]
+
+
+class TestFormatMetrics(unittest.TestCase):
+    def test_format(self):
+        result = format_metrics(_collect() + _collect())
+        self.assertEqual(result, (
+            '# HELP test_value Test value.\n'
+            '# TYPE test_value gauge\n'
+            'test_value{name="a\\"b"} 1.5\n'
+            'test_value{name="a\\"b"} 1.5\n'
+        ))
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value)
+        family = MetricFamily('duration_seconds', 'histogram', 'Duration.')
+        histogram.add_to(family, {'app': 'x'})
+
+        lines = format_metrics([family]).splitlines()[2:]
+        self.assertEqual(lines, [
+            'duration_seconds_bucket{app="x",le="0.1"} 2',
+            'duration_seconds_bucket{app="x",le="1"} 3',
+            'duration_seconds_bucket{app="x",le="+Inf"} 4',
+            'duration_seconds_sum{app="x"} 2.65',
+            'duration_seconds_count{app="x"} 4',
+        ])
+
+
+class TestMetricsExporter(unittest.TestCase):
+    def test_http(self):
+        exporter = MetricsExporter(collect=_collect, port=0)
+        exporter.start()
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{exporter.port}/metrics', timeout=5) as response:
+                self.assertIn('text/plain', response.headers['Content-Type'])
+                self.assertIn('test_value', response.read().decode())
+        finally:
+            exporter.close()
+
+    def test_textfile(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            textfile = Path(temp_dir, 'cubectl.prom')
+            exporter = MetricsExporter(collect=_collect, textfile=str(textfile))
+            exporter.write_textfile()
+            self.assertEqual(textfile.read_text(), format_metrics(_collect()))
+            self.assertEqual([x.name for x in Path(temp_dir).iterdir()], ['cubectl.prom'])
+
+    def test_textfile_from_config(self):
+        from cubectl import src
+        from cubectl.main import _create_metrics_exporter
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with mock.patch.object(src, 'config', {'metrics_textfile_dir': temp_dir}):
+                exporter = _create_metrics_exporter(collect=_collect, name='cubectl_app')
+            try:
+                exporter.write_textfile()
+            finally:
+                exporter.close()
+            self.assertEqual(Path(temp_dir, 'cubectl_app.prom').read_text(), format_metrics(_collect()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import time
+import threading
+import unittest
+
+from cubectl.src.utils.notification_dispatcher import (
+    NotificationDispatcher,
+    NotificationDeliveryError,
+    fit_log_tail,
+)
+
+
+class _Receiver:
+    def __init__(self, fail: int = 0, error: NotificationDeliveryError = None, delay: float = 0):
+        self.received: list[tuple[str, str, float]] = []
+        self._fail = fail
+        self._error = error or NotificationDeliveryError('unavailable')
+        self._delay = delay
+        self._lock = threading.Lock()
+
+    def deliver(self, destination: str, text: str):
+        time.sleep(self._delay)
+        with self._lock:
+            if self._fail:
+                self._fail -= 1
+                raise self._error
+            self.received.append((destination, text, time.monotonic()))
+
+
+class TestNotificationDispatcher(unittest.TestCase):
+    def test_submit_does_not_block(self):
+        receiver = _Receiver(delay=1)
+        dispatcher = NotificationDispatcher(receiver.deliver, coalesce_window=0)
+
+        started_at = time.monotonic()
+        for i in range(10):
+            dispatcher.submit('chat', f'message {i}')
+        self.assertLess(time.monotonic() - started_at, 0.1)
+        dispatcher.close(timeout=5)
+
+    def test_storm_is_coalesced(self):
+        receiver = _Receiver()
+        dispatcher = NotificationDispatcher(receiver.deliver, coalesce_window=0.2)
+        for i in range(20):
+            dispatcher.submit('chat', f'restarted {i}')
+        time.sleep(0.5)
+
+        self.assertEqual(len(receiver.received), 1)
+        text = receiver.received[0][1]
+        self.assertTrue(text.startswith('20 notifications:'))
+        self.assertIn('restarted 0', text)
+        self.assertIn('restarted 19', text)
+        dispatcher.close()
+
+    def test_rate_limit_per_destination(self):
+        receiver = _Receiver()
+        dispatcher = NotificationDispatcher(receiver.deliver, min_interval=0.3, coalesce_window=0)
+        dispatcher.submit('chat_1', 'first')
+        dispatcher.submit('chat_2', 'first')
+        time.sleep(0.1)
+        dispatcher.submit('chat_1', 'second')
+        dispatcher.submit('chat_1', 'third')
+        time.sleep(0.5)
+        dispatcher.close()
+
+        chat_1 = [x for x in receiver.received if x[0] == 'chat_1']
+        self.assertEqual(len([x for x in receiver.received if x[0] == 'chat_2']), 1)
+        self.assertEqual(len(chat_1), 2)
+        self.assertGreaterEqual(chat_1[1][2] - chat_1[0][2], 0.29)
+        self.assertIn('second', chat_1[1][1])
+        self.assertIn('third', chat_1[1][1])
+
+    def test_retry_with_backoff(self):
+        receiver = _Receiver(fail=2)
+        dispatcher = NotificationDispatcher(receiver.deliver, coalesce_window=0, backoff=0.05)
+        with self.assertLogs(level='WARNING'):
+            dispatcher.submit('chat', 'message')
+            time.sleep(0.5)
+        dispatcher.close()
+
+        self.assertEqual([x[1] for x in receiver.received], ['message'])
+        self.assertEqual(dispatcher.delivered, 1)
+
+    def test_not_retried_error_drops_message(self):
+        receiver = _Receiver(fail=1, error=NotificationDeliveryError('400 bad request', retry=False))
+        dispatcher = NotificationDispatcher(receiver.deliver, coalesce_window=0, min_interval=0)
+        with self.assertLogs(level='ERROR'):
+            dispatcher.submit('chat', 'message')
+            time.sleep(0.2)
+        dispatcher.submit('chat', 'next')
+        dispatcher.close()
+
+        self.assertEqual([x[1] for x in receiver.received], ['next'])
+        self.assertEqual(dispatcher.failed, 1)
+
+    def test_max_pending(self):
+        receiver = _Receiver()
+        dispatcher = NotificationDispatcher(receiver.deliver, coalesce_window=10, max_pending=3)
+        for i in range(5):
+            dispatcher.submit('chat', f'message {i}')
+        self.assertEqual(dispatcher.pending(), 3)
+        dispatcher.close()
+
+        text = receiver.received[0][1]
+        self.assertTrue(text.startswith('5 notifications (2 oldest dropped):'))
+        self.assertNotIn('message 1', text)
+
+    def test_close_flushes_queue(self):
+        receiver = _Receiver()
+        dispatcher = NotificationDispatcher(receiver.deliver, coalesce_window=60, min_interval=60)
+        dispatcher.submit('chat_1', 'message')
+        dispatcher.submit('chat_2', 'message')
+        dispatcher.close(timeout=2)
+
+        self.assertEqual(sorted(x[0] for x in receiver.received), ['chat_1', 'chat_2'])
+        dispatcher.submit('chat_1', 'after close')
+        self.assertEqual(dispatcher.pending(), 0)
+
+
+class TestFitLogTail(unittest.TestCase):
+    def test_beginning_of_tail_is_cut(self):
+        message = {'process_name': 'worker', 'log_tail': ''.join(f'"line" {i}\n' for i in range(100))}
+
+        text = fit_log_tail(message, json.dumps, 200)
+        self.assertLessEqual(len(text), 200)
+        log_tail = json.loads(text)['log_tail']
+        self.assertTrue(log_tail.startswith('[...] '))
+        self.assertTrue(log_tail.endswith('"line" 99\n'))
+
+    def test_short_message_is_not_changed(self):
+        message = {'process_name': 'worker', 'log_tail': 'error\n'}
+        self.assertEqual(fit_log_tail(message, json.dumps, 200), json.dumps(message))
+        self.assertEqual(fit_log_tail(message, json.dumps, None), json.dumps(message))
+
+
+if __name__ == '__main__':
+    unittest.main()
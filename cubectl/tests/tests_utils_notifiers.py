@@ -0,0 +1,171 @@
+import os
+import json
+import socket
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from cubectl.src.utils.notifiers import (
+    FanOutMessanger,
+    NotifierException,
+    create_event,
+    create_notifier,
+    create_notifiers,
+    get_notifier_configs_from_env,
+)
+
+
+class _Failing:
+    def post(self, message):
+        raise RuntimeError('unavailable')
+
+
+class _Collecting:
+    def __init__(self):
+        self.messages = []
+
+    def post(self, message):
+        self.messages.append(message)
+
+
+class TestNotifiers(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.event = create_event('process_state', app='app', process_name='worker',
+                                  state='FAILED_TO_START', exit_code=1)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_jsonl(self):
+        path = Path(self.temp_dir.name, 'events', 'events.jsonl')
+        notifier = create_notifier({'type': 'jsonl', 'path': str(path)})
+        notifier.post(self.event)
+        notifier.post('text')
+        notifier.close()
+
+        lines = [json.loads(x) for x in path.read_text().splitlines()]
+        self.assertEqual(lines[0]['process_name'], 'worker')
+        self.assertEqual(lines[0]['exit_code'], 1)
+        self.assertEqual(lines[1]['event'], 'message')
+        self.assertEqual(lines[1]['text'], 'text')
+
+    def test_unix_socket(self):
+        path = str(Path(self.temp_dir.name, 'events.sock'))
+        received = []
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(path)
+            server.listen()
+
+            def accept():
+                connection, _ = server.accept()
+                with connection, connection.makefile() as f:
+                    received.extend(json.loads(x) for x in f)
+            thread = threading.Thread(target=accept)
+            thread.start()
+
+            notifier = create_notifier({'type': 'unix_socket', 'path': path})
+            notifier.post(self.event)
+            notifier.close()
+            thread.join(timeout=5)
+
+        self.assertEqual(received[0]['state'], 'FAILED_TO_START')
+
+    def test_syslog(self):
+        path = str(Path(self.temp_dir.name, 'log.sock'))
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as server:
+            server.bind(path)
+            server.settimeout(5)
+            notifier = create_notifier({'type': 'syslog', 'address': path, 'facility': 'local0'})
+            notifier.post(self.event)
+            notifier.close()
+            datagram = server.recv(65536).decode()
+
+        # local0 (16) * 8 + error (3)
+        self.assertTrue(datagram.startswith(f'<131>cubectl[{os.getpid()}]: {{'))
+        self.assertEqual(json.loads(datagram.split(': ', 1)[1])['app'], 'app')
+
+    def test_webhook(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                received.append((self.headers['Authorization'], body.decode()))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+        try:
+            notifier = create_notifier({
+                'type': 'webhook',
+                'url': f'http://127.0.0.1:{server.server_address[1]}/events',
+                'headers': {'Authorization': 'Bearer token'},
+            })
+            notifier.post(self.event)
+            notifier.close()
+            thread.join(timeout=5)
+        finally:
+            server.server_close()
+
+        self.assertEqual(received[0][0], 'Bearer token')
+        self.assertEqual(json.loads(received[0][1])['process_name'], 'worker')
+
+    def test_fan_out(self):
+        collecting = _Collecting()
+        fan_out = FanOutMessanger([_Failing(), collecting])
+        with self.assertLogs(level='ERROR'):
+            fan_out.post(self.event)
+        self.assertEqual(collecting.messages, [self.event])
+
+    def test_invalid_notifiers_are_skipped(self):
+        with self.assertRaises(NotifierException):
+            create_notifier({'type': 'webhook'})
+
+        with self.assertLogs(level='ERROR'):
+            notifiers = create_notifiers([
+                {'type': 'webhook'},
+                {'type': 'unknown'},
+                {'type': 'jsonl', 'path': str(Path(self.temp_dir.name, 'events.jsonl'))},
+            ])
+        self.assertEqual(len(notifiers), 1)
+        notifiers.close()
+
+    def test_duplicates_are_skipped(self):
+        env = {'CUBECTL_TELEGRAM_TOKEN': 'token', 'CUBECTL_TELEGRAM_CHAT_IDS': '1, 2'}
+        path = str(Path(self.temp_dir.name, 'events.jsonl'))
+        with mock.patch.dict(os.environ, env):
+            notifiers = create_notifiers(
+                [
+                    {'type': 'telegram'},
+                    {'type': 'telegram', 'chat_ids': [2, 1]},
+                    {'type': 'telegram', 'chat_ids': 3},
+                    {'type': 'jsonl', 'path': path},
+                    {'type': 'jsonl', 'path': path},
+                ],
+                exclude=get_notifier_configs_from_env(),
+            )
+        # telegram of environment with same chats and second jsonl are skipped
+        self.assertEqual(len(notifiers), 2)
+        notifiers.close()
+
+    def test_configs_from_env(self):
+        env = {
+            'CUBECTL_TELEGRAM_TOKEN': 'token',
+            'CUBECTL_NOTIFIERS': '[{"type": "syslog"}]',
+        }
+        with mock.patch.dict(os.environ, env):
+            configs = get_notifier_configs_from_env()
+        self.assertEqual([x['type'] for x in configs], ['telegram', 'syslog'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import pstats
+import tempfile
+import unittest
+
+from cubectl.src.utils.profiler import PhaseProfiler
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    def test_disabled(self):
+        profiler = PhaseProfiler()
+        with profiler.phase('cycle'):
+            pass
+        self.assertEqual(profiler.summary(), {})
+
+    def test_summary(self):
+        profiler = PhaseProfiler(enabled=True)
+        for i in range(1, 101):
+            profiler.record('cycle', i / 1000)
+        with profiler.phase('read_status'):
+            pass
+
+        summary = profiler.summary(reset=True)
+        self.assertEqual(set(summary), {'cycle', 'read_status'})
+        self.assertEqual(summary['cycle']['count'], 100)
+        self.assertAlmostEqual(summary['cycle']['p50'], 0.05)
+        self.assertAlmostEqual(summary['cycle']['p99'], 0.099)
+        self.assertAlmostEqual(summary['cycle']['max'], 0.1)
+        self.assertEqual(profiler.summary(), {})
+
+    def test_report(self):
+        profiler = PhaseProfiler(enabled=True, report_period=0)
+        profiler.record('cycle', 0.01)
+        with self.assertLogs(level='INFO') as logs:
+            profiler.report_if_due()
+        self.assertIn('cycle: count=1 p50=10.00ms', logs.output[0])
+
+    def test_cprofile(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            profiler = PhaseProfiler(enabled=True, dump_dir=temp_dir)
+            self.assertIsNone(profiler.toggle_cprofile())
+            sum(range(1000))
+            dump_file = profiler.toggle_cprofile()
+            self.assertTrue(pstats.Stats(str(dump_file)).total_calls > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import tempfile
+import threading
+from pathlib import Path
+
+from cubectl.src.utils.state_store import read_state, write_state, get_state_file_name
+from cubectl.src.utils.state_store import update_state, remove_state
+from cubectl.src.initialization_functions.application_registration import migrate_register
+
+
+class TestStateStoreBasic(unittest.TestCase):
+    state = {'jobs': {'id': {'restart': {'services': ['a']}}}, 'services': []}
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_read_write(self):
+        for state_format in ('yaml', 'json'):
+            file = Path(self.temp_dir.name, get_state_file_name('status', state_format))
+            write_state(file, self.state)
+            self.assertEqual(read_state(file), self.state)
+
+    def test_no_temp_files_left(self):
+        file = Path(self.temp_dir.name, 'status.json')
+        write_state(file, self.state)
+        write_state(file, self.state)
+        self.assertEqual(list(Path(self.temp_dir.name).iterdir()), [file])
+
+    def test_empty_file(self):
+        for name in ('status.json', 'status.yaml'):
+            file = Path(self.temp_dir.name, name)
+            file.touch()
+            self.assertIsNone(read_state(file))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            get_state_file_name('status', 'xml')
+
+    def test_migrate_register(self):
+        status_file = Path(self.temp_dir.name, 'app', 'status.yaml')
+        status_file.parent.mkdir()
+        write_state(status_file, self.state)
+        register_file = Path(self.temp_dir.name, 'register.yaml')
+        write_state(register_file, [{'app_name': 'app', 'status_file': str(status_file)}])
+
+        new_register = migrate_register(str(register_file), 'json')
+
+        self.assertEqual(Path(new_register).suffix, '.json')
+        self.assertFalse(register_file.exists())
+        self.assertFalse(status_file.exists())
+        register = read_state(new_register)
+        self.assertEqual(read_state(register[0]['status_file']), self.state)
+
+
+class TestStateStoreLocking(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file = Path(self.temp_dir.name, 'status.yaml')
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _increment(self):
+        for _ in range(20):
+            with update_state(self.file, default=dict()) as state:
+                state['counter'] = state.get('counter', 0) + 1
+
+    def test_concurrent_updates_are_not_lost(self):
+        threads = [threading.Thread(target=self._increment) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(read_state(self.file)['counter'], 100)
+
+    def test_failed_update_is_not_written(self):
+        write_state(self.file, {'counter': 1})
+        with self.assertRaises(ValueError):
+            with update_state(self.file) as state:
+                state['counter'] = 2
+                raise ValueError()
+        self.assertEqual(read_state(self.file)['counter'], 1)
+
+    def test_remove_state(self):
+        with update_state(self.file, default=dict()):
+            pass
+        remove_state(self.file)
+        self.assertEqual(list(Path(self.temp_dir.name).iterdir()), [])